@@ -5,7 +5,7 @@ import SearchBar from './components/SearchBar'
 import SearchResults from './components/SearchResults'
 import LoginForm from './components/LoginForm'
 import RegisterForm from './components/RegisterForm'
-import { getStatus, searchDocs, getDownloadUrl } from './api'
+import { subscribeStatus, searchDocs, getDownloadUrl } from './api'
 
 
 export default function App() {
@@ -35,18 +35,18 @@ export default function App() {
     }
   }, [jobs, user])
 
+  // Jobs still running; the status stream is reopened only when this set changes
+  const pendingIds = jobs
+    .filter(j => !['COMPLETED','FAILED'].includes(j.status))
+    .map(j => j.job_id)
+    .join(',')
+
   useEffect(() => {
-    if (!user) return
-    const interval = setInterval(async () => {
-      const updated = await Promise.all(jobs.map(async j => {
-        if (['COMPLETED','FAILED'].includes(j.status)) return j
-        const s = await getStatus(j.job_id).catch(() => null)
-        return s ? {...j, ...s} : j
-      }))
-      setJobs(updated)
-    }, 1500)
-    return () => clearInterval(interval)
-  }, [jobs, user])
+    if (!user || !pendingIds) return
+    return subscribeStatus(pendingIds.split(','), (delta) => {
+      setJobs(current => current.map(j => j.job_id === delta.job_id ? {...j, ...delta} : j))
+    })
+  }, [pendingIds, user])
 
   const handleSearch = async (q) => {
     const items = await searchDocs(q)
@@ -4,16 +4,46 @@ import axios from 'axios'
 const API_BASE = import.meta.env.VITE_API_BASE || 'http://localhost:8080'
 console.log('API_BASE set to:', API_BASE)
 
+async function sha256Hex(file) {
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer())
+  return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('')
+}
+
+// Ask the server whether it already has a result for these bytes; if so the
+// job is created from the cached result and the file is never sent.
+async function uploadByHash(file) {
+  try {
+    const hash = await sha256Hex(file)
+    const { data } = await axios.post(`${API_BASE}/api/upload/hash/${hash}`, {
+      filename: file.name,
+      mime: file.type,
+    })
+    console.log('Upload served from cache:', data)
+    return data // { job_id, cached }
+  } catch (error) {
+    return null
+  }
+}
+
 export async function uploadFile(file) {
-  const form = new FormData()
-  form.append('file', file)
+  const cached = await uploadByHash(file)
+  if (cached) return cached
+
   try {
     console.log('Uploading file:', file)
-    const { data } = await axios.post(`${API_BASE}/api/upload`, form, {
-      headers: { 'Content-Type': 'multipart/form-data' },
+    // 1. Get a signed resumable upload URL, 2. send the bytes straight to
+    // storage, 3. tell the API the object is there so it queues OCR.
+    const { data: session } = await axios.post(`${API_BASE}/api/upload/init`, {
+      filename: file.name,
+      size: file.size,
+      mime: file.type,
     })
+    await axios.put(new URL(session.upload_url, API_BASE).toString(), file, {
+      headers: { 'Content-Type': file.type || 'application/octet-stream' },
+    })
+    const { data } = await axios.post(`${API_BASE}/api/upload/${session.job_id}/finalize`)
     console.log('Upload response:', data)
-    return data // { job_id }
+    return data // { job_id, status }
   } catch (error) {
     console.error('Error uploading file:', error)
     throw error
@@ -32,6 +62,16 @@ export async function getStatus(jobId) {
   }
 }
 
+// Stream status changes for the given jobs over Server-Sent Events.
+// onUpdate receives { job_id, ...changedFields }; returns a function that closes the stream.
+export function subscribeStatus(jobIds, onUpdate) {
+  const source = new EventSource(`${API_BASE}/api/status/stream?ids=${jobIds.map(encodeURIComponent).join(',')}`)
+  source.addEventListener('status', (e) => onUpdate(JSON.parse(e.data)))
+  source.addEventListener('end', () => source.close())
+  source.onerror = (error) => console.error('Status stream error:', error)
+  return () => source.close()
+}
+
 export async function getResult(jobId) {
   try {
     console.log('Fetching result for job:', jobId)
@@ -44,6 +84,20 @@ export async function getResult(jobId) {
   }
 }
 
+// Pages finished so far (available while the job is still running).
+export async function getResultPages(jobId, from = 1, to = undefined) {
+  try {
+    const { data } = await axios.get(`${API_BASE}/api/result/${jobId}/pages`, {
+      params: { from, to },
+      responseType: 'text',
+    })
+    return data.split('\n').filter(Boolean).map(line => JSON.parse(line))
+  } catch (error) {
+    console.error('Error fetching result pages:', error)
+    return []
+  }
+}
+
 export async function searchDocs(q) {
   try {
     console.log('Searching docs with query:', q)
@@ -66,4 +120,15 @@ export async function getDownloadUrl(jobId) {
     console.error('Error getting download URL:', error)
     return null
   }
-}
\ No newline at end of file
+}
+export async function getDownloadUrls(jobIds) {
+  try {
+    console.log('Getting download URLs for jobs:', jobIds)
+    const { data } = await axios.get(`${API_BASE}/api/download`, { params: { ids: jobIds.join(',') } })
+    console.log('Download URLs response:', data)
+    return data.urls || {}
+  } catch (error) {
+    console.error('Error getting download URLs:', error)
+    return {}
+  }
+}
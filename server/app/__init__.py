@@ -23,6 +23,11 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DB_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SQLALCHEMY_ECHO'] = True
+    # Workers keep one pool for their lifetime; drop connections the server closed.
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'supersecret')
 
     # --- Initialize extensions ---
@@ -40,8 +45,15 @@ def create_app():
     from .routes import api_bp
     app.register_blueprint(api_bp)
 
+    from .cli import register_commands
+    register_commands(app)
+
     with app.app_context():
         logger.info("Creating database tables if they do not exist...")
         # db.drop_all()
+        from .search import ensure_search_extensions
+        ensure_search_extensions()
         db.create_all()
+        from .schema import upgrade_schema
+        upgrade_schema()
     return app
\ No newline at end of file
@@ -0,0 +1,24 @@
+"""
+One-off maintenance commands, run after deploying a release that needs them:
+
+    flask --app app:create_app create-indexes
+    flask --app app:create_app reindex-search
+"""
+import click
+
+
+def register_commands(app):
+    @app.cli.command("create-indexes")
+    def create_indexes_command():
+        """Build indexes added since the tables were created (CONCURRENTLY on Postgres)."""
+        from .schema import create_indexes
+        created = create_indexes()
+        click.echo(f"Created {len(created)} indexes" + (f": {', '.join(created)}" if created else ""))
+
+    @app.cli.command("reindex-search")
+    @click.option("--batch-size", default=500, show_default=True)
+    def reindex_search(batch_size):
+        """Fill search_vector for completed documents that have none (Postgres)."""
+        from .search import reindex_documents
+        count = reindex_documents(batch_size)
+        click.echo(f"Reindexed {count} documents")
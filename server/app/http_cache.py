@@ -0,0 +1,196 @@
+import gzip
+import json
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from flask import Response, request
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Upper bound on the serialized (and compressed) responses held per API process.
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Larger bodies are served but not cached, so one document can't flush the cache.
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRY_BYTES", 4 * 1024 * 1024))
+# Browser cache lifetime of responses that can no longer change (completed results).
+IMMUTABLE_MAX_AGE = int(os.environ.get("IMMUTABLE_MAX_AGE", 24 * 3600))
+# Bodies smaller than this are sent uncompressed.
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/plain", "text/csv")
+
+CACHE_IMMUTABLE = f"private, max-age={IMMUTABLE_MAX_AGE}, immutable"
+CACHE_REVALIDATE = "no-cache"  # may be stored, but revalidated (ETag) on every use
+
+
+def _encodings() -> tuple[str, ...]:
+    return ("br", "gzip") if brotli else ("gzip",)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _negotiate(size: int) -> str | None:
+    """Best content coding for this request, or None to send the body as is."""
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    return request.accept_encodings.best_match(_encodings())
+
+
+class CachedBody:
+    """A serialized response body, its strong ETag and compressed variants."""
+
+    __slots__ = ("body", "etag", "mimetype", "cache_control", "encoded")
+
+    def __init__(self, body: bytes, mimetype: str, cache_control: str):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]  # of the identity body
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.encoded = {}  # content coding -> bytes, filled on first request
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(b) for b in self.encoded.values())
+
+    def variant(self, encoding: str | None) -> bytes:
+        if encoding is None:
+            return self.body
+        if encoding not in self.encoded:
+            self.encoded[encoding] = compress(self.body, encoding)
+        return self.encoded[encoding]
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU of serialized responses, keyed by e.g. "result:<job_id>".
+    Only responses that can no longer change are stored, so there is no
+    invalidation; each API process holds its own copy.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 max_entry_bytes: int = RESPONSE_CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> CachedBody | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        METRICS.inc("response_cache_requests_total", result="hit" if entry else "miss")
+        return entry
+
+    def put(self, key: str, entry: CachedBody):
+        if self.max_bytes <= 0 or len(entry.body) > self.max_entry_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+            self.entries[key] = entry
+            self.bytes += entry.size
+            self._evict()
+
+    def resize(self, key: str, delta: int):
+        """Account for a compressed variant added to a cached entry."""
+        with self.lock:
+            if key in self.entries:
+                self.bytes += delta
+                self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self.entries:
+            _, entry = self.entries.popitem(last=False)
+            self.bytes -= entry.size
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+RESPONSE_CACHE = ResponseCache()
+
+
+# ------------------------------
+# Responses
+# ------------------------------
+def serialize(payload) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _variant_etag(etag: str, encoding: str | None) -> str:
+    """Strong validators differ per representation: "<hash>", "<hash>-gzip", "<hash>-br"."""
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def _client_has(etag: str) -> bool:
+    """If-None-Match matches any encoding of the body with this hash."""
+    inm = request.if_none_match
+    return inm.star_tag or any(t.split("-", 1)[0] == etag for t in inm.as_set(include_weak=True))
+
+
+def _send(entry: CachedBody, status: int = 200, cache_key: str | None = None) -> Response:
+    """Answer with entry: 304 if the client has it, else the best encoding."""
+    encoding = _negotiate(len(entry.body))
+    headers = {"ETag": f'"{_variant_etag(entry.etag, encoding)}"', "Cache-Control": entry.cache_control,
+               "Vary": "Accept-Encoding"}
+    if status == 200 and _client_has(entry.etag):
+        return Response(status=304, headers=headers)
+
+    before = entry.size
+    body = entry.variant(encoding)
+    if cache_key and entry.size != before:
+        RESPONSE_CACHE.resize(cache_key, entry.size - before)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, status=status, mimetype=entry.mimetype, headers=headers)
+
+
+def cached_response(key: str) -> Response | None:
+    """Serve a cached response for key, if there is one."""
+    entry = RESPONSE_CACHE.get(key)
+    return _send(entry, cache_key=key) if entry else None
+
+
+def json_response(payload, cache_control: str = CACHE_REVALIDATE, cache_key: str | None = None,
+                  status: int = 200) -> Response:
+    """
+    JSON response with a strong ETag, Cache-Control and content negotiation.
+    With cache_key the serialized body is kept in RESPONSE_CACHE; pass it
+    only for responses that can no longer change.
+    """
+    entry = CachedBody(serialize(payload), "application/json", cache_control)
+    if cache_key and status == 200:
+        RESPONSE_CACHE.put(cache_key, entry)
+    return _send(entry, status, cache_key)
+
+
+def compress_response(response: Response) -> Response:
+    """Compress other buffered text/JSON responses according to Accept-Encoding."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    body = response.get_data()
+    encoding = _negotiate(len(body))
+    if encoding:
+        response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(_variant_etag(etag, encoding), weak)
+    response.vary.add("Accept-Encoding")
+    return response
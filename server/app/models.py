@@ -1,5 +1,7 @@
 
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from . import db, bcrypt
 from flask_login import UserMixin
 
@@ -35,11 +37,19 @@ class Document(db.Model):
     mime = db.Column(db.String(128), default="")
     gcs_uri = db.Column(db.String(1024), nullable=True)
     status = db.Column(db.String(64), default="RECEIVED", nullable=False)
-
-    text = db.Column(db.Text, nullable=True)
-    entities_json = db.Column(db.Text, nullable=True)
+    content_hash = db.Column(db.String(64), index=True, nullable=True)  # sha256 hex of the upload
+
+    # Large columns are deferred and load only when accessed. text is the
+    # bounded copy searched by the trigram indexes; the full text and the
+    # entities are stored compressed in DocumentPayload (see app.payloads).
+    # entities_json is only set on documents stored before payloads existed.
+    text = deferred(db.Column(db.Text, nullable=True))
+    entities_json = deferred(db.Column(db.Text, nullable=True))
     tags_json = db.Column(db.Text, nullable=True)
 
+    # Weighted full-text index over filename, tags, entities and text (see app.search)
+    search_vector = deferred(db.Column(TSVECTOR().with_variant(db.Text(), "sqlite"), nullable=True))
+
     created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), nullable=False)
     updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), onupdate=db.func.now())
 
@@ -47,6 +57,18 @@ class Document(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     user = db.relationship('User', back_populates='documents')
 
+    __table_args__ = (
+        db.Index("ix_documents_search_vector", "search_vector",
+                 postgresql_using="gin").ddl_if(dialect="postgresql"),
+        # pg_trgm indexes for substring / similarity search (see app.search)
+        db.Index("ix_documents_text_trgm", "text", postgresql_using="gin",
+                 postgresql_ops={"text": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        db.Index("ix_documents_filename_trgm", "filename", postgresql_using="gin",
+                 postgresql_ops={"filename": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        db.Index("ix_documents_tags_trgm", "tags_json", postgresql_using="gin",
+                 postgresql_ops={"tags_json": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -55,14 +77,54 @@ class Document(db.Model):
             "mime": self.mime,
             "gcs_uri": self.gcs_uri,
             "status": self.status,
-            "text": self.text,
-            "entities_json": self.entities_json,
+            "content_hash": self.content_hash,
             "tags_json": self.tags_json,
             "user_id": self.user_id,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
 
+class DocumentPayload(db.Model):
+    """Full text and entities of a completed document, compressed (see app.payloads)."""
+    __tablename__ = "document_payloads"
+
+    document_id = db.Column(db.Integer, db.ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    codec = db.Column(db.String(16), nullable=False)  # "zstd" or "gzip"
+    text_blob = db.Column(db.LargeBinary, nullable=False)
+    entities_blob = db.Column(db.LargeBinary, nullable=False)
+    text_chars = db.Column(db.Integer, nullable=False, default=0)
+    text_bytes = db.Column(db.Integer, nullable=False, default=0)  # UTF-8 size, for byte ranges
+    created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), nullable=False)
+
+
+class DocumentPage(db.Model):
+    """Text of one page, written as soon as the page is extracted."""
+    __tablename__ = "document_pages"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    document_id = db.Column(db.Integer, db.ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    page_no = db.Column(db.Integer, nullable=False)
+    source = db.Column(db.String(16), nullable=False)  # "text_layer" or "ocr"
+    text = db.Column(db.Text, nullable=False, default="")
+    # Position of the page in the assembled Document.text; set when the job completes
+    char_start = db.Column(db.Integer, nullable=True)
+    char_end = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("document_id", "page_no", name="uq_document_pages_page"),
+    )
+
+    def to_dict(self):
+        return {
+            "page": self.page_no,
+            "source": self.source,
+            "text": self.text,
+            "char_start": self.char_start,
+            "char_end": self.char_end,
+        }
+
+
 class Job(db.Model):
     __tablename__ = "jobs"
 
@@ -87,6 +149,16 @@ class Job(db.Model):
     # optional relationship to Document if needed later
     document_id = db.Column(db.Integer, db.ForeignKey("documents.id"), nullable=True)
 
+    # Set for jobs created together by /api/upload/batch
+    batch_id = db.Column(db.String(64), index=True, nullable=True)
+
+    # Per-stage seconds and page/byte/char counts, copied from metrics at the end of the job
+    timings_json = db.Column(db.Text, nullable=True)
+
+    # Pages taken from the PDF text layer and pages OCR'd, as ranges ("1-3,7")
+    text_pages = db.Column(db.Text, nullable=True)
+    ocr_pages = db.Column(db.Text, nullable=True)
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -98,6 +170,22 @@ class Job(db.Model):
             "progress": self.progress,
             "stage": self.stage,
             "document_id": self.document_id,
+            "batch_id": self.batch_id,
+            "text_pages": self.text_pages,
+            "ocr_pages": self.ocr_pages,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def status_record(self):
+        """Fields of the Redis status record (StatusStore) for this job."""
+        return {
+            "id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "progress": self.progress,
+            "stage": self.stage,
+            "gcs_uri": self.gcs_uri,
+            "text_pages": self.text_pages,
+            "ocr_pages": self.ocr_pages,
         }
\ No newline at end of file
@@ -0,0 +1,143 @@
+import json
+import os
+import zlib
+import logging
+from . import db
+from .models import DocumentPayload
+from .search import SEARCH_MAX_CHARS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+# Compression of stored payloads: "zstd", "gzip" or "auto" (zstd if installed).
+# The codec is recorded per row, so changing it never breaks older payloads.
+PAYLOAD_CODEC = os.environ.get("PAYLOAD_CODEC", "auto")
+PAYLOAD_ZSTD_LEVEL = int(os.environ.get("PAYLOAD_ZSTD_LEVEL", 3))
+# Compressed payloads are decompressed in pieces of this many bytes when streamed.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _codec() -> str:
+    if PAYLOAD_CODEC == "auto":
+        return "zstd" if zstandard else "gzip"
+    if PAYLOAD_CODEC == "zstd" and zstandard is None:
+        logger.warning("PAYLOAD_CODEC=zstd but zstandard is not installed; using gzip")
+        return "gzip"
+    return PAYLOAD_CODEC
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=PAYLOAD_ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, 6, wbits=16 + zlib.MAX_WBITS)  # gzip container
+
+
+def iter_decompress(blob: bytes, codec: str):
+    """Decompress blob piece by piece, so large texts can be streamed."""
+    if codec == "zstd":
+        d = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        d = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    for i in range(0, len(blob), STREAM_CHUNK_SIZE):
+        out = d.decompress(blob[i:i + STREAM_CHUNK_SIZE])
+        if out:
+            yield out
+    tail = d.flush()
+    if tail:
+        yield tail
+
+
+def decompress(blob: bytes, codec: str) -> bytes:
+    return b"".join(iter_decompress(blob, codec))
+
+
+# ------------------------------
+# Writing
+# ------------------------------
+def store_payload(doc, text: str, entities: list[dict]):
+    """
+    Store the full text and entities of doc compressed in document_payloads
+    (replacing an earlier payload). doc.text keeps only the bounded copy the
+    trigram indexes search; doc.entities_json is no longer written.
+    """
+    codec = _codec()
+    raw = text.encode("utf-8")
+    payload = db.session.get(DocumentPayload, doc.id) or DocumentPayload(document_id=doc.id)
+    payload.codec = codec
+    payload.text_blob = compress(raw, codec)
+    payload.entities_blob = compress(json.dumps(entities).encode("utf-8"), codec)
+    payload.text_chars = len(text)
+    payload.text_bytes = len(raw)
+    db.session.add(payload)
+    logger.info("Stored payload of document %s: %d chars, %d -> %d bytes (%s)",
+                doc.id, len(text), len(raw), len(payload.text_blob), codec)
+
+    doc.text = text[:SEARCH_MAX_CHARS]
+    doc.entities_json = None
+
+
+# ------------------------------
+# Reading
+# ------------------------------
+def get_payload(doc) -> DocumentPayload | None:
+    return db.session.get(DocumentPayload, doc.id)
+
+
+def text_size(doc) -> int:
+    """UTF-8 size of the full text, without loading the payload."""
+    size = (db.session.query(DocumentPayload.text_bytes)
+            .filter(DocumentPayload.document_id == doc.id).scalar())
+    if size is None:
+        return len((doc.text or "").encode("utf-8"))
+    return size
+
+
+def load_text(doc) -> str:
+    """Full text of a document (documents.text for rows stored before payloads)."""
+    payload = get_payload(doc)
+    if payload is None:
+        return doc.text or ""
+    return decompress(payload.text_blob, payload.codec).decode("utf-8")
+
+
+def load_entities_json(doc) -> str:
+    """Entities of a document as the JSON string stored at completion."""
+    payload = get_payload(doc)
+    if payload is None:
+        return doc.entities_json or "[]"
+    return decompress(payload.entities_blob, payload.codec).decode("utf-8")
+
+
+def load_entities(doc) -> list[dict]:
+    return json.loads(load_entities_json(doc))
+
+
+def text_stream(doc, start: int = 0, stop: int | None = None):
+    """
+    Return (total UTF-8 size, iterator over bytes [start, stop) of the full
+    text). Only the part of the payload up to `stop` is decompressed.
+    """
+    payload = get_payload(doc)
+    if payload is None:
+        raw = (doc.text or "").encode("utf-8")
+        stop = len(raw) if stop is None else min(stop, len(raw))
+        return len(raw), iter([raw[start:stop]] if start < stop else [])
+
+    total = payload.text_bytes
+    stop = total if stop is None else min(stop, total)
+
+    def generate():
+        pos = 0
+        for piece in iter_decompress(payload.text_blob, payload.codec):
+            end = pos + len(piece)
+            if end > start:
+                yield piece[max(start - pos, 0):stop - pos]
+            pos = end
+            if pos >= stop:
+                return
+
+    return total, generate()
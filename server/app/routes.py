@@ -1,15 +1,34 @@
+import os
+import re
 import json
-from flask import Blueprint, request, jsonify
+import time
+import uuid
+import hashlib
+import tarfile
+import zipfile
+import mimetypes
+from collections import Counter
+from flask import Blueprint, request, jsonify, g, Response, send_file, stream_with_context
 import logging
-from sqlalchemy import text
+from sqlalchemy import text, insert, select, literal
+from sqlalchemy.orm import undefer
 from .models import Job, User
 from . import db, bcrypt
 
-from status_store import StatusStore
+from status_store import StatusStore, EVENTS_PREFIX, TERMINAL_STATUSES
+from metrics import METRICS
 from werkzeug.utils import secure_filename
-from .models import Document
-from storage import upload_file, generate_signed_url
-from tasks import process_document
+from .models import Document, DocumentPage, DocumentPayload
+from .payloads import load_text, load_entities_json, text_size, text_stream
+from .http_cache import (cached_response, json_response, compress_response,
+                         CACHE_IMMUTABLE, CACHE_REVALIDATE)
+from .search import (fulltext_search, trigram_search, SEARCH_DEFAULT_LIMIT,
+                     SEARCH_MAX_LIMIT, SEARCH_MODES, SIMILARITY_THRESHOLD)
+from itsdangerous import BadSignature
+from storage import (upload_file, delete_object, create_upload_session, object_size,
+                     local_file, verify_local, UPLOAD_URL_MINUTES)
+from task_queue import enqueue_document, enqueue_documents
+from url_cache import SignedUrlCache
 from datetime import datetime
 from flask_login import login_required, login_user, login_manager
 
@@ -23,6 +42,29 @@ logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 STATUS = StatusStore()
+SIGNED_URLS = SignedUrlCache()
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Status streams send a comment line this often when nothing changed, and
+# are closed after SSE_MAX_SECONDS (EventSource reconnects on its own).
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+SSE_MAX_SECONDS = float(os.environ.get("SSE_MAX_SECONDS", 600))
+SSE_MAX_JOBS = 200
+STATUS_MAX_IDS = 500
+# Documents per /api/download?ids= request (one page of search results).
+DOWNLOAD_MAX_IDS = 100
+
+# Rows fetched per round trip when streaming /api/result/<job_id>/pages.
+PAGES_STREAM_BATCH = 50
+
+# Batch ingestion: at most this many files per request; other entries are skipped.
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", 5000))
+BATCH_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff")
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# "bytes 0-1023/4096", "bytes 0-1023/*" or "bytes */4096" (resumable upload status query)
+CONTENT_RANGE_RE = re.compile(r"^bytes (?:(?P<start>\d+)-(?P<end>\d+)|\*)/(?P<total>\d+|\*)$")
 
 # --- Flask-Login user loader ---
 # @login_manager.user_loader
@@ -35,7 +77,61 @@ STATUS = StatusStore()
 # ------------------------------
 @api_bp.route('/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'ok'})
+    # Without Redis the API can neither queue jobs nor report their status.
+    if not STATUS.ping():
+        return jsonify({'status': 'degraded', 'redis_status': 'disconnected'}), 503
+    return jsonify({'status': 'ok', 'redis_status': 'connected'})
+
+
+# ------------------------------
+# Request Latency
+# ------------------------------
+@api_bp.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@api_bp.after_request
+def record_latency(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        METRICS.observe("http_request_seconds", time.perf_counter() - started,
+                        endpoint=request.endpoint or "unknown",
+                        method=request.method,
+                        status=response.status_code)
+        METRICS.flush()
+    return response
+
+
+@api_bp.after_request
+def compress_body(response):
+    return compress_response(response)
+
+
+# ------------------------------
+# Metrics
+# ------------------------------
+@api_bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+
+@api_bp.route('/metrics/redis', methods=['GET'])
+def redis_memory():
+    sample = min(request.args.get("sample", 500, type=int), 10000)
+    inflight = request.args.get("inflight", type=int)
+    return jsonify(STATUS.memory_report(sample=sample, inflight=inflight))
+
+
+@api_bp.route('/metrics/jobs/<job_id>', methods=['GET'])
+def job_metrics(job_id):
+    timings = METRICS.job_timings(job_id)
+    if not timings:
+        job = Job.query.filter_by(job_id=job_id).first()
+        if not job:
+            return jsonify({"error": f"Job ID '{job_id}' not found"}), 404
+        timings = json.loads(job.timings_json or "{}")
+    return jsonify({"job_id": job_id, "timings": timings})
 
 
 # ------------------------------
@@ -133,9 +229,17 @@ def upload():
         return jsonify({"error": "No selected file"}), 400
 
     filename = secure_filename(f.filename)
+    content_hash, size, pages = _scan_upload(f.stream)
+
+    cached = _find_cached_document(content_hash)
+    if cached:
+        job_id = _complete_from_cache(cached, filename, f.mimetype or "")
+        return jsonify({"job_id": job_id, "cached": True}), 200
+    METRICS.inc("result_cache_requests_total", result="miss")
+
     job_id = STATUS.new_job(filename)
 
-    logger.info(f"Starting new job: {job_id}, filename={filename}")
+    logger.info(f"Starting new job: {job_id}, filename={filename}, sha256={content_hash}")
 
     try:
         # ---- STEP 1: Create Document row ----
@@ -145,6 +249,7 @@ def upload():
             mime=f.mimetype or "",
             gcs_uri="",
             status="UPLOADING",
+            content_hash=content_hash,
             user_id=getattr(request, "user_id", None)  # optional user linking
         )
 
@@ -169,11 +274,22 @@ def upload():
         STATUS.update(job_id, status="UPLOADING", progress=20, stage="Uploading to GCS")
 
         # ---- STEP 2: Upload file to cloud storage ----
-        dest = f"uploads/{job_id}/{filename}"
-        logger.info(f"Uploading file to GCS: {dest}")
+        # Identical bytes already in storage (e.g. still being processed)
+        # are reused instead of uploaded again.
+        existing = (
+            Document.query
+            .filter(Document.content_hash == content_hash, Document.gcs_uri != "")
+            .first()
+        )
+        if existing:
+            gcs_uri = existing.gcs_uri
+            logger.info(f"Reusing stored object for identical upload: {gcs_uri}")
+        else:
+            dest = f"uploads/{job_id}/{filename}"
+            logger.info(f"Uploading file to GCS: {dest}")
 
-        gcs_uri = upload_file(f, dest, content_type=f.mimetype)
-        logger.info(f"Uploaded to GCS: {gcs_uri}")
+            gcs_uri = upload_file(f, dest, content_type=f.mimetype)
+            logger.info(f"Uploaded to GCS: {gcs_uri}")
 
         # ---- STEP 3: Update Document DB row after GCS upload ----
         logger.info("Fetching document to update...")
@@ -195,11 +311,13 @@ def upload():
         db.session.commit()
         logger.info("Document updated in DB after GCS upload.")
 
-        STATUS.update(job_id, status="QUEUED", progress=40, stage="Queued for OCR", gcs_uri=gcs_uri)
+        STATUS.update(job_id, status="QUEUED", progress=40, stage="Queued for OCR", gcs_uri=gcs_uri,
+                      queued_at=f"{time.time():.3f}")
 
         # ---- STEP 4: Enqueue OCR task ----
         logger.info("Sending OCR task to Celery worker...")
-        process_document.delay(job_id, gcs_uri, filename)
+        queue = enqueue_document(job_id, gcs_uri, filename, size=size, pages=pages)
+        logger.info(f"Job {job_id} routed to {queue} ({size} bytes, ~{pages or '?'} pages)")
 
         return jsonify({"job_id": job_id}), 200
 
@@ -209,17 +327,669 @@ def upload():
         return jsonify({"error": str(e)}), 500
     
 
+# ------------------------------
+# Batch Upload
+# ------------------------------
+@api_bp.route("/upload/batch", methods=["POST"])
+def upload_batch():
+    """
+    Ingest many documents in one request: any number of "files" parts, each a
+    document or a ZIP/TAR archive. Archive entries are streamed to storage one
+    at a time, rows are bulk-inserted in one transaction and the jobs are
+    enqueued together. Progress is reported by /api/batch/<batch_id>.
+    """
+    uploads = request.files.getlist("files") + request.files.getlist("file")
+    if not uploads:
+        return jsonify({"error": "No files"}), 400
+
+    batch_id = str(uuid.uuid4())
+    logger.info(f"Starting batch {batch_id} with {len(uploads)} parts")
+    too_many = f"at most {BATCH_MAX_FILES} files per batch"
+    entries, skipped = [], []
+    try:
+        # Documents and ZIP members are counted before anything is uploaded;
+        # streamed TARs can only be counted while they are read.
+        if _count_batch_entries(uploads) > BATCH_MAX_FILES:
+            return jsonify({"error": too_many}), 413
+        for f in uploads:
+            for name, stream in _iter_batch_entries(f):
+                filename = _batch_filename(name)
+                if not filename:
+                    skipped.append(name)
+                    continue
+                if len(entries) >= BATCH_MAX_FILES:
+                    _delete_batch_objects(batch_id, entries)
+                    return jsonify({"error": too_many}), 413
+                entries.append(_store_batch_entry(filename, stream))
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        logger.warning(f"Batch {batch_id}: unreadable archive: {e}")
+        _delete_batch_objects(batch_id, entries)
+        return jsonify({"error": f"unreadable archive: {e}"}), 400
+    except Exception:
+        _delete_batch_objects(batch_id, entries)
+        raise
+    if not entries:
+        return jsonify({"error": "No supported files", "skipped": skipped}), 400
+
+    cached = _find_cached_documents([e["content_hash"] for e in entries])
+    queued_at = f"{time.time():.3f}"
+    try:
+        doc_rows, job_rows, records, to_enqueue = [], [], [], []
+        for e in entries:
+            src = cached.get(e["content_hash"])
+            doc = {
+                "job_id": e["job_id"],
+                "filename": e["filename"],
+                "mime": e["mime"],
+                "gcs_uri": e["gcs_uri"],
+                "content_hash": e["content_hash"],
+                "status": "COMPLETED" if src else "QUEUED",
+                "user_id": getattr(request, "user_id", None),
+                # One executemany statement: every row needs the same keys.
+                "text": src.text if src else None,
+                "entities_json": src.entities_json if src else None,
+                "tags_json": src.tags_json if src else None,
+                "search_vector": src.search_vector if src else None,
+            }
+            doc_rows.append(doc)
+            state = ({"status": "COMPLETED", "progress": 100, "stage": "Done (cached)"} if src
+                     else {"status": "QUEUED", "progress": 40, "stage": "Queued for OCR"})
+            job_rows.append({"job_id": e["job_id"], "filename": e["filename"], "mime": e["mime"],
+                             "gcs_uri": e["gcs_uri"], "batch_id": batch_id, **state})
+            records.append({"id": e["job_id"], "filename": e["filename"], "gcs_uri": e["gcs_uri"],
+                            "batch_id": batch_id, "queued_at": None if src else queued_at, **state})
+            if not src:
+                to_enqueue.append((e["job_id"], e["gcs_uri"], e["filename"], e["size"]))
+
+        doc_ids = dict(db.session.execute(
+            insert(Document).returning(Document.job_id, Document.id), doc_rows).all())
+        for row in job_rows:
+            row["document_id"] = doc_ids[row["job_id"]]
+        db.session.execute(insert(Job), job_rows)
+        for e in entries:
+            src = cached.get(e["content_hash"])
+            if src:
+                _copy_payload(src.id, doc_ids[e["job_id"]])
+                _copy_pages(src.id, doc_ids[e["job_id"]])
+        db.session.commit()
+    except Exception as e:
+        logger.exception(f"Error during batch {batch_id} processing.")
+        db.session.rollback()
+        _delete_batch_objects(batch_id, entries)
+        return jsonify({"error": str(e)}), 500
+
+    STATUS.new_jobs(records)
+    enqueue_documents(to_enqueue)
+    hits = len(entries) - len(to_enqueue)
+    if hits:
+        METRICS.inc("result_cache_requests_total", hits, result="hit")
+    if to_enqueue:
+        METRICS.inc("result_cache_requests_total", len(to_enqueue), result="miss")
+    logger.info(f"Batch {batch_id}: {len(to_enqueue)} queued, {hits} cached, {len(skipped)} skipped")
+
+    return jsonify({
+        "batch_id": batch_id,
+        "jobs": [{"job_id": e["job_id"], "filename": e["filename"],
+                  "cached": e["content_hash"] in cached} for e in entries],
+        "skipped": skipped,
+    }), 200
+
+
+@api_bp.route("/batch/<batch_id>", methods=["GET"])
+def batch_status(batch_id):
+    """Aggregate progress of a batch; ?jobs=1 also returns each job's status."""
+    job_ids = [j for (j,) in db.session.query(Job.job_id).filter_by(batch_id=batch_id)]
+    if not job_ids:
+        return jsonify({"error": f"Batch '{batch_id}' not found"}), 404
+
+    states = STATUS.get_many(job_ids)
+    missing = [j for j in job_ids if j not in states]
+    if missing:
+        for job in Job.query.filter(Job.job_id.in_(missing)):
+            STATUS.restore(job.job_id, job.status_record())
+            states[job.job_id] = job.status_record()
+
+    by_status = Counter(s.get("status") for s in states.values())
+    payload = {
+        "batch_id": batch_id,
+        "total": len(job_ids),
+        "done": by_status["COMPLETED"] + by_status["FAILED"],
+        "progress": round(sum(int(s.get("progress") or 0) for s in states.values()) / len(job_ids)),
+        "by_status": dict(by_status),
+    }
+    if request.args.get("jobs") == "1":
+        payload["jobs"] = {j: _status_payload(j, s) for j, s in states.items()}
+    return jsonify(payload)
+
+
+def _iter_batch_entries(f):
+    """Yield (name, file object) for an uploaded document, or for each entry of an archive."""
+    name = f.filename or ""
+    lower = name.lower()
+    if lower.endswith(".zip"):
+        # The upload is spooled to a seekable temp file, so members are read
+        # from it one at a time without loading the archive into memory.
+        with zipfile.ZipFile(f.stream) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and not _is_archive_junk(info.filename):
+                    with zf.open(info) as fh:
+                        yield info.filename, fh
+    elif lower.endswith(TAR_EXTENSIONS):
+        # "r|*" reads the tar as a forward-only stream, with any compression.
+        with tarfile.open(fileobj=f.stream, mode="r|*") as tf:
+            for member in tf:
+                if member.isfile() and not _is_archive_junk(member.name):
+                    yield member.name, tf.extractfile(member)
+    else:
+        yield name, f.stream
+
+
+def _is_archive_junk(name):
+    return name.startswith("__MACOSX/") or os.path.basename(name).startswith(".")
+
+
+def _batch_filename(name):
+    """Storage filename of a batch entry, or None if its type is not supported."""
+    filename = secure_filename(os.path.basename(name))
+    return filename if filename.lower().endswith(BATCH_EXTENSIONS) else None
+
+
+def _count_batch_entries(uploads):
+    """Supported documents in the uploads, reading only ZIP directories (TARs count as 0)."""
+    count = 0
+    for f in uploads:
+        lower = (f.filename or "").lower()
+        if lower.endswith(".zip"):
+            with zipfile.ZipFile(f.stream) as zf:
+                count += sum(1 for info in zf.infolist()
+                             if not info.is_dir() and not _is_archive_junk(info.filename)
+                             and _batch_filename(info.filename))
+            f.stream.seek(0)
+        elif not lower.endswith(TAR_EXTENSIONS):
+            count += 1 if _batch_filename(f.filename or "") else 0
+    return count
+
+
+def _delete_batch_objects(batch_id, entries):
+    """Remove the objects of a batch that was rejected or failed before its jobs existed."""
+    for e in entries:
+        try:
+            delete_object(e["gcs_uri"])
+        except Exception as err:
+            logger.warning(f"Batch {batch_id}: could not delete {e['gcs_uri']}: {err}")
+
+
+class _HashingReader:
+    """File wrapper that hashes bytes as the storage upload reads them."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.digest = hashlib.sha256()
+        self.pos = 0
+
+    def read(self, size=-1):
+        chunk = self.fh.read(size)
+        self.digest.update(chunk)
+        self.pos += len(chunk)
+        return chunk
+
+    def tell(self):
+        return self.pos
+
+
+def _store_batch_entry(filename, stream):
+    """Upload one batch entry under a new job id; returns the row fields."""
+    job_id = str(uuid.uuid4())
+    mime = mimetypes.guess_type(filename)[0] or ""
+    reader = _HashingReader(stream)
+    gcs_uri = upload_file(reader, f"uploads/{job_id}/{filename}", content_type=mime or None)
+    return {"job_id": job_id, "filename": filename, "mime": mime, "gcs_uri": gcs_uri,
+            "content_hash": reader.digest.hexdigest(), "size": reader.pos}
+
+
+# ------------------------------
+# Direct-to-Storage Upload
+# ------------------------------
+@api_bp.route("/upload/init", methods=["POST"])
+def upload_init():
+    """
+    Start a direct upload. Body: {"filename", "size", "mime"}.
+    Returns a signed resumable upload URL; the client PUTs the file there and
+    then calls /api/upload/<job_id>/finalize. No file bytes pass through the API.
+    """
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get("filename") or "")
+    if not filename:
+        return jsonify({"error": "filename is required"}), 400
+    mime = data.get("mime") or ""
+    try:
+        size = int(data["size"]) if data.get("size") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "size must be an integer"}), 400
+
+    job_id = STATUS.new_job(filename)
+    logger.info(f"Starting direct upload: {job_id}, filename={filename}, size={size}")
+
+    try:
+        gcs_uri, upload_url = create_upload_session(
+            f"uploads/{job_id}/{filename}", content_type=mime or None, size=size,
+            origin=request.headers.get("Origin"))
+
+        doc = Document(
+            job_id=job_id,
+            filename=filename,
+            mime=mime,
+            gcs_uri=gcs_uri,
+            status="UPLOADING",
+            user_id=getattr(request, "user_id", None)
+        )
+        db.session.add(doc)
+        db.session.flush()
+
+        db.session.add(Job(
+            job_id=job_id,
+            filename=filename,
+            mime=mime,
+            gcs_uri=gcs_uri,
+            status="UPLOADING",
+            progress=20,
+            stage="Waiting for upload",
+            document_id=doc.id
+        ))
+        db.session.commit()
+    except Exception as e:
+        logger.exception("Error during /upload/init processing.")
+        db.session.rollback()
+        STATUS.update(job_id, status="FAILED", stage=f"Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    STATUS.update(job_id, status="UPLOADING", progress=20, stage="Waiting for upload")
+    return jsonify({
+        "job_id": job_id,
+        "upload_url": upload_url,
+        "method": "PUT",
+        "expires_in": UPLOAD_URL_MINUTES * 60,
+    }), 200
+
+
+@api_bp.route("/upload/<job_id>/finalize", methods=["POST"])
+def upload_finalize(job_id):
+    """Queue OCR for a direct upload once the object is in storage. Idempotent."""
+    job = Job.query.filter_by(job_id=job_id).first()
+    if not job:
+        return jsonify({"error": "job not found"}), 404
+    if job.status != "UPLOADING":
+        return jsonify({"job_id": job_id, "status": job.status}), 200
+
+    size = object_size(job.gcs_uri)
+    if size is None:
+        return jsonify({"error": "upload not complete"}), 409
+
+    # Conditional update so concurrent finalize calls enqueue the job once.
+    now = datetime.utcnow()
+    claimed = (
+        Job.query.filter_by(job_id=job_id, status="UPLOADING")
+        .update({"status": "QUEUED", "progress": 40, "stage": "Queued for OCR", "updated_at": now},
+                synchronize_session=False)
+    )
+    Document.query.filter_by(job_id=job_id).update(
+        {"status": "QUEUED", "updated_at": now}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return jsonify({"job_id": job_id, "status": "QUEUED"}), 200
+
+    STATUS.update(job_id, status="QUEUED", progress=40, stage="Queued for OCR", gcs_uri=job.gcs_uri,
+                  queued_at=f"{time.time():.3f}")
+    logger.info(f"Direct upload finalized: {job_id} ({size} bytes), sending OCR task")
+    enqueue_document(job_id, job.gcs_uri, job.filename, size=size)
+    return jsonify({"job_id": job_id, "status": "QUEUED", "size": size}), 200
+
+
+# ------------------------------
+# Local Storage Stand-in (LOCAL_STORAGE_DIR)
+# ------------------------------
+@api_bp.route("/storage/upload/<token>", methods=["PUT"])
+def local_storage_upload(token):
+    """
+    Resumable upload session compatible with the GCS protocol: PUT the whole
+    body, or chunks with Content-Range; "bytes */<total>" queries progress.
+    Incomplete sessions answer 308 with the persisted Range.
+    """
+    try:
+        uri = verify_local(token, "put")
+    except BadSignature:
+        return jsonify({"error": "invalid or expired upload URL"}), 403
+
+    path = local_file(uri)
+    if os.path.exists(path):
+        return jsonify({"uri": uri, "size": os.path.getsize(path)}), 200
+    part = path + ".part"
+    received = os.path.getsize(part) if os.path.exists(part) else 0
+
+    header = request.headers.get("Content-Range")
+    m = CONTENT_RANGE_RE.match(header) if header else None
+    if header and not m:
+        return jsonify({"error": "invalid Content-Range"}), 400
+    total = int(m.group("total")) if m and m.group("total") != "*" else None
+
+    if m and m.group("start") is None:
+        return _resume_incomplete(received)
+    start = int(m.group("start")) if m else 0
+    if start not in (0, received):
+        # Chunks must continue at the persisted offset; tell the client where that is.
+        return _resume_incomplete(received)
+
+    # A whole-body PUT or a chunk at offset 0 starts over; any stale part
+    # left by an earlier, failed attempt is discarded.
+    received = start
+    os.makedirs(os.path.dirname(part), exist_ok=True)
+    with open(part, "ab" if start else "wb") as out:
+        for chunk in iter(lambda: request.stream.read(HASH_CHUNK_SIZE), b""):
+            received += len(chunk)
+            if total is not None and received > total:
+                break
+            out.write(chunk)
+    if total is not None and received > total:
+        os.remove(part)
+        return jsonify({"error": f"more than the declared {total} bytes"}), 400
+
+    if not m or received == total:
+        os.replace(part, path)
+        return jsonify({"uri": uri, "size": received}), 200
+    return _resume_incomplete(received)
+
+
+def _resume_incomplete(received: int):
+    headers = {"Range": f"bytes=0-{received - 1}"} if received else {}
+    return Response(status=308, headers=headers)
+
+
+@api_bp.route("/storage/object/<token>", methods=["GET"])
+def local_storage_object(token):
+    """Signed download of a local object (supports Range requests)."""
+    try:
+        uri = verify_local(token, "get")
+    except BadSignature:
+        return jsonify({"error": "invalid or expired URL"}), 403
+    path = local_file(uri)
+    if not os.path.exists(path):
+        return jsonify({"error": "not found"}), 404
+    return send_file(path, conditional=True)
+
+
+# ------------------------------
+# Upload by Content Hash
+# ------------------------------
+@api_bp.route("/upload/hash/<sha256>", methods=["GET", "POST"])
+def upload_by_hash(sha256):
+    """
+    GET reports whether a processed result exists for these bytes.
+    POST {"filename": ...} creates a completed job from it without an upload.
+    """
+    sha256 = sha256.lower()
+    cached = _find_cached_document(sha256)
+
+    if request.method == "GET":
+        known = cached is not None or Document.query.filter_by(content_hash=sha256).first() is not None
+        return jsonify({"sha256": sha256, "exists": known, "cached": cached is not None})
+
+    if not cached:
+        METRICS.inc("result_cache_requests_total", result="miss")
+        return jsonify({"error": "not cached"}), 404
+
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get("filename") or cached.filename or "document")
+    job_id = _complete_from_cache(cached, filename, data.get("mime") or cached.mime or "")
+    return jsonify({"job_id": job_id, "cached": True}), 200
+
+
+# Page objects in an uncompressed PDF cross-reference ("/Type /Page", not "/Pages").
+PDF_PAGE_RE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+def _scan_upload(stream) -> tuple[str, int, int | None]:
+    """
+    Hash an upload stream in chunks and rewind it for the storage upload.
+    Returns (sha256, size, estimated PDF page count or None). Pages inside
+    compressed object streams are not visible, so 0 matches means unknown.
+    """
+    digest = hashlib.sha256()
+    size, pages, tail = 0, 0, b""
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+        # Carry a short tail so markers split across chunks are still counted once.
+        window = tail + chunk
+        pages += len(PDF_PAGE_RE.findall(window)) - len(PDF_PAGE_RE.findall(tail))
+        tail = window[-32:]
+    stream.seek(0)
+    return digest.hexdigest(), size, max(pages, 0) or None
+
+
+def _find_cached_document(content_hash):
+    """Return a completed Document with the same content hash, if any."""
+    return (
+        Document.query
+        .filter_by(content_hash=content_hash, status="COMPLETED")
+        .order_by(Document.id.desc())
+        .first()
+    )
+
+
+def _find_cached_documents(content_hashes):
+    """Map content hash -> newest completed Document, for the given hashes."""
+    found = {}
+    for d in (Document.query
+              .options(undefer(Document.text), undefer(Document.entities_json), undefer(Document.search_vector))
+              .filter(Document.content_hash.in_(set(content_hashes)), Document.status == "COMPLETED")
+              .order_by(Document.id)):
+        found[d.content_hash] = d
+    return found
+
+
+def _copy_pages(src_document_id, dst_document_id):
+    """Copy the per-page results of a cached document to a new one (INSERT ... SELECT)."""
+    cols = ("page_no", "source", "text", "char_start", "char_end")
+    db.session.execute(
+        insert(DocumentPage).from_select(
+            ("document_id",) + cols,
+            select(literal(dst_document_id), *(getattr(DocumentPage, c) for c in cols))
+            .where(DocumentPage.document_id == src_document_id),
+        )
+    )
+
+
+def _copy_payload(src_document_id, dst_document_id):
+    """Copy the compressed text/entities of a cached document to a new one (INSERT ... SELECT)."""
+    cols = ("codec", "text_blob", "entities_blob", "text_chars", "text_bytes")
+    db.session.execute(
+        insert(DocumentPayload).from_select(
+            ("document_id",) + cols,
+            select(literal(dst_document_id), *(getattr(DocumentPayload, c) for c in cols))
+            .where(DocumentPayload.document_id == src_document_id),
+        )
+    )
+
+
+def _complete_from_cache(src, filename, mime):
+    """Create a new, already completed job that reuses src's results."""
+    job_id = STATUS.new_job(filename)
+    logger.info(f"Result cache hit: job {job_id} reuses document {src.id} ({src.content_hash})")
+
+    doc = Document(
+        job_id=job_id,
+        filename=filename,
+        mime=mime,
+        gcs_uri=src.gcs_uri,
+        status="COMPLETED",
+        content_hash=src.content_hash,
+        text=src.text,
+        entities_json=src.entities_json,
+        tags_json=src.tags_json,
+        search_vector=src.search_vector,
+        user_id=getattr(request, "user_id", None)
+    )
+    db.session.add(doc)
+    db.session.flush()
+    _copy_payload(src.id, doc.id)
+    _copy_pages(src.id, doc.id)
+
+    db.session.add(Job(
+        job_id=job_id,
+        filename=filename,
+        mime=mime,
+        gcs_uri=src.gcs_uri,
+        status="COMPLETED",
+        progress=100,
+        stage="Done (cached)",
+        document_id=doc.id
+    ))
+    db.session.commit()
+
+    STATUS.update(job_id, status="COMPLETED", progress=100, stage="Done (cached)", gcs_uri=src.gcs_uri)
+    METRICS.inc("result_cache_requests_total", result="hit")
+    return job_id
+
+
 # ------------------------------
 # Status Check
 # ------------------------------
 @api_bp.route("/status/<job_id>", methods=["GET"])
 def status(job_id):
     logger.info(f"Fetching status for job_id: {job_id}")
+    # Terminal states never change, so they are served from the response cache.
+    cached = cached_response("status:" + job_id)
+    if cached:
+        return cached
+
+    # Redis holds the live state; Postgres is only consulted (and Redis
+    # repopulated from it) when the record is missing, e.g. after a restart.
+    state = STATUS.get(job_id)
+    if state:
+        return _status_response(job_id, _status_payload(job_id, state))
+
     job = Job.query.filter_by(job_id=job_id).first()
     if not job:
         logger.warning(f"Job ID not found: {job_id}")
         return jsonify({"error": f"Job ID '{job_id}' not found"}), 404
-    return jsonify(job.to_dict())
+    STATUS.restore(job_id, job.status_record())
+    return _status_response(job_id, job.to_dict())
+
+
+def _status_response(job_id, payload):
+    if payload.get("status") in TERMINAL_STATUSES:
+        return json_response(payload, CACHE_IMMUTABLE, cache_key="status:" + job_id)
+    return json_response(payload, CACHE_REVALIDATE)
+
+
+@api_bp.route("/status", methods=["GET"])
+def status_many():
+    job_ids = list(dict.fromkeys(j for j in request.args.get("ids", "").split(",") if j))
+    if not job_ids:
+        return jsonify({"error": "ids is required"}), 400
+    if len(job_ids) > STATUS_MAX_IDS:
+        return jsonify({"error": f"at most {STATUS_MAX_IDS} ids per request"}), 400
+    logger.info(f"Fetching status for {len(job_ids)} jobs")
+
+    states = STATUS.get_many(job_ids)
+    jobs = {job_id: _status_payload(job_id, state) for job_id, state in states.items()}
+
+    missing = [j for j in job_ids if j not in states]
+    if missing:
+        for job in Job.query.filter(Job.job_id.in_(missing)):
+            STATUS.restore(job.job_id, job.status_record())
+            jobs[job.job_id] = job.to_dict()
+    return json_response({"jobs": jobs, "missing": [j for j in job_ids if j not in jobs]})
+
+
+def _status_payload(job_id, state):
+    """Shape a Redis status record like Job.to_dict() for API clients."""
+    payload = {k: v for k, v in state.items() if k not in ("id", "text", "entities")}
+    payload["job_id"] = job_id
+    payload["progress"] = int(payload.get("progress", 0))
+    return payload
+
+
+# ------------------------------
+# Status Streams (Server-Sent Events)
+# ------------------------------
+@api_bp.route("/status/<job_id>/stream", methods=["GET"])
+def status_stream(job_id):
+    return _sse_response([job_id])
+
+
+@api_bp.route("/status/stream", methods=["GET"])
+def status_stream_many():
+    job_ids = [j for j in request.args.get("ids", "").split(",") if j]
+    if not job_ids:
+        return jsonify({"error": "ids is required"}), 400
+    if len(job_ids) > SSE_MAX_JOBS:
+        return jsonify({"error": f"at most {SSE_MAX_JOBS} ids per stream"}), 400
+    return _sse_response(job_ids)
+
+
+def _sse_response(job_ids):
+    job_ids = list(dict.fromkeys(job_ids))
+    # Subscribe before reading the snapshots, so an update published in
+    # between is delivered as a delta instead of being lost.
+    pubsub = STATUS.subscribe(job_ids)
+    snapshots = STATUS.get_many(job_ids)
+    missing = [j for j in job_ids if j not in snapshots]
+    if missing:
+        jobs = {job.job_id: job for job in Job.query.filter(Job.job_id.in_(missing))}
+        for job_id in missing:
+            if job_id not in jobs:
+                pubsub.close()
+                return jsonify({"error": f"Job ID '{job_id}' not found"}), 404
+            # As in status(): repopulate Redis, or worker updates to the
+            # missing record are dropped and never reach the stream.
+            STATUS.restore(job_id, jobs[job_id].status_record())
+            snapshots[job_id] = jobs[job_id].to_dict()
+    logger.info(f"Opening status stream for {len(job_ids)} job(s)")
+    return Response(
+        _status_events(job_ids, snapshots, pubsub),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse_event(job_id, fields):
+    data = {"job_id": job_id, **fields}
+    if "progress" in data:
+        data["progress"] = int(data["progress"])
+    return f"event: status\ndata: {json.dumps(data)}\n\n"
+
+
+def _status_events(job_ids, snapshots, pubsub):
+    """
+    Yield a full snapshot per job, then only deltas, until all jobs end.
+    pubsub must have been subscribed before the snapshots were read.
+    """
+    try:
+        pending = set(job_ids)
+        for job_id in job_ids:
+            yield _sse_event(job_id, snapshots[job_id])
+            if snapshots[job_id].get("status") in TERMINAL_STATUSES:
+                pending.discard(job_id)
+
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        while pending and time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=SSE_HEARTBEAT_SECONDS)
+            if message is None:
+                yield ": heartbeat\n\n"
+                continue
+            job_id = message["channel"].decode()[len(EVENTS_PREFIX):]
+            if job_id not in pending:
+                continue
+            delta = json.loads(message["data"])
+            yield _sse_event(job_id, delta)
+            if delta.get("status") in TERMINAL_STATUSES:
+                pending.discard(job_id)
+
+        if not pending:
+            yield "event: end\ndata: {}\n\n"
+    finally:
+        pubsub.close()
 
 
 # ------------------------------
@@ -228,19 +998,107 @@ def status(job_id):
 @api_bp.route("/result/<job_id>", methods=["GET"])
 def result(job_id):
     logger.info(f"Fetching result for job_id: {job_id}")
+    cached = cached_response("result:" + job_id)
+    if cached:
+        return cached
+
     job = Job.query.filter_by(job_id=job_id).first()
     if not job:
         return jsonify({"error": "not found"}), 404
     if job.status != "COMPLETED":
         logger.info(
             f"Job not completed yet: {job_id}, current status: {job.status}")
-        return jsonify({"error": "not ready", "status": job.status}), 409
+        return jsonify({"error": "not ready", "status": job.status}), 409, {"Cache-Control": "no-store"}
     doc = Document.query.filter_by(job_id=job_id).first()
-    return jsonify({
-        "text": doc.text or "",
-        "entities": doc.entities_json or "",
+    # Completed results never change: strong ETag, long max-age, kept in the LRU
+    return json_response({
+        "text": load_text(doc),
+        "entities": load_entities_json(doc),
         "tags": doc.tags_json or "",
-    })
+    }, CACHE_IMMUTABLE, cache_key="result:" + job_id)
+
+
+@api_bp.route("/result/<job_id>/text", methods=["GET"])
+def result_text(job_id):
+    """
+    Stream the full text as text/plain without building it in memory.
+    A Range: bytes=a-b header selects part of the UTF-8 text (206), and
+    ?pages=a-b selects pages (assembled from the per-page results).
+    """
+    doc = Document.query.filter_by(job_id=job_id).first()
+    if not doc:
+        return jsonify({"error": "not found"}), 404
+    if doc.status != "COMPLETED":
+        return jsonify({"error": "not ready", "status": doc.status}), 409
+
+    pages = request.args.get("pages")
+    if pages:
+        m = re.fullmatch(r"(\d+)(?:-(\d+))?", pages)
+        if not m:
+            return jsonify({"error": "pages must look like 3 or 3-7"}), 400
+        first, last = int(m.group(1)), int(m.group(2) or m.group(1))
+        query = (
+            db.session.query(DocumentPage.text)
+            .filter(DocumentPage.document_id == doc.id,
+                    DocumentPage.page_no.between(first, last))
+            .order_by(DocumentPage.page_no)
+        )
+
+        def generate_pages():
+            for i, (page_text,) in enumerate(query.yield_per(PAGES_STREAM_BATCH)):
+                yield ("\n" if i else "") + page_text
+
+        return Response(stream_with_context(generate_pages()), mimetype="text/plain")
+
+    size = text_size(doc)
+    status, headers = 200, {"Accept-Ranges": "bytes"}
+    start, stop = 0, size
+    if request.range:
+        byte_range = request.range.range_for_length(size)
+        if request.range.units != "bytes" or byte_range is None:
+            return Response(status=416, headers={"Content-Range": f"bytes */{size}"})
+        start, stop = byte_range
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+    headers["Content-Length"] = str(stop - start)
+
+    _, chunks = text_stream(doc, start, stop)
+    logger.info(f"Streaming text of {job_id}: bytes {start}-{stop} of {size}")
+    return Response(stream_with_context(chunks), status=status, mimetype="text/plain", headers=headers)
+
+
+@api_bp.route("/result/<job_id>/pages", methods=["GET"])
+def result_pages(job_id):
+    """
+    Stream the pages finished so far, as NDJSON (one page object per line),
+    while the job is still running. ?from=&to= select a page range.
+    """
+    doc = Document.query.filter_by(job_id=job_id).first()
+    if not doc:
+        return jsonify({"error": "not found"}), 404
+    first = max(request.args.get("from", 1, type=int), 1)
+    last = request.args.get("to", type=int)
+
+    query = (
+        DocumentPage.query
+        .filter(DocumentPage.document_id == doc.id, DocumentPage.page_no >= first)
+        .order_by(DocumentPage.page_no)
+    )
+    if last is not None:
+        query = query.filter(DocumentPage.page_no <= last)
+
+    state = STATUS.get(job_id)
+    headers = {
+        "X-Job-Status": state.get("status") or doc.status,
+        "X-Pages-Total": state.get("pages_total", ""),
+        "Cache-Control": "no-store",
+    }
+
+    def generate():
+        for page in query.yield_per(PAGES_STREAM_BATCH):
+            yield json.dumps(page.to_dict()) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson", headers=headers)
 
 
 # ------------------------------
@@ -249,18 +1107,25 @@ def result(job_id):
 @api_bp.route("/doc/<job_id>", methods=["GET"])
 def get_doc(job_id):
     logger.info(f"Fetching document details for job_id: {job_id}")
+    cached = cached_response("doc:" + job_id)
+    if cached:
+        return cached
+
     d = db.session.query(Document).filter_by(job_id=job_id).first()
     if not d:
         logger.warning(f"Document not found: {job_id}")
         return jsonify({"error": "not found"}), 404
-    return jsonify({
+    payload = {
         "id": d.id,
         "filename": d.filename,
         "mime": d.mime,
         "gcs_uri": d.gcs_uri,
         "status": d.status,
         "tags": json.loads(d.tags_json or "[]"),
-    })
+    }
+    if d.status in TERMINAL_STATUSES:
+        return json_response(payload, CACHE_IMMUTABLE, cache_key="doc:" + job_id)
+    return json_response(payload, CACHE_REVALIDATE)
 
 
 # ------------------------------
@@ -276,9 +1141,31 @@ def download_link(job_id):
     if not d.gcs_uri:
         logger.warning(f"No GCS URI found for document: {job_id}")
         return jsonify({"error": "no file"}), 400
-    url = generate_signed_url(d.gcs_uri, minutes=30)
+    entry = SIGNED_URLS.get(d.gcs_uri)
     logger.info(f"Generated signed URL for {job_id}")
-    return jsonify({"url": url})
+    return jsonify(entry), 200, {"Cache-Control": f"private, max-age={SIGNED_URLS.max_age(entry)}"}
+
+
+@api_bp.route("/download", methods=["GET"])
+def download_links():
+    """Signed URLs for several documents at once (?ids=job1,job2,...)."""
+    job_ids = list(dict.fromkeys(j for j in request.args.get("ids", "").split(",") if j))
+    if not job_ids:
+        return jsonify({"error": "ids is required"}), 400
+    if len(job_ids) > DOWNLOAD_MAX_IDS:
+        return jsonify({"error": f"at most {DOWNLOAD_MAX_IDS} ids per request"}), 400
+    logger.info(f"Generating signed URLs for {len(job_ids)} documents")
+
+    rows = (db.session.query(Document.job_id, Document.gcs_uri)
+            .filter(Document.job_id.in_(job_ids), Document.gcs_uri.isnot(None), Document.gcs_uri != "")
+            .all())
+    entries = SIGNED_URLS.get_many([uri for _, uri in rows])
+    urls = {job_id: entries[uri] for job_id, uri in rows}
+    max_age = min((SIGNED_URLS.max_age(e) for e in urls.values()), default=0)
+    return jsonify({
+        "urls": urls,
+        "missing": [j for j in job_ids if j not in urls],
+    }), 200, {"Cache-Control": f"private, max-age={max_age}"}
 
 
 # ------------------------------
@@ -286,27 +1173,22 @@ def download_link(job_id):
 # ------------------------------
 @api_bp.route("/search", methods=["GET"])
 def search():
-    q = request.args.get("q", "").strip().lower()
-    logger.info(f"Search request received for query: '{q}'")
+    q = request.args.get("q", "").strip()
+    limit = min(max(request.args.get("limit", SEARCH_DEFAULT_LIMIT, type=int), 1), SEARCH_MAX_LIMIT)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    mode = request.args.get("mode", "fts")
+    threshold = request.args.get("threshold", SIMILARITY_THRESHOLD, type=float)
+    logger.info(f"Search request received for query: '{q}' (mode={mode}, limit={limit}, offset={offset})")
+    if mode not in SEARCH_MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(SEARCH_MODES)}"}), 400
+    if not 0 <= threshold <= 1:
+        return jsonify({"error": "threshold must be between 0 and 1"}), 400
     if not q:
         return jsonify({"results": []})
 
-    results = []
-    docs = db.session.query(Document).all()
-    for d in docs:
-        hay = " ".join([
-            d.filename or "",
-            (d.text or "")[:5000].lower(),
-            " ".join(json.loads(d.tags_json or "[]")).lower(),
-            (d.entities_json or "").lower(),
-        ])
-        if q in hay:
-            results.append({
-                "id": d.id,
-                "job_id": d.job_id,
-                "filename": d.filename,
-                "status": d.status,
-                "tags": json.loads(d.tags_json or "[]"),
-            })
+    if mode == "fts":
+        results = fulltext_search(q, limit=limit, offset=offset)
+    else:
+        results = trigram_search(q, mode=mode, threshold=threshold, limit=limit, offset=offset)
     logger.info(f"Search completed. {len(results)} results found.")
-    return jsonify({"results": results})
\ No newline at end of file
+    return jsonify({"results": results, "limit": limit, "offset": offset})
@@ -0,0 +1,86 @@
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from . import db
+
+logger = logging.getLogger(__name__)
+
+# db.create_all() creates missing tables but never alters existing ones.
+# Columns added to a table after it first shipped are listed here and added
+# in place on start-up (all added columns are nullable, so this is cheap).
+ADDED_COLUMNS = (
+    ("documents", "content_hash"),
+    ("documents", "search_vector"),
+    ("jobs", "timings_json"),
+    ("jobs", "batch_id"),
+    ("jobs", "text_pages"),
+    ("jobs", "ocr_pages"),
+)
+# Indexes on those columns, and indexes added later to existing tables.
+# Building them on a large table takes minutes, so it is not done on
+# start-up but by the one-off `flask create-indexes` (see create_indexes).
+ADDED_INDEXES = (
+    "ix_documents_content_hash",
+    "ix_documents_search_vector",
+    "ix_documents_text_trgm",
+    "ix_documents_filename_trgm",
+    "ix_documents_tags_trgm",
+    "ix_jobs_batch_id",
+)
+
+
+def upgrade_schema():
+    """Add any missing ADDED_COLUMNS. Safe to run on every start."""
+    dialect = db.engine.dialect
+    tables = db.metadata.tables
+    inspector = inspect(db.engine)
+
+    for table_name, column_name in ADDED_COLUMNS:
+        if column_name in {c["name"] for c in inspector.get_columns(table_name)}:
+            continue
+        column = tables[table_name].c[column_name]
+        # IF NOT EXISTS keeps concurrently starting processes from colliding
+        # (SQLite has no such clause, nor concurrent starts).
+        guard = "IF NOT EXISTS " if dialect.name == "postgresql" else ""
+        db.session.execute(text(
+            f"ALTER TABLE {table_name} ADD COLUMN {guard}{column_name} {column.type.compile(dialect=dialect)}"))
+        logger.info("Added column %s.%s", table_name, column_name)
+    db.session.commit()
+
+
+def create_indexes() -> list[str]:
+    """
+    Build the ADDED_INDEXES an existing database lacks; returns their names.
+
+    On Postgres each index is built with CREATE INDEX CONCURRENTLY, which
+    does not block writes to the table, and an index left invalid by an
+    interrupted build is dropped and built again. Run it from a single
+    process, e.g. `flask create-indexes` after a deploy.
+    """
+    dialect = db.engine.dialect
+    indexes = {ix.name: ix for table in db.metadata.tables.values() for ix in table.indexes}
+    postgres = dialect.name == "postgresql"
+    created = []
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        existing = {ix["name"] for t in ("documents", "jobs") for ix in inspect(conn).get_indexes(t)}
+        invalid = set()
+        if postgres:
+            invalid = set(conn.scalars(text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE NOT i.indisvalid")))
+        for name in ADDED_INDEXES:
+            index = indexes[name]
+            if any(not k.startswith(dialect.name + "_") for k in index.dialect_kwargs):
+                continue  # dialect-specific index (e.g. GIN) on another database
+            if name in invalid:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                logger.info("Dropped invalid index %s", name)
+            elif name in existing:
+                continue
+            ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+            if postgres:
+                ddl = ddl.replace("CREATE INDEX ", "CREATE INDEX CONCURRENTLY ", 1)
+            logger.info("Creating index %s ...", name)
+            conn.execute(text(ddl))
+            created.append(name)
+    return created
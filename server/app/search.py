@@ -0,0 +1,279 @@
+import json
+import os
+import re
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import func, literal, or_, text as sql_text
+from sqlalchemy.orm import undefer
+from . import db
+from .models import Document
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration used for both indexing and querying.
+SEARCH_CONFIG = os.environ.get("SEARCH_CONFIG", "english")
+# Postgres caps a tsvector at 1 MB; longer texts are indexed up to this many chars.
+SEARCH_MAX_CHARS = int(os.environ.get("SEARCH_MAX_CHARS", 500000))
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Default minimum trigram (word) similarity for mode=similar.
+SIMILARITY_THRESHOLD = float(os.environ.get("SEARCH_SIMILARITY_THRESHOLD", 0.3))
+SEARCH_MODES = ("fts", "substring", "similar")
+# Look-back of NgramIndex.refresh, covering timestamps stored at whole seconds.
+REFRESH_OVERLAP = timedelta(seconds=1)
+
+
+def is_postgres() -> bool:
+    return db.engine.dialect.name == "postgresql"
+
+
+def ensure_search_extensions():
+    """Enable pg_trgm before create_all builds the trigram indexes."""
+    if is_postgres():
+        db.session.execute(sql_text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        db.session.commit()
+
+
+# ------------------------------
+# Indexing
+# ------------------------------
+def search_vector_expr(filename: str, text: str, tags: list[str], entities: list[dict]):
+    """
+    Build the weighted tsvector for a document:
+    filename (A) > tags (B) > entities (C) > full text (D).
+    """
+    def weighted(value, weight):
+        return func.setweight(func.to_tsvector(literal(SEARCH_CONFIG), literal(value)), weight)
+
+    entity_text = " ".join(e.get("text", "") for e in entities)
+    return (
+        weighted(re.sub(r"[_.\-]+", " ", filename or ""), "A")
+        .op("||")(weighted(" ".join(tags), "B"))
+        .op("||")(weighted(entity_text, "C"))
+        .op("||")(weighted((text or "")[:SEARCH_MAX_CHARS], "D"))
+    )
+
+
+def index_document(doc: Document, text: str, tags: list[str], entities: list[dict]):
+    """Set doc.search_vector from the full results; a no-op outside Postgres."""
+    if is_postgres():
+        doc.search_vector = search_vector_expr(doc.filename, text, tags, entities)
+
+
+def reindex_documents(batch_size: int = 500) -> int:
+    """
+    Build search vectors for completed documents that have none: those
+    stored before the column existed and cache copies made from them.
+    Run once after the upgrade (flask reindex-search); until then, fts
+    search does not find these documents.
+    """
+    if not is_postgres():
+        return 0
+    count = 0
+    while True:
+        docs = (
+            db.session.query(Document)
+            .filter(Document.search_vector.is_(None), Document.status == "COMPLETED")
+            .limit(batch_size)
+            .all()
+        )
+        if not docs:
+            return count
+        from .payloads import load_text, load_entities
+        for d in docs:
+            index_document(d, load_text(d), json.loads(d.tags_json or "[]"), load_entities(d))
+        db.session.commit()
+        count += len(docs)
+        logger.info("Reindexed %d documents", count)
+
+
+# ------------------------------
+# Querying
+# ------------------------------
+def _prefix_tsquery(q: str) -> str:
+    """'invoice acme co' -> 'invoice:* & acme:* & co:*' so partial words still match."""
+    terms = re.findall(r"\w+", q)
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+def _result(d, rank=None) -> dict:
+    item = {
+        "id": d.id,
+        "job_id": d.job_id,
+        "filename": d.filename,
+        "status": d.status,
+        "tags": json.loads(d.tags_json or "[]"),
+    }
+    if rank is not None:
+        item["rank"] = round(float(rank), 6)
+    return item
+
+
+def fulltext_search(q: str, limit: int = SEARCH_DEFAULT_LIMIT, offset: int = 0) -> list[dict]:
+    """Ranked search over filename, tags, entities and full text."""
+    if not is_postgres():
+        return scan_search(q, limit, offset)
+
+    tsquery_text = _prefix_tsquery(q)
+    if not tsquery_text:
+        return []
+    tsq = func.to_tsquery(literal(SEARCH_CONFIG), tsquery_text)
+    rank = func.ts_rank_cd(Document.search_vector, tsq).label("rank")
+    rows = (
+        db.session.query(Document.id, Document.job_id, Document.filename,
+                         Document.status, Document.tags_json, rank)
+        .filter(Document.search_vector.op("@@")(tsq))
+        .order_by(rank.desc(), Document.id.desc())
+        .limit(limit)
+        .offset(offset)
+        .all()
+    )
+    return [_result(r, r.rank) for r in rows]
+
+
+def trigram_search(q: str, mode: str = "substring", threshold: float = SIMILARITY_THRESHOLD,
+                   limit: int = SEARCH_DEFAULT_LIMIT, offset: int = 0) -> list[dict]:
+    """
+    Substring (mode=substring) or OCR-noise tolerant similarity (mode=similar)
+    search over text, filename and tags, served by pg_trgm GIN indexes.
+    """
+    if not is_postgres():
+        return NGRAM_INDEX.search(q, mode, threshold, limit, offset)
+
+    fields = (Document.text, Document.filename, Document.tags_json)
+    columns = (Document.id, Document.job_id, Document.filename, Document.status, Document.tags_json)
+    if mode == "substring":
+        pattern = "%" + re.sub(r"([%_\\])", r"\\\1", q) + "%"
+        query = (
+            db.session.query(*columns)
+            .filter(or_(*(f.ilike(pattern) for f in fields)))
+            .order_by(Document.id.desc())
+        )
+        return [_result(r) for r in query.limit(limit).offset(offset).all()]
+
+    # `q <% field` is index-assisted and honours this transaction-local threshold
+    db.session.execute(sql_text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+                       {"t": str(threshold)})
+    score = func.greatest(*(func.word_similarity(literal(q), f) for f in fields)).label("rank")
+    query = (
+        db.session.query(*columns, score)
+        .filter(or_(*(literal(q).op("<%")(f) for f in fields)))
+        .order_by(score.desc(), Document.id.desc())
+    )
+    return [_result(r, r.rank) for r in query.limit(limit).offset(offset).all()]
+
+
+def _trigrams(value: str) -> set[str]:
+    """pg_trgm-style trigrams: lowercase words padded with two leading and one trailing space."""
+    grams = set()
+    for word in re.findall(r"[a-z0-9]+", value.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _substring_grams(value: str) -> set[str]:
+    """Raw trigrams of a query string, usable to prefilter substring matches."""
+    value = value.lower()
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class NgramIndex:
+    """
+    In-process trigram index used when the database has no pg_trgm (SQLite/tests).
+
+    Postings map trigrams to document ids, so a query only touches documents
+    that share the query's trigrams instead of scanning the whole table.
+    Documents changed since the last query are re-indexed before searching.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.synced_at = None
+        self.docs = {}                       # id -> (haystack, result, word grams, raw grams)
+        self.word_grams = defaultdict(set)   # pg_trgm-style trigram -> ids
+        self.raw_grams = defaultdict(set)    # raw substring trigram -> ids
+
+    def add(self, d: Document):
+        self.remove(d.id)
+        hay = " ".join([d.text or "", d.filename or "", " ".join(json.loads(d.tags_json or "[]"))]).lower()
+        word, raw = _trigrams(hay), _substring_grams(hay)
+        self.docs[d.id] = (hay, _result(d), word, raw)
+        for g in word:
+            self.word_grams[g].add(d.id)
+        for g in raw:
+            self.raw_grams[g].add(d.id)
+
+    def remove(self, doc_id: int):
+        entry = self.docs.pop(doc_id, None)
+        if entry:
+            for g in entry[2]:
+                self.word_grams[g].discard(doc_id)
+            for g in entry[3]:
+                self.raw_grams[g].discard(doc_id)
+
+    def refresh(self):
+        """Index documents created or updated since the previous refresh."""
+        query = db.session.query(Document).options(undefer(Document.text))
+        if self.synced_at is not None:
+            # Re-scan the last second as well: SQLite stores CURRENT_TIMESTAMP
+            # without fractions, so rows written in the same second as
+            # synced_at compare below it. add() replaces already indexed rows.
+            query = query.filter(Document.updated_at >= self.synced_at - REFRESH_OVERLAP)
+        synced_at = db.session.query(func.max(Document.updated_at)).scalar()
+        count = 0
+        for d in query:
+            self.add(d)
+            count += 1
+        self.synced_at = synced_at or self.synced_at
+        if count:
+            logger.info("Indexed %d documents in the in-process trigram index", count)
+
+    def search(self, q: str, mode: str, threshold: float, limit: int, offset: int) -> list[dict]:
+        with self.lock:
+            self.refresh()
+        q = q.lower()
+        if mode == "substring":
+            grams = _substring_grams(q)
+            if grams:
+                candidates = set.intersection(*(self.raw_grams.get(g, set()) for g in grams))
+            else:
+                candidates = set(self.docs)
+            ids = sorted((i for i in candidates if q in self.docs[i][0]), reverse=True)
+            return [self.docs[i][1] for i in ids[offset:offset + limit]]
+
+        # word similarity: share of the query's trigrams present in the document
+        grams = _trigrams(q)
+        if not grams:
+            return []
+        shared = defaultdict(int)
+        for g in grams:
+            for i in self.word_grams.get(g, ()):
+                shared[i] += 1
+        scored = [(n / len(grams), i) for i, n in shared.items() if n / len(grams) >= threshold]
+        scored.sort(reverse=True)
+        return [dict(self.docs[i][1], rank=round(score, 6)) for score, i in scored[offset:offset + limit]]
+
+
+NGRAM_INDEX = NgramIndex()
+
+
+def scan_search(q: str, limit: int = SEARCH_DEFAULT_LIMIT, offset: int = 0) -> list[dict]:
+    """Substring scan used when no Postgres text index is available (e.g. SQLite)."""
+    q = q.lower()
+    results = []
+    query = db.session.query(Document).options(undefer(Document.text)).order_by(Document.id.desc())
+    for d in query:
+        tags = json.loads(d.tags_json or "[]")
+        hay = " ".join([
+            (d.filename or "").lower(),
+            (d.text or "").lower(),
+            " ".join(tags).lower(),
+        ])
+        if q in hay:
+            results.append(_result(d))
+            if len(results) >= offset + limit:
+                break
+    return results[offset:]
@@ -0,0 +1,319 @@
+"""
+Micro-benchmarks for the OCR service.
+
+Run from the server directory with the same environment as the API/worker:
+
+    python bench.py search --docs 10000 100000
+    python bench.py ocr scan.pdf receipt.png
+    python bench.py worker --tasks 200
+    python bench.py startup
+    python bench.py routing --jobs 5000 --bulk-share 0.1
+"""
+import argparse
+import heapq
+import json
+import logging
+import random
+import statistics
+import string
+import subprocess
+import sys
+import time
+import uuid
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
+)
+logger = logging.getLogger("bench")
+
+BENCH_PREFIX = "bench-"
+
+
+def _timed(fn, repeat: int) -> dict:
+    """Run fn `repeat` times and return latency stats in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def _random_words(rng: random.Random, vocab: list[str], n: int) -> str:
+    return " ".join(rng.choice(vocab) for _ in range(n))
+
+
+# -----------------------------------------------------------------------------
+# Search
+# -----------------------------------------------------------------------------
+def bench_search(args):
+    """Seed synthetic documents and time /api/search queries at each corpus size."""
+    from app import create_app, db
+    from app.models import Document
+    from app.search import fulltext_search, index_document, is_postgres
+
+    rng = random.Random(42)
+    vocab = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(20000)]
+    queries = [rng.choice(vocab) for _ in range(args.queries)]
+
+    app = create_app()
+    with app.app_context():
+        seeded = 0
+        try:
+            for target in sorted(args.docs):
+                while seeded < target:
+                    batch = min(1000, target - seeded)
+                    for _ in range(batch):
+                        text = _random_words(rng, vocab, args.words)
+                        tags = rng.sample(vocab, 8)
+                        doc = Document(
+                            job_id=BENCH_PREFIX + str(uuid.uuid4()),
+                            filename=f"{BENCH_PREFIX}{rng.choice(vocab)}.pdf",
+                            status="COMPLETED",
+                            text=text,
+                            tags_json=json.dumps(tags),
+                            entities_json="[]",
+                        )
+                        index_document(doc, text, tags, [])
+                        db.session.add(doc)
+                    db.session.commit()
+                    seeded += batch
+                if is_postgres():
+                    db.session.execute(db.text("ANALYZE documents"))
+
+                it = iter(queries * args.repeat)
+                stats = _timed(lambda: fulltext_search(next(it), limit=20), len(queries) * args.repeat)
+                logger.info("search docs=%d %s", target, json.dumps(stats))
+        finally:
+            if not args.keep:
+                db.session.query(Document).filter(Document.job_id.like(BENCH_PREFIX + "%")).delete(synchronize_session=False)
+                db.session.commit()
+
+
+# -----------------------------------------------------------------------------
+# OCR engines
+# -----------------------------------------------------------------------------
+def bench_ocr(args):
+    """Compare pages per second of the pytesseract and tesserocr backends."""
+    from PIL import Image
+    from pdf2image import convert_from_path
+    from tasks import make_engine
+
+    pages = []
+    for path in args.inputs:
+        if path.lower().endswith(".pdf"):
+            pages.extend(convert_from_path(path, dpi=args.dpi, last_page=args.max_pages))
+        else:
+            pages.append(Image.open(path).convert("RGB"))
+    if not pages:
+        raise SystemExit("no pages to OCR")
+
+    for name in ("pytesseract", "tesserocr"):
+        engine = make_engine(name)
+        if engine.name != name:
+            logger.info("ocr engine=%s unavailable, skipped", name)
+            continue
+        engine.image_to_text(pages[0])  # warm-up (model load for tesserocr)
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for img in pages:
+                engine.image_to_text(img)
+        elapsed = time.perf_counter() - started
+        n = len(pages) * args.repeat
+        logger.info("ocr engine=%s pages=%d seconds=%.2f pages_per_sec=%.2f",
+                    name, n, elapsed, n / elapsed)
+
+
+# -----------------------------------------------------------------------------
+# Worker setup overhead
+# -----------------------------------------------------------------------------
+def bench_worker(args):
+    """Compare per-task setup: create_app() per task vs. the per-process app."""
+    from app import create_app, db
+    from app.models import Job
+
+    def task_body():
+        db.session.query(Job).filter_by(job_id=BENCH_PREFIX + "missing").first()
+
+    started = time.perf_counter()
+    app = create_app()
+    logger.info("worker startup create_app seconds=%.3f", time.perf_counter() - started)
+
+    def per_task_app():
+        with create_app().app_context():
+            task_body()
+
+    def per_process_app():
+        with app.app_context():
+            task_body()
+
+    for name, fn in (("create_app_per_task", per_task_app), ("app_per_process", per_process_app)):
+        stats = _timed(fn, args.tasks)
+        logger.info("worker mode=%s tasks=%d %s", name, args.tasks, json.dumps(stats))
+
+
+# -----------------------------------------------------------------------------
+# Cold start
+# -----------------------------------------------------------------------------
+STARTUP_TARGETS = {
+    "api": "from app import create_app; create_app()",
+    "worker": "import tasks; tasks.get_app()",
+    "worker_nlp": "import tasks; tasks.get_app(); tasks.get_nlp()",
+}
+STARTUP_PROBE = """
+import json, resource, time
+started = time.perf_counter()
+{code}
+print(json.dumps({{"seconds": time.perf_counter() - started,
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def bench_startup(args):
+    """Time cold imports/initialization of the API app and a worker in fresh interpreters."""
+    for name in args.targets:
+        runs = []
+        for _ in range(args.repeat):
+            out = subprocess.run([sys.executable, "-c", STARTUP_PROBE.format(code=STARTUP_TARGETS[name])],
+                                 capture_output=True, text=True, check=True)
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        seconds = sorted(r["seconds"] for r in runs)
+        logger.info("startup target=%s runs=%d median_s=%.3f max_s=%.3f max_rss_mb=%.1f",
+                    name, len(runs), statistics.median(seconds), seconds[-1],
+                    max(r["max_rss_mb"] for r in runs))
+
+
+# -----------------------------------------------------------------------------
+# Queue routing (simulation)
+# -----------------------------------------------------------------------------
+def _simulate_pool(jobs: list[tuple], workers: int) -> dict:
+    """
+    Non-preemptive multi-worker queue. jobs are (arrival, priority, service, id)
+    sorted by arrival; a free worker takes the lowest priority value, then the
+    oldest job. Returns {id: finish time}.
+    """
+    free = [0.0] * workers
+    waiting, finish, i = [], {}, 0
+    while i < len(jobs) or waiting:
+        while i < len(jobs) and jobs[i][0] <= free[0]:
+            arrival, priority, service, job = jobs[i]
+            heapq.heappush(waiting, (priority, arrival, job, service))
+            i += 1
+        if not waiting:
+            arrival, priority, service, job = jobs[i]
+            heapq.heappush(waiting, (priority, arrival, job, service))
+            i += 1
+        priority, arrival, job, service = heapq.heappop(waiting)
+        start = max(heapq.heappop(free), arrival)
+        finish[job] = start + service
+        heapq.heappush(free, finish[job])
+    return finish
+
+
+def bench_routing(args):
+    """
+    Latency per job class with one FIFO queue vs. size-aware routing
+    (task_queue.route), and how late status flushes start when they share
+    the bulk workers vs. have a worker of their own.
+    """
+    from task_queue import route, FAST_QUEUE
+
+    rng = random.Random(7)
+    jobs, t = [], 0.0
+    for n in range(args.jobs):
+        t += rng.expovariate(args.arrival_rate)
+        pages = rng.randint(50, 500) if rng.random() < args.bulk_share else rng.randint(1, 3)
+        jobs.append((t, pages, n))
+
+    def latency_by_class(finish):
+        by_class = {"small": [], "large": []}
+        for arrival, pages, n in jobs:
+            by_class["small" if pages <= 3 else "large"].append(finish[n] - arrival)
+        return by_class
+
+    workers = args.fast_workers + args.bulk_workers
+    fifo = _simulate_pool([(a, 0, p * args.page_seconds, n) for a, p, n in jobs], workers)
+
+    routed = {}
+    pools = {FAST_QUEUE: [], "bulk": []}
+    for a, p, n in jobs:
+        r = route(pages=p)
+        pools[FAST_QUEUE if r["queue"] == FAST_QUEUE else "bulk"].append((a, r["priority"], p * args.page_seconds, n))
+    routed.update(_simulate_pool(pools[FAST_QUEUE], args.fast_workers))
+    routed.update(_simulate_pool(pools["bulk"], args.bulk_workers))
+
+    for policy, finish in (("fifo", fifo), ("routed", routed)):
+        for cls, samples in latency_by_class(finish).items():
+            if not samples:
+                continue
+            samples.sort()
+            pct = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+            logger.info("routing policy=%s class=%s jobs=%d p50_s=%.1f p95_s=%.1f p99_s=%.1f",
+                        policy, cls, len(samples), pct(0.5), pct(0.95), pct(0.99))
+
+    # Beat sends flush_job_status every status_interval seconds with
+    # expires=2*interval (celeryconfig); a flush not started by then is dropped.
+    expires = args.status_interval * 2
+    flushes = [(k * args.status_interval, 0, args.status_seconds, f"flush-{k}")
+               for k in range(int(t / args.status_interval))]
+    shared = _simulate_pool(sorted(pools["bulk"] + flushes, key=lambda j: j[0]), args.bulk_workers)
+    dedicated = _simulate_pool(flushes, 1)
+    for pool, finish in (("bulk", shared), ("status", dedicated)):
+        delays = sorted(finish[f] - args.status_seconds - a for a, _, _, f in flushes)
+        expired = sum(d > expires for d in delays)
+        logger.info("routing status_flush worker=%s flushes=%d expired=%d p95_delay_s=%.1f max_delay_s=%.1f",
+                    pool, len(delays), expired, delays[int(len(delays) * 0.95)] if delays else 0.0,
+                    delays[-1] if delays else 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("search", help="query latency of /api/search at several corpus sizes")
+    p.add_argument("--docs", type=int, nargs="+", default=[10000, 100000])
+    p.add_argument("--words", type=int, default=300, help="words per synthetic document")
+    p.add_argument("--queries", type=int, default=50)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--keep", action="store_true", help="keep seeded documents")
+    p.set_defaults(func=bench_search)
+
+    p = sub.add_parser("ocr", help="pages per second for each OCR backend")
+    p.add_argument("inputs", nargs="+", help="PDF or image files")
+    p.add_argument("--dpi", type=int, default=200)
+    p.add_argument("--max-pages", type=int, default=20, help="pages rasterized per PDF")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_ocr)
+
+    p = sub.add_parser("worker", help="per-task app/engine setup overhead in a worker")
+    p.add_argument("--tasks", type=int, default=100)
+    p.set_defaults(func=bench_worker)
+
+    p = sub.add_parser("startup", help="cold start time and memory of the API app and a worker")
+    p.add_argument("--targets", nargs="+", choices=sorted(STARTUP_TARGETS), default=sorted(STARTUP_TARGETS))
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("routing", help="simulated per-class latency: FIFO vs. fast/bulk queues")
+    p.add_argument("--jobs", type=int, default=5000)
+    p.add_argument("--bulk-share", type=float, default=0.1, help="fraction of 50-500 page jobs")
+    p.add_argument("--arrival-rate", type=float, default=0.05, help="jobs per second")
+    p.add_argument("--page-seconds", type=float, default=1.0, help="OCR seconds per page")
+    p.add_argument("--fast-workers", type=int, default=2)
+    p.add_argument("--bulk-workers", type=int, default=6)
+    p.add_argument("--status-interval", type=float, default=5.0, help="STATUS_FLUSH_INTERVAL")
+    p.add_argument("--status-seconds", type=float, default=0.2, help="duration of one status flush")
+    p.set_defaults(func=bench_routing)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,3 +4,31 @@ broker_url = os.environ.get("REDIS_URL", "redis://redis:6379/0")
 result_backend = os.environ.get("REDIS_URL", "redis://redis:6379/0")
 imports = ("tasks",)
 worker_hijack_root_logger = False
+
+# Priority scheduling (see task_queue.route): ten priority levels per queue,
+# and workers reserve one message at a time so a long job never holds short
+# ones in its prefetch buffer.
+broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+    # An unacknowledged message is redelivered after this many seconds; it
+    # must exceed the longest job or a running job is started twice.
+    "visibility_timeout": int(os.environ.get("BROKER_VISIBILITY_TIMEOUT", 4 * 3600)),
+}
+worker_prefetch_multiplier = 1
+
+# Acknowledge tasks only once they finish, and requeue them if the worker
+# process dies (OOM kill, preemption); tasks resume from page checkpoints.
+task_acks_late = True
+task_reject_on_worker_lost = True
+
+# Write-behind persistence of in-flight job status (Redis -> Postgres)
+status_flush_interval = float(os.environ.get("STATUS_FLUSH_INTERVAL", 5))
+beat_schedule = {
+    "flush-job-status": {
+        "task": "tasks.flush_job_status",
+        "schedule": status_flush_interval,
+        "options": {"queue": "status", "expires": status_flush_interval * 2},
+    },
+}
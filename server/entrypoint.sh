@@ -1,4 +1,6 @@
 #!/bin/sh
 
 echo "Starting Flask server..."
-exec gunicorn -b 0.0.0.0:8080 'app:create_app()'
\ No newline at end of file
+# gevent workers keep long-lived status streams (SSE) from pinning a worker each;
+# gunicorn.conf.py makes psycopg2 cooperative so queries don't block them
+exec gunicorn -c gunicorn.conf.py -b 0.0.0.0:8080 -k gevent --worker-connections "${GUNICORN_WORKER_CONNECTIONS:-1000}" 'app:create_app()'
\ No newline at end of file
@@ -0,0 +1,9 @@
+# Gunicorn settings for the API server (see entrypoint.sh).
+
+
+def post_fork(server, worker):
+    # Under gevent workers psycopg2 would block the whole process on every
+    # query (and with it every open status stream); make it yield to the hub.
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+    worker.log.info("psycopg2 patched for gevent (pid %s)", worker.pid)
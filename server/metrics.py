@@ -0,0 +1,182 @@
+import os
+import math
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+import redis
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
+)
+logger = logging.getLogger("metrics")
+
+METRICS_PREFIX = "metrics:"
+JOB_TIMINGS_PREFIX = "metrics:job:"
+# Per-job timings are kept in Redis this long; terminal jobs also persist them to Job.timings_json.
+JOB_TIMINGS_TTL = int(os.environ.get("JOB_TIMINGS_TTL", 7 * 24 * 3600))
+# Buffered observations are written at most this many seconds late.
+FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 1.0))
+
+STAGE_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900, math.inf)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, math.inf)
+
+# name -> (help, buckets)
+HISTOGRAMS = {
+    "ocr_stage_seconds": (
+        "Duration of process_document stages (queue_wait, download, text_layer, rasterize, "
+        "ocr_page, nlp, tags, db_persist, status_update, total).", STAGE_BUCKETS),
+    "http_request_seconds": ("Latency of /api requests.", HTTP_BUCKETS),
+    "storage_sign_seconds": ("Latency of signing a download URL, by backend.", HTTP_BUCKETS),
+}
+# name -> help
+COUNTERS = {
+    "ocr_pages_total": "Pages processed, by source (text_layer or ocr).",
+    "ocr_input_bytes_total": "Bytes of input documents processed.",
+    "ocr_output_chars_total": "Characters of text extracted.",
+    "result_cache_requests_total": "Content-hash result cache lookups, by result (hit or miss).",
+    "response_cache_requests_total": "In-process API response cache lookups, by result (hit or miss).",
+    "signed_url_cache_requests_total": "Signed download URL cache lookups, by result (hit or miss).",
+}
+
+_current_job = contextvars.ContextVar("metrics_job", default=None)
+
+
+def _label_str(labels: dict) -> str:
+    return ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+
+def _fmt_le(b: float) -> str:
+    return "+Inf" if b == math.inf else repr(float(b))
+
+
+class Metrics:
+    """
+    Prometheus-style counters and histograms aggregated in Redis, so the API
+    processes and every worker contribute to the same series.
+
+    Observations are buffered per process and written in one pipeline by
+    flush() (called per request, per task and at least every FLUSH_INTERVAL).
+    """
+
+    def __init__(self, url: str | None = None):
+        self.r = redis.Redis.from_url(url or os.environ.get("REDIS_URL", "redis://redis:6379/0"))
+        self._buf = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    # ---- recording ----
+    def observe(self, name: str, value: float, **labels):
+        """Record one histogram observation."""
+        _, buckets = HISTOGRAMS[name]
+        key, lbl = METRICS_PREFIX + name, _label_str(labels)
+        ops = [("hincrbyfloat", key, f"{lbl}|sum", value), ("hincrby", key, f"{lbl}|count", 1)]
+        ops += [("hincrby", key, f"{lbl}|le={_fmt_le(b)}", 1) for b in buckets if value <= b]
+        self._record(ops)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increment a counter."""
+        self._record([("hincrbyfloat", METRICS_PREFIX + name, _label_str(labels), amount)])
+
+    def observe_stage(self, stage: str, seconds: float, job_id: str | None = None):
+        """Record a stage duration globally and in the current job's timings."""
+        self.observe("ocr_stage_seconds", seconds, stage=stage)
+        job_id = job_id or _current_job.get()
+        if job_id:
+            key = JOB_TIMINGS_PREFIX + job_id
+            self._record([
+                ("hincrbyfloat", key, stage, round(seconds, 6)),
+                ("hincrby", key, f"{stage}_count", 1),
+                ("expire", key, JOB_TIMINGS_TTL),
+            ])
+
+    def record_job(self, job_id: str | None = None, **values):
+        """Add per-job counts (pages, bytes, chars) to the job's timings record."""
+        job_id = job_id or _current_job.get()
+        if job_id:
+            key = JOB_TIMINGS_PREFIX + job_id
+            self._record([("hincrbyfloat", key, k, v) for k, v in values.items()]
+                         + [("expire", key, JOB_TIMINGS_TTL)])
+
+    def _record(self, ops):
+        with self._lock:
+            self._buf.extend(ops)
+            due = time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered observations to Redis in a single round trip."""
+        with self._lock:
+            ops, self._buf = self._buf, []
+            self._last_flush = time.monotonic()
+        if not ops:
+            return
+        try:
+            pipe = self.r.pipeline(transaction=False)
+            for op, *args in ops:
+                getattr(pipe, op)(*args)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Failed to flush %d metric updates: %s", len(ops), e)
+
+    # ---- reading ----
+    def job_timings(self, job_id: str) -> dict:
+        """Return the per-stage seconds and counts recorded for a job."""
+        raw = self.r.hgetall(JOB_TIMINGS_PREFIX + job_id)
+        return {k.decode(): float(v) for k, v in raw.items()}
+
+    def render(self) -> str:
+        """Render every series in the Prometheus text exposition format."""
+        self.flush()
+        pipe = self.r.pipeline(transaction=False)
+        for name in list(HISTOGRAMS) + list(COUNTERS):
+            pipe.hgetall(METRICS_PREFIX + name)
+        raws = pipe.execute()
+
+        lines = []
+        for (name, (help_text, buckets)), raw in zip(HISTOGRAMS.items(), raws):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            series = {}
+            for field, value in raw.items():
+                lbl, suffix = field.decode().rsplit("|", 1)
+                series.setdefault(lbl, {})[suffix] = value.decode()
+            for lbl, fields in sorted(series.items()):
+                sep = "," if lbl else ""
+                for b in buckets:
+                    le = _fmt_le(b)
+                    lines.append(f'{name}_bucket{{{lbl}{sep}le="{le}"}} {fields.get("le=" + le, "0")}')
+                lines.append(f"{name}_sum{{{lbl}}} {fields.get('sum', '0')}")
+                lines.append(f"{name}_count{{{lbl}}} {fields.get('count', '0')}")
+
+        for (name, help_text), raw in zip(COUNTERS.items(), raws[len(HISTOGRAMS):]):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for lbl, value in sorted(raw.items()):
+                lines.append(f"{name}{{{lbl.decode()}}} {value.decode()}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def job_context(job_id: str):
+    """Attribute stage timings recorded inside this block to job_id."""
+    token = _current_job.set(job_id)
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+        METRICS.flush()
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a process_document stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.observe_stage(stage, time.perf_counter() - started)
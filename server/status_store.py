@@ -12,20 +12,97 @@ logging.basicConfig(
 logger = logging.getLogger("status_store")
 
 STATUS_PREFIX = "job:"
+EVENTS_PREFIX = "job-events:"
+# Jobs whose record changed since the write-behind flusher last persisted them
+DIRTY_KEY = "jobs:dirty"
+TERMINAL_STATUSES = ("COMPLETED", "FAILED")
+
+# Record lifetimes in seconds. Terminal records only serve recent polls and
+# streams (Postgres has the durable copy); in-flight records get a long
+# safety TTL, refreshed on every status change, so abandoned jobs can't leak.
+STATUS_TTL_COMPLETED = int(os.environ.get("STATUS_TTL_COMPLETED", 3600))
+STATUS_TTL_FAILED = int(os.environ.get("STATUS_TTL_FAILED", 24 * 3600))
+STATUS_TTL_ACTIVE = int(os.environ.get("STATUS_TTL_ACTIVE", 7 * 24 * 3600))
+# Status records hold small scalar fields only; longer values are cut.
+STATUS_MAX_FIELD_CHARS = int(os.environ.get("STATUS_MAX_FIELD_CHARS", 512))
+
+# Atomic check-and-set for StatusStore.update, executed server-side in one
+# round trip: skip missing records, keep progress monotonic, write the
+# fields, refresh the TTL, mark the job dirty for the flusher and publish
+# the applied delta.
+#   KEYS: job hash, dirty set     ARGV: job_id, channel, ttl, field1, value1, ...
+UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return false
+end
+local delta = {}
+for i = 4, #ARGV, 2 do
+  local field, value = ARGV[i], ARGV[i + 1]
+  if field == 'progress' then
+    local current = tonumber(redis.call('HGET', KEYS[1], 'progress')) or 0
+    if (tonumber(value) or 0) < current then
+      value = tostring(current)
+    end
+  end
+  redis.call('HSET', KEYS[1], field, value)
+  delta[field] = value
+end
+if tonumber(ARGV[3]) > 0 then
+  redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+local encoded = cjson.encode(delta)
+redis.call('SADD', KEYS[2], ARGV[1])
+redis.call('PUBLISH', ARGV[2], encoded)
+return encoded
+"""
+
+# Atomic counter for StatusStore.incr_field, with the same guarantees as
+# UPDATE_SCRIPT: a missing record is not recreated, and the new value is
+# marked dirty and published.
+#   KEYS: job hash, dirty set     ARGV: job_id, channel, ttl, field, amount
+INCR_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return false
+end
+local value = redis.call('HINCRBY', KEYS[1], ARGV[4], ARGV[5])
+if tonumber(ARGV[3]) > 0 then
+  redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+redis.call('PUBLISH', ARGV[2], cjson.encode({[ARGV[4]] = tostring(value)}))
+return value
+"""
+
+def _ttl_for(status: str | None) -> int:
+    """TTL for a record whose status is (or is becoming) `status`."""
+    if status == "COMPLETED":
+        return STATUS_TTL_COMPLETED
+    if status == "FAILED":
+        return STATUS_TTL_FAILED
+    return STATUS_TTL_ACTIVE
+
 
 class StatusStore:
     def __init__(self, url: str | None = None):
-        """Initialize Redis connection for job status tracking."""
+        """
+        Initialize the Redis client for job status tracking.
+
+        No connection is made here; the pool connects on the first command,
+        so importing a module that creates a StatusStore stays cheap.
+        """
         redis_url = url or os.environ.get("REDIS_URL")
-        logger.info("Initializing Redis connection (URL=%s)", redis_url)
+        logger.info("Initializing Redis client (URL=%s)", redis_url)
+        self.r = redis.Redis.from_url(redis_url)
+        self._update_script = self.r.register_script(UPDATE_SCRIPT)
+        self._incr_script = self.r.register_script(INCR_SCRIPT)
+
+    def ping(self) -> bool:
+        """Return True if Redis answers."""
         try:
-            self.r = redis.Redis.from_url(redis_url)
-            # Test connection
-            self.r.ping()
-            logger.info("Connected to Redis successfully.")
-        except Exception as e:
-            logger.exception("Failed to connect to Redis: %s", e)
-            raise
+            return bool(self.r.ping())
+        except redis.RedisError as e:
+            logger.warning("Redis ping failed: %s", e)
+            return False
 
     def new_job(self, filename: str) -> str:
         """Create a new job record and return its ID."""
@@ -40,7 +117,10 @@ class StatusStore:
         }
 
         try:
-            self.r.hset(STATUS_PREFIX + job_id, mapping=data)
+            pipe = self.r.pipeline(transaction=False)
+            pipe.hset(STATUS_PREFIX + job_id, mapping=data)
+            pipe.expire(STATUS_PREFIX + job_id, STATUS_TTL_ACTIVE)
+            pipe.execute()
             logger.info(
                 "[Job %s] Created new job record: filename='%s', status='RECEIVED'",
                 job_id,
@@ -53,34 +133,101 @@ class StatusStore:
 
         return job_id
 
+    def new_jobs(self, records: list[dict]):
+        """
+        Create many job records in one round trip. Each record needs "id" and
+        "filename"; status/progress/stage default to those of new_job().
+        """
+        now = int(time.time())
+        try:
+            pipe = self.r.pipeline(transaction=False)
+            for record in records:
+                data = {"status": "RECEIVED", "progress": 10, "stage": "Upload requested",
+                        "created_at": now, **record}
+                key = STATUS_PREFIX + data["id"]
+                pipe.hset(key, mapping={k: str(v) for k, v in data.items() if v is not None})
+                pipe.expire(key, _ttl_for(data["status"]))
+            pipe.execute()
+            logger.info("Created %d job records in one pipeline.", len(records))
+        except Exception as e:
+            logger.exception("Failed to create %d job records: %s", len(records), e)
+            raise
+
     def update(self, job_id: str, **fields):
-        """Update an existing job record with given fields."""
+        """Update an existing job record with given fields (atomic, one round trip)."""
         try:
-            current_data = self.get(job_id)
-            if not current_data:
+            applied = self._update_script(
+                keys=[STATUS_PREFIX + job_id, DIRTY_KEY],
+                args=self._update_args(job_id, fields),
+            )
+            if applied is None:
                 logger.warning(
                     "[Job %s] No existing record found to update.", job_id)
                 return
 
-            if "progress" in fields:
-                # keep progress monotonic
-                current_progress = int(current_data.get("progress", 0))
-                new_progress = int(fields["progress"])
-                fields["progress"] = max(new_progress, current_progress)
+            logger.info("[Job %s] Updated fields: %s", job_id, applied.decode())
+        except Exception as e:
+            logger.exception("[Job %s] Failed to update status: %s", job_id, e)
+            raise
 
+    @staticmethod
+    def _update_args(job_id: str, fields: dict) -> list[str]:
+        # TTL is (re)set when the status changes; other updates keep the current one
+        ttl = _ttl_for(fields["status"]) if "status" in fields else 0
+        args = [job_id, EVENTS_PREFIX + job_id, str(ttl)]
+        for k, v in fields.items():
             # Convert all values to strings for Redis
-            fields_str = {k: str(v) for k, v in fields.items()}
-            self.r.hset(STATUS_PREFIX + job_id, mapping=fields_str)
+            value = str(v)
+            if len(value) > STATUS_MAX_FIELD_CHARS:
+                logger.warning("[Job %s] Truncating status field %s (%d chars)", job_id, k, len(value))
+                value = value[:STATUS_MAX_FIELD_CHARS]
+            args += [k, value]
+        return args
 
-            logger.info(
-                "[Job %s] Updated fields: %s",
-                job_id,
-                json.dumps(fields_str, ensure_ascii=False),
+    def incr_field(self, job_id: str, field: str, amount: int = 1) -> int | None:
+        """
+        Atomically increment a numeric field of a job record (e.g. pages_done)
+        and return the new value, or None if the record does not exist.
+        """
+        try:
+            value = self._incr_script(
+                keys=[STATUS_PREFIX + job_id, DIRTY_KEY],
+                args=[job_id, EVENTS_PREFIX + job_id, str(STATUS_TTL_ACTIVE), field, str(amount)],
             )
+            if value is None:
+                logger.warning("[Job %s] No existing record found to increment %s.", job_id, field)
+            return value
         except Exception as e:
-            logger.exception("[Job %s] Failed to update status: %s", job_id, e)
+            logger.exception("[Job %s] Failed to increment %s: %s", job_id, field, e)
             raise
 
+    def restore(self, job_id: str, data: dict) -> bool:
+        """Recreate a job record (e.g. from Postgres after a Redis restart) if it is missing."""
+        key = STATUS_PREFIX + job_id
+        if self.r.exists(key):
+            return False
+        pipe = self.r.pipeline(transaction=False)
+        pipe.hset(key, mapping={k: str(v) for k, v in data.items() if v is not None})
+        pipe.expire(key, _ttl_for(data.get("status")))
+        pipe.execute()
+        logger.info("[Job %s] Restored status record: %s", job_id, data.get("status"))
+        return True
+
+    def pop_dirty(self, count: int) -> list[str]:
+        """Take up to `count` jobs whose records changed since they were last persisted."""
+        return [j.decode() for j in self.r.spop(DIRTY_KEY, count) or []]
+
+    def mark_dirty(self, job_ids: list[str]):
+        """Queue jobs for the write-behind flusher again (e.g. after a failed flush)."""
+        if job_ids:
+            self.r.sadd(DIRTY_KEY, *job_ids)
+
+    def subscribe(self, job_ids: list[str]):
+        """Return a pub/sub handle receiving status deltas for the given jobs."""
+        pubsub = self.r.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(*(EVENTS_PREFIX + j for j in job_ids))
+        return pubsub
+
     def get(self, job_id: str) -> dict:
         """Retrieve the job record from Redis as a dictionary."""
         try:
@@ -95,4 +242,65 @@ class StatusStore:
             return data
         except Exception as e:
             logger.exception("[Job %s] Failed to fetch status: %s", job_id, e)
-            return {}
\ No newline at end of file
+            return {}
+
+    def get_many(self, job_ids: list[str]) -> dict[str, dict]:
+        """Retrieve several job records in one round trip; missing jobs are omitted."""
+        try:
+            pipe = self.r.pipeline(transaction=False)
+            for job_id in job_ids:
+                pipe.hgetall(STATUS_PREFIX + job_id)
+            raws = pipe.execute()
+            return {
+                job_id: {k.decode(): v.decode() for k, v in raw.items()}
+                for job_id, raw in zip(job_ids, raws) if raw
+            }
+        except Exception as e:
+            logger.exception("Failed to fetch status for %d jobs: %s", len(job_ids), e)
+            return {}
+
+    def memory_report(self, sample: int = 500, inflight: int | None = None) -> dict:
+        """
+        Estimate Redis memory used by job records.
+
+        Samples up to `sample` job hashes with MEMORY USAGE and reports the
+        average size of in-flight and terminal records; with `inflight`, also
+        projects the memory needed to hold that many in-flight jobs.
+        """
+        keys = []
+        for key in self.r.scan_iter(match=STATUS_PREFIX + "*", count=1000):
+            keys.append(key)
+            if len(keys) >= sample:
+                break
+
+        pipe = self.r.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key)
+            pipe.hget(key, "status")
+        values = pipe.execute()
+
+        sizes = {"inflight": [], "terminal": []}
+        for size, status in zip(values[0::2], values[1::2]):
+            kind = "terminal" if status and status.decode() in TERMINAL_STATUSES else "inflight"
+            sizes[kind].append(size or 0)
+
+        def avg(xs):
+            return round(sum(xs) / len(xs)) if xs else 0
+
+        info = self.r.info("memory")
+        report = {
+            "sampled_records": len(keys),
+            "avg_inflight_record_bytes": avg(sizes["inflight"]),
+            "avg_terminal_record_bytes": avg(sizes["terminal"]),
+            "redis_used_memory_bytes": info.get("used_memory"),
+            "redis_maxmemory_bytes": info.get("maxmemory"),
+            "ttl_seconds": {
+                "completed": STATUS_TTL_COMPLETED,
+                "failed": STATUS_TTL_FAILED,
+                "active": STATUS_TTL_ACTIVE,
+            },
+        }
+        if inflight is not None:
+            per_record = report["avg_inflight_record_bytes"] or avg(sizes["terminal"])
+            report["projected_inflight_bytes"] = per_record * inflight
+        return report
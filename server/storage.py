@@ -1,7 +1,10 @@
 import os
+import abc
+import time
+import shutil
 import logging
-from google.cloud import storage
 from datetime import timedelta
+from itsdangerous import URLSafeSerializer, BadSignature
 
 # -----------------------------------------------------------------------------
 # Logger Configuration
@@ -18,99 +21,325 @@ logger = logging.getLogger("storage")
 BUCKET = os.environ.get("GCS_BUCKET")
 PROJECT_ID = os.environ.get("GCP_PROJECT_ID")
 
-if not BUCKET:
+# Local filesystem backend (single node / shared volume, offline development
+# and tests). Objects are stored under this directory as local:// URIs and
+# signed URLs point at the API's /api/storage endpoints, which speak the same
+# resumable protocol as GCS. API and workers must see the same directory.
+LOCAL_STORAGE_DIR = os.environ.get("LOCAL_STORAGE_DIR")
+LOCAL_STORAGE_URL = os.environ.get("LOCAL_STORAGE_URL", "/api/storage")
+LOCAL_PREFIX = "local://"
+GCS_PREFIX = "gs://"
+# Backend for new objects: "gcs" or "local". Existing objects are always read
+# with the backend matching their URI scheme.
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "local" if LOCAL_STORAGE_DIR else "gcs")
+# Lifetime of signed upload URLs.
+UPLOAD_URL_MINUTES = int(os.environ.get("UPLOAD_URL_MINUTES", 60))
+
+if STORAGE_BACKEND == "gcs" and not BUCKET:
     logger.warning("Environment variable 'GCS_BUCKET' is not set.")
-if not PROJECT_ID:
+if STORAGE_BACKEND == "gcs" and not PROJECT_ID:
     logger.warning("Environment variable 'GCP_PROJECT_ID' is not set.")
 
-_client = None
 
 # -----------------------------------------------------------------------------
-# GCS Client
+# Backend Interface
 # -----------------------------------------------------------------------------
+class StorageBackend(abc.ABC):
+    """Object storage used for uploads (API) and inputs (workers)."""
+
+    prefix = ""
+
+    @abc.abstractmethod
+    def uri(self, dest_path: str) -> str:
+        """URI of the object stored at dest_path."""
+
+    @abc.abstractmethod
+    def upload_file(self, fileobj, dest_path: str, content_type: str | None = None) -> str:
+        """Store a file object at dest_path; returns its URI."""
+
+    @abc.abstractmethod
+    def local_copy(self, uri: str, local_path: str) -> str:
+        """Make the object readable locally (at or instead of local_path); returns the path to read."""
+
+    @abc.abstractmethod
+    def size(self, uri: str) -> int | None:
+        """Size in bytes, or None if the object does not exist (yet)."""
+
+    @abc.abstractmethod
+    def delete(self, uri: str):
+        """Remove an object; a missing object is not an error."""
+
+    @abc.abstractmethod
+    def signed_url(self, uri: str, minutes: int = 15) -> str:
+        """Time-limited download URL for the object."""
+
+    @abc.abstractmethod
+    def create_upload_session(self, dest_path: str, content_type: str | None = None,
+                              size: int | None = None, origin: str | None = None) -> tuple[str, str]:
+        """Start a resumable upload; returns (object URI, session URL)."""
+
+
+# -----------------------------------------------------------------------------
+# Google Cloud Storage
+# -----------------------------------------------------------------------------
+class GCSStorage(StorageBackend):
+    prefix = GCS_PREFIX
+
+    def __init__(self, bucket: str | None = BUCKET, project: str | None = PROJECT_ID):
+        self.bucket_name = bucket
+        self.project = project
+        self._client = None
+
+    def client(self):
+        """Return the (lazily created) Google Cloud Storage client."""
+        if self._client is None:
+            from google.cloud import storage
+            try:
+                self._client = storage.Client(project=self.project)
+                logger.info(
+                    "Initialized Google Cloud Storage client for project: %s", self.project)
+            except Exception as e:
+                logger.exception("Failed to initialize GCS client: %s", e)
+                raise
+        return self._client
+
+    def _blob(self, uri: str):
+        assert uri.startswith(GCS_PREFIX), "Expect gs:// URI"
+        bucket_name, blob_name = uri[len(GCS_PREFIX):].split("/", 1)
+        return self.client().bucket(bucket_name).blob(blob_name)
+
+    def uri(self, dest_path: str) -> str:
+        return f"{GCS_PREFIX}{self.bucket_name}/{dest_path}"
+
+    def upload_file(self, fileobj, dest_path, content_type=None):
+        try:
+            blob = self.client().bucket(self.bucket_name).blob(dest_path)
+            logger.info("Uploading file to GCS: bucket=%s, path=%s",
+                        self.bucket_name, dest_path)
+            blob.upload_from_file(fileobj, content_type=content_type)
+            logger.info("File uploaded successfully to %s", self.uri(dest_path))
+            return self.uri(dest_path)
+        except Exception as e:
+            logger.exception("Failed to upload file to GCS: %s", e)
+            raise
 
+    def local_copy(self, uri, local_path):
+        try:
+            logger.info("Downloading from GCS: %s to local path: %s", uri, local_path)
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            self._blob(uri).download_to_filename(local_path)
+            logger.info("Downloaded successfully to %s", local_path)
+            return local_path
+        except Exception as e:
+            logger.exception("Failed to download file from GCS: %s", e)
+            raise
+
+    def size(self, uri):
+        blob = self._blob(uri)
+        blob = blob.bucket.get_blob(blob.name)
+        return blob.size if blob is not None else None
+
+    def delete(self, uri):
+        from google.api_core.exceptions import NotFound
+        try:
+            self._blob(uri).delete()
+            logger.info("Deleted %s", uri)
+        except NotFound:
+            pass
 
-def client():
-    """Return a singleton Google Cloud Storage client."""
-    global _client
-    if _client is None:
+    def signed_url(self, uri, minutes=15):
         try:
-            _client = storage.Client(project=PROJECT_ID)
             logger.info(
-                "Initialized Google Cloud Storage client for project: %s", PROJECT_ID)
+                "Generating signed URL for: %s (expires in %d minutes)", uri, minutes)
+            url = self._blob(uri).generate_signed_url(
+                expiration=timedelta(minutes=minutes), method="GET")
+            logger.info("Signed URL generated successfully for %s", uri)
+            return url
         except Exception as e:
-            logger.exception("Failed to initialize GCS client: %s", e)
+            logger.exception("Failed to generate signed URL: %s", e)
             raise
-    return _client
+
+    def create_upload_session(self, dest_path, content_type=None, size=None, origin=None):
+        try:
+            logger.info("Creating resumable upload session: bucket=%s, path=%s, size=%s",
+                        self.bucket_name, dest_path, size)
+            blob = self.client().bucket(self.bucket_name).blob(dest_path)
+            url = blob.create_resumable_upload_session(
+                content_type=content_type, size=size, origin=origin)
+            return self.uri(dest_path), url
+        except Exception as e:
+            logger.exception("Failed to create upload session: %s", e)
+            raise
+
 
 # -----------------------------------------------------------------------------
-# Upload File
+# Local Filesystem
+# -----------------------------------------------------------------------------
+class LocalStorage(StorageBackend):
+    """
+    Objects are plain files under `root`. Workers get them without copying:
+    local_copy() hardlinks the object into the job's temp dir, or hands back
+    the object's own path when the temp dir is on another filesystem.
+    """
+
+    prefix = LOCAL_PREFIX
+
+    def __init__(self, root: str | None = LOCAL_STORAGE_DIR):
+        self.root = os.path.abspath(root or ".")
+
+    def path(self, uri: str) -> str:
+        """Filesystem path of a local:// object."""
+        assert uri.startswith(LOCAL_PREFIX), "Expect local:// URI"
+        path = os.path.abspath(os.path.join(self.root, uri[len(LOCAL_PREFIX):]))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Object path escapes the storage root: {uri}")
+        return path
+
+    def uri(self, dest_path: str) -> str:
+        return LOCAL_PREFIX + dest_path
+
+    def upload_file(self, fileobj, dest_path, content_type=None):
+        uri = self.uri(dest_path)
+        path = self.path(uri)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".part"
+        with open(tmp, "wb") as out:
+            shutil.copyfileobj(fileobj, out)
+        os.replace(tmp, path)
+        logger.info("File stored locally at %s", path)
+        return uri
+
+    def local_copy(self, uri, local_path):
+        src = self.path(uri)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        try:
+            os.link(src, local_path)
+        except OSError:
+            # Different filesystem (or no hardlink support): read the object
+            # in place. Workers only read their inputs, so this is safe.
+            return src
+        return local_path
+
+    def size(self, uri):
+        path = self.path(uri)
+        return os.path.getsize(path) if os.path.exists(path) else None
+
+    def delete(self, uri):
+        try:
+            os.remove(self.path(uri))
+            logger.info("Deleted %s", uri)
+        except FileNotFoundError:
+            pass
+
+    def signed_url(self, uri, minutes=15):
+        return f"{LOCAL_STORAGE_URL}/object/{sign_local(uri, 'get', minutes)}"
+
+    def create_upload_session(self, dest_path, content_type=None, size=None, origin=None):
+        uri = self.uri(dest_path)
+        return uri, f"{LOCAL_STORAGE_URL}/upload/{sign_local(uri, 'put', UPLOAD_URL_MINUTES)}"
+
+
 # -----------------------------------------------------------------------------
+# Backend Selection
+# -----------------------------------------------------------------------------
+BACKENDS = {"gcs": GCSStorage, "local": LocalStorage}
+_backends = {}
+
 
+def get_backend(name: str = STORAGE_BACKEND) -> StorageBackend:
+    """Return the singleton backend called `name`."""
+    if name not in _backends:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown storage backend: {name}")
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
 
+
+def backend_for(uri: str) -> StorageBackend:
+    """Backend that owns an existing object URI."""
+    if uri.startswith(LOCAL_PREFIX):
+        return get_backend("local")
+    if uri.startswith(GCS_PREFIX):
+        return get_backend("gcs")
+    raise ValueError(f"Unsupported storage URI: {uri}")
+
+
+# -----------------------------------------------------------------------------
+# Upload File
+# -----------------------------------------------------------------------------
 def upload_file(fileobj, dest_path: str, content_type: str | None = None) -> str:
     """
-    Upload a file object to GCS.
-    Returns the gs:// path of the uploaded object.
+    Upload a file object to the configured backend.
+    Returns the URI (gs:// or local://) of the stored object.
     """
-    try:
-        bucket = client().bucket(BUCKET)
-        blob = bucket.blob(dest_path)
-        logger.info("Uploading file to GCS: bucket=%s, path=%s",
-                    BUCKET, dest_path)
-        blob.upload_from_file(fileobj, content_type=content_type)
-        logger.info("File uploaded successfully to gs://%s/%s",
-                    BUCKET, dest_path)
-        return f"gs://{BUCKET}/{dest_path}"
-    except Exception as e:
-        logger.exception("Failed to upload file to GCS: %s", e)
-        raise
+    return get_backend().upload_file(fileobj, dest_path, content_type)
+
 
 # -----------------------------------------------------------------------------
 # Download File
 # -----------------------------------------------------------------------------
-
-
-def download_to_path(gcs_uri: str, local_path: str):
+def download_to_path(gcs_uri: str, local_path: str) -> str:
     """
-    Download a file from GCS (gs://bucket/path) to a local path.
+    Make a stored object readable locally and return the path to read.
+    GCS objects are downloaded to local_path; local objects are hardlinked
+    there or read in place (no copy).
     """
-    try:
-        assert gcs_uri.startswith("gs://"), "Expect gs:// URI"
-        _, rest = gcs_uri.split("gs://", 1)
-        bucket_name, blob_name = rest.split("/", 1)
-        logger.info("Downloading from GCS: %s to local path: %s",
-                    gcs_uri, local_path)
-        bucket = client().bucket(bucket_name)
-        blob = bucket.blob(blob_name)
-        os.makedirs(os.path.dirname(local_path), exist_ok=True)
-        blob.download_to_filename(local_path)
-        logger.info("Downloaded successfully to %s", local_path)
-    except Exception as e:
-        logger.exception("Failed to download file from GCS: %s", e)
-        raise
+    return backend_for(gcs_uri).local_copy(gcs_uri, local_path)
+
+
+def object_size(uri: str) -> int | None:
+    """Size in bytes of a stored object, or None if it does not exist (yet)."""
+    return backend_for(uri).size(uri)
+
+
+def delete_object(uri: str):
+    """Remove a stored object, e.g. an upload whose job was never created."""
+    backend_for(uri).delete(uri)
+
 
 # -----------------------------------------------------------------------------
 # Generate Signed URL
 # -----------------------------------------------------------------------------
+def generate_signed_url(gcs_uri: str, minutes: int = 15) -> str:
+    """
+    Generate a signed URL for temporary access to a stored object.
+    """
+    return backend_for(gcs_uri).signed_url(gcs_uri, minutes)
 
 
-def generate_signed_url(gcs_uri: str, minutes: int = 15) -> str:
+# -----------------------------------------------------------------------------
+# Resumable Upload Sessions
+# -----------------------------------------------------------------------------
+def create_upload_session(dest_path: str, content_type: str | None = None,
+                          size: int | None = None, origin: str | None = None) -> tuple[str, str]:
     """
-    Generate a signed URL for temporary access to a GCS object.
+    Start a resumable upload the client sends directly to storage.
+    Returns (object URI, session URL). The client PUTs the bytes to the
+    session URL, in one request or in chunks with Content-Range.
     """
-    try:
-        assert gcs_uri.startswith("gs://"), "Expect gs:// URI"
-        _, rest = gcs_uri.split("gs://", 1)
-        bucket_name, blob_name = rest.split("/", 1)
-        logger.info(
-            "Generating signed URL for: %s (expires in %d minutes)", gcs_uri, minutes)
-        bucket = client().bucket(bucket_name)
-        blob = bucket.blob(blob_name)
-        url = blob.generate_signed_url(
-            expiration=timedelta(minutes=minutes), method="GET")
-        logger.info("Signed URL generated successfully for %s", gcs_uri)
-        return url
-    except Exception as e:
-        logger.exception("Failed to generate signed URL: %s", e)
-        raise
+    return get_backend().create_upload_session(dest_path, content_type, size, origin)
+
+
+# -----------------------------------------------------------------------------
+# Local Stand-in
+# -----------------------------------------------------------------------------
+def local_file(uri: str) -> str:
+    """Filesystem path of a local:// object."""
+    return get_backend("local").path(uri)
+
+
+def _signer() -> URLSafeSerializer:
+    return URLSafeSerializer(os.environ.get("SECRET_KEY", "supersecret"), salt="local-storage")
+
+
+def sign_local(uri: str, op: str, minutes: int) -> str:
+    """Token granting `op` ("get" or "put") on a local object until it expires."""
+    return _signer().dumps({"uri": uri, "op": op, "exp": int(time.time() + minutes * 60)})
+
+
+def verify_local(token: str, op: str) -> str:
+    """Return the object URI of a valid, unexpired token for `op`; raises BadSignature otherwise."""
+    data = _signer().loads(token)
+    if data.get("op") != op or data.get("exp", 0) < time.time():
+        raise BadSignature("token expired or not valid for this operation")
+    return data["uri"]
@@ -0,0 +1,69 @@
+"""
+Task signatures for enqueueing work from the API.
+
+The API only needs to send messages, so it talks to the broker through this
+module instead of importing tasks.py (and with it spaCy, Tesseract and
+pdf2image). Workers import tasks.py, which registers the implementations on
+the same Celery app.
+"""
+import math
+import os
+from celery import Celery
+
+celery_app = Celery("smart-ocr")
+celery_app.config_from_object("celeryconfig")
+
+PROCESS_DOCUMENT = "tasks.process_document"
+
+# Size-aware routing: small jobs go to FAST_QUEUE, served by its own worker
+# pool, and large ones to BULK_QUEUE, so a one-page receipt never waits
+# behind a 500-page PDF.
+FAST_QUEUE = os.environ.get("OCR_FAST_QUEUE", "ocr-fast")
+BULK_QUEUE = os.environ.get("OCR_BULK_QUEUE", "ocr-bulk")
+# Jobs up to this many pages (or, when the page count is unknown, bytes) are fast.
+FAST_MAX_PAGES = int(os.environ.get("FAST_MAX_PAGES", 10))
+FAST_MAX_BYTES = int(os.environ.get("FAST_MAX_BYTES", 5 * 1024 * 1024))
+# Rough bytes per scanned page, to estimate work when only the size is known.
+PAGE_BYTES_ESTIMATE = int(os.environ.get("PAGE_BYTES_ESTIMATE", 200 * 1024))
+
+
+def route(size: int | None = None, pages: int | None = None) -> dict:
+    """
+    Queue and priority for a job of `size` bytes / `pages` pages.
+
+    Within a queue smaller jobs get higher priority (0 is highest with the
+    Redis transport): priority = log2 of the estimated page count, capped at 9.
+    """
+    if pages:
+        fast = pages <= FAST_MAX_PAGES
+        work = pages
+    else:
+        fast = (size or 0) <= FAST_MAX_BYTES
+        work = math.ceil((size or 0) / PAGE_BYTES_ESTIMATE)
+    return {
+        "queue": FAST_QUEUE if fast else BULK_QUEUE,
+        "priority": min(9, int(math.log2(max(work, 1)))),
+    }
+
+
+def enqueue_document(job_id: str, gcs_uri: str, filename: str,
+                     size: int | None = None, pages: int | None = None) -> str:
+    """Queue process_document for a stored upload; returns the queue it was routed to."""
+    options = route(size, pages)
+    celery_app.send_task(PROCESS_DOCUMENT, args=(job_id, gcs_uri, filename), **options)
+    return options["queue"]
+
+
+def enqueue_documents(items: list[tuple[str, str, str, int | None]]):
+    """
+    Queue process_document for many (job_id, gcs_uri, filename, size).
+
+    This saves one connection checkout per task by reusing a single
+    producer connection, but it still publishes once per task: Celery and
+    kombu have no multi-message publish, so each task costs its own broker
+    round trip (an LPUSH with the Redis transport).
+    """
+    with celery_app.producer_or_acquire() as producer:
+        for job_id, gcs_uri, filename, size in items:
+            celery_app.send_task(PROCESS_DOCUMENT, args=(job_id, gcs_uri, filename),
+                                 producer=producer, **route(size))
@@ -1,19 +1,30 @@
 import os
 import re
 import json
-import spacy
+import time
+import hashlib
+import subprocess
+import threading
 import tempfile
 import logging
 from collections import Counter
-from pdf2image import convert_from_path
+from concurrent.futures import ThreadPoolExecutor
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 import pytesseract
-from celery import Celery
+from celery import chord, group
+from celery.signals import worker_process_init
+from celery.utils.time import get_exponential_backoff_interval
+from task_queue import celery_app, enqueue_document, FAST_QUEUE, BULK_QUEUE, FAST_MAX_PAGES
 from storage import download_to_path
-from status_store import StatusStore
+from status_store import StatusStore, TERMINAL_STATUSES
+from metrics import METRICS, job_context, timed
 from app import db, create_app
-from app.models import Document, Job
+from app.models import Document, DocumentPage, Job
+from app.search import index_document
+from app.payloads import store_payload
 from datetime import datetime
+from sqlalchemy import Boolean, bindparam, func, or_
 
 # -----------------------------------------------------------------------------
 # Logging Setup
@@ -27,37 +38,385 @@ logger = logging.getLogger("tasks")
 # -----------------------------------------------------------------------------
 # Celery Configuration
 # -----------------------------------------------------------------------------
-celery_app = Celery("smart-ocr")
-celery_app.config_from_object("celeryconfig")
-
+# celery_app is defined in task_queue so the API can enqueue without importing this module.
 STATUS = StatusStore()
 
+# -----------------------------------------------------------------------------
+# Flask app, created once per worker process
+# -----------------------------------------------------------------------------
+# create_app() registers blueprints, builds the engine/pool and runs
+# create_all(); tasks share one app and push a fresh app context each, so
+# every task gets its own session (removed on context teardown) from the
+# same connection pool.
+_flask_app = None
+
+
+def get_app():
+    global _flask_app
+    if _flask_app is None:
+        started = time.perf_counter()
+        _flask_app = create_app()
+        logger.info("Flask app initialized in %.3fs (pid %d)", time.perf_counter() - started, os.getpid())
+    return _flask_app
+
+
+@worker_process_init.connect
+def _init_worker_process(**kwargs):
+    """Initialize the app in each prefork child before it takes tasks."""
+    app = get_app()
+    with app.app_context():
+        # Connections inherited across fork() must not be shared with the parent.
+        db.engine.dispose(close=False)
+
+# -----------------------------------------------------------------------------
+# OCR Configuration
+# -----------------------------------------------------------------------------
+# Jobs this worker runs at once (celery --concurrency; docker-compose sets it).
+WORKER_CONCURRENCY = max(1, int(os.environ.get("WORKER_CONCURRENCY", 1)))
+# Number of pages OCR'd concurrently inside one job. Defaults to the job's
+# share of the CPUs, so concurrent jobs don't oversubscribe them; 1 keeps the
+# serial loop. The default assumes this worker has the host to itself: when
+# several worker services share it, set OCR_WORKERS per service
+# (docker-compose does).
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", max(1, (os.cpu_count() or 1) // WORKER_CONCURRENCY)))
+# Threads each tesseract process may use. Keep at 1 when OCR_WORKERS > 1 so
+# page-level parallelism doesn't oversubscribe the CPU.
+OCR_THREAD_LIMIT = os.environ.get("OCR_THREAD_LIMIT", "1")
+os.environ.setdefault("OMP_THREAD_LIMIT", OCR_THREAD_LIMIT)
+# DPI used when rasterizing PDF pages for OCR.
+PDF_DPI = int(os.environ.get("PDF_DPI", 200))
+# Pages rasterized at once. Peak memory/disk is bounded by this window, not
+# by document length; larger windows keep the OCR pool busier.
+PDF_WINDOW_SIZE = int(os.environ.get("PDF_WINDOW_SIZE", max(4, OCR_WORKERS * 2)))
+# Read the embedded text layer first and OCR only pages that have none.
+PDF_TEXT_LAYER = os.environ.get("PDF_TEXT_LAYER", "1") == "1"
+# Minimum alphanumeric characters for a page's text layer to count as usable.
+PDF_TEXT_MIN_CHARS = int(os.environ.get("PDF_TEXT_MIN_CHARS", 20))
+# Split large PDFs into page-range subtasks that any worker can pick up.
+DISTRIBUTED_OCR = os.environ.get("DISTRIBUTED_OCR", "0") == "1"
+DISTRIBUTED_MIN_PAGES = int(os.environ.get("DISTRIBUTED_MIN_PAGES", 20))
+PAGES_PER_SUBTASK = int(os.environ.get("PAGES_PER_SUBTASK", 10))
+# Failed jobs are retried with exponential backoff (base/max seconds, full
+# jitter). Pages finished by earlier attempts are checkpointed and reused.
+OCR_MAX_RETRIES = int(os.environ.get("OCR_MAX_RETRIES", 3))
+OCR_RETRY_BACKOFF = int(os.environ.get("OCR_RETRY_BACKOFF", 10))
+OCR_RETRY_BACKOFF_MAX = int(os.environ.get("OCR_RETRY_BACKOFF_MAX", 600))
+# OCR backend: "tesserocr" (persistent in-process API), "pytesseract"
+# (one tesseract subprocess per image) or "auto" (tesserocr if installed).
+OCR_ENGINE = os.environ.get("OCR_ENGINE", "auto")
+OCR_LANG = os.environ.get("OCR_LANG", "eng")
+
 # -----------------------------------------------------------------------------
 # Load NLP Model
 # -----------------------------------------------------------------------------
-try:
-    logger.info("Loading spaCy model 'en_core_web_sm' ...")
-    NLP = spacy.load("en_core_web_sm")
-    logger.info("spaCy model loaded successfully.")
-except Exception as e:
-    logger.exception("Failed to load spaCy model: %s", e)
-    raise
+# Pipeline components we never read from. NER needs tok2vec + ner; noun
+# chunks need the tagger, attribute_ruler and parser.
+NLP_DISABLE = [c for c in os.environ.get("NLP_DISABLE", "lemmatizer").split(",") if c]
+# Long texts are parsed in chunks of at most this many characters ...
+NLP_CHUNK_CHARS = int(os.environ.get("NLP_CHUNK_CHARS", 20000))
+# ... batched through NLP.pipe.
+NLP_BATCH_SIZE = int(os.environ.get("NLP_BATCH_SIZE", 8))
+
+# Loaded on first use, so only processes that run the NLP stage pay for it.
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                import spacy
+                started = time.perf_counter()
+                logger.info("Loading spaCy model 'en_core_web_sm' (disabled: %s) ...",
+                            ", ".join(NLP_DISABLE) or "none")
+                try:
+                    _nlp = spacy.load("en_core_web_sm", disable=NLP_DISABLE)
+                except Exception as e:
+                    logger.exception("Failed to load spaCy model: %s", e)
+                    raise
+                logger.info("spaCy model loaded in %.2fs.", time.perf_counter() - started)
+    return _nlp
+
+# -----------------------------------------------------------------------------
+# OCR Engines
+# -----------------------------------------------------------------------------
+class PytesseractEngine:
+    """Runs the tesseract CLI once per image (writes a temp file, reloads the model)."""
+    name = "pytesseract"
+
+    def image_to_text(self, img) -> str:
+        return pytesseract.image_to_string(img, lang=OCR_LANG)
+
+
+class TesserocrEngine:
+    """
+    Keeps an initialized tesseract API alive per OCR thread for the lifetime
+    of the worker process and passes images to it in memory.
+    """
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._local = threading.local()
+        # Fail here, not on the first page, if the API cannot start
+        # (e.g. missing tessdata for OCR_LANG); make_engine falls back.
+        self._api()
+
+    def _api(self):
+        api = getattr(self._local, "api", None)
+        if api is None:
+            api = self._tesserocr.PyTessBaseAPI(lang=OCR_LANG)
+            self._local.api = api
+            logger.info("Initialized tesseract API in thread %s", threading.current_thread().name)
+        return api
+
+    def image_to_text(self, img) -> str:
+        api = self._api()
+        if isinstance(img, str):
+            with Image.open(img) as im:
+                api.SetImage(im)
+                return api.GetUTF8Text()
+        api.SetImage(img)
+        return api.GetUTF8Text()
+
+
+_engine = None
+_ocr_pool = None
+_ocr_lock = threading.Lock()
+
+
+def make_engine(name: str = OCR_ENGINE):
+    """Build an OCR engine by name, falling back to pytesseract if tesserocr is unavailable or fails to start."""
+    if name in ("auto", "tesserocr"):
+        try:
+            return TesserocrEngine()
+        except ImportError:
+            log = logger.warning if name == "tesserocr" else logger.info
+            log("tesserocr is not installed; falling back to pytesseract.")
+        except RuntimeError as e:
+            logger.error("tesserocr failed to initialize (%s); falling back to pytesseract.", e)
+    return PytesseractEngine()
+
+
+def get_engine():
+    """Return this process's OCR engine, creating it on first use."""
+    global _engine
+    with _ocr_lock:
+        if _engine is None:
+            _engine = make_engine()
+            logger.info("Using OCR engine: %s", _engine.name)
+    return _engine
+
+
+def get_ocr_pool() -> ThreadPoolExecutor:
+    """
+    Return this process's OCR thread pool (OCR_WORKERS threads).
+
+    Threads outlive individual documents so per-thread tesseract APIs stay
+    warm. Created lazily so it is never inherited across a fork.
+    """
+    global _ocr_pool
+    with _ocr_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+    return _ocr_pool
 
 # -----------------------------------------------------------------------------
 # Helper Functions
 # -----------------------------------------------------------------------------
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from a PDF using OCR."""
+def _ocr_page(page_no: int, img) -> tuple[int, str, float]:
+    """OCR a single page (PIL image or image path); return (page_no, text, seconds)."""
+    started = time.perf_counter()
+    text = get_engine().image_to_text(img)
+    elapsed = time.perf_counter() - started
+    logger.debug("OCR page %d took %.3fs", page_no, elapsed)
+    return page_no, text, elapsed
+
+
+def pdf_page_count(pdf_path: str) -> int:
+    """Return the number of pages in a PDF (via poppler's pdfinfo)."""
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+
+def format_page_ranges(pages: list[int]) -> str:
+    """Render page numbers compactly, e.g. [1, 2, 3, 7] -> '1-3,7'."""
+    parts = []
+    for run in _page_runs(sorted(pages)):
+        parts.append(str(run[0]) if len(run) == 1 else f"{run[0]}-{run[-1]}")
+    return ",".join(parts)
+
+
+def _page_runs(pages: list[int]) -> list[list[int]]:
+    """Split sorted page numbers into runs of consecutive pages."""
+    runs = []
+    for n in pages:
+        if runs and n == runs[-1][-1] + 1:
+            runs[-1].append(n)
+        else:
+            runs.append([n])
+    return runs
+
+
+def iter_pdf_windows(pdf_path: str, window: int | None = None,
+                     pages: list[int] | None = None, in_memory: bool = False):
+    """
+    Rasterize a PDF in windows of consecutive pages.
+
+    Yields lists of (page_no, image). With in_memory, images are PIL images
+    read from pdftoppm's output stream and no file is written. Otherwise
+    they are paths of files written by pdftoppm into a temporary directory
+    that is removed as soon as the consumer asks for the next window. Either
+    way only one window of rendered pages exists at a time.
+    If `pages` is given, only those page numbers are rendered.
+    """
+    window = max(1, window or PDF_WINDOW_SIZE)
+    if pages is None:
+        pages = list(range(1, pdf_page_count(pdf_path) + 1))
+    for run in _page_runs(sorted(set(pages))):
+        for i in range(0, len(run), window):
+            first, last = run[i], run[min(i + window, len(run)) - 1]
+            if in_memory:
+                with timed("rasterize"):
+                    images = convert_from_path(pdf_path, dpi=PDF_DPI, first_page=first, last_page=last)
+                logger.debug("Rasterized pages %d-%d in memory", first, last)
+                yield list(zip(range(first, last + 1), images))
+                continue
+            with tempfile.TemporaryDirectory(prefix="pages-") as td:
+                with timed("rasterize"):
+                    paths = convert_from_path(
+                        pdf_path,
+                        dpi=PDF_DPI,
+                        first_page=first,
+                        last_page=last,
+                        output_folder=td,
+                        paths_only=True,
+                    )
+                logger.debug("Rasterized pages %d-%d", first, last)
+                yield list(zip(range(first, last + 1), sorted(paths)))
+
+
+def ocr_pdf_pages(pdf_path: str, pages: list[int] | None = None,
+                  workers: int | None = None, window: int | None = None,
+                  on_page=None) -> dict[int, str]:
+    """
+    OCR the given pages of a PDF (all pages by default).
+
+    Pages are rasterized `window` at a time (defaults to PDF_WINDOW_SIZE) and
+    fanned out to at most `workers` concurrent tesseract processes (defaults
+    to OCR_WORKERS). tesserocr gets the pages in memory; pytesseract writes
+    every image to a file for the CLI anyway, so it reads pdftoppm's files.
+    `on_page(page_no, text)` is called as each page finishes.
+    Returns {page_no: text}.
+    """
+    workers = max(1, workers or OCR_WORKERS)
+    logger.info("Starting OCR extraction from PDF: %s (workers=%d)", pdf_path, workers)
+    started = time.perf_counter()
+    results = []
+
+    # Both engines do the OCR outside the GIL (a tesseract subprocess or
+    # tesserocr's nogil calls), so threads give real parallelism; a
+    # ProcessPoolExecutor is not allowed inside Celery's daemonic children.
+    if workers == 1:
+        pool = None
+    elif workers == OCR_WORKERS:
+        pool = get_ocr_pool()
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
     try:
-        logger.info("Starting OCR extraction from PDF: %s", pdf_path)
-        texts = []
-        images = convert_from_path(pdf_path, dpi=200)
-        for i, img in enumerate(images, start=1):
-            logger.debug("Processing page %d...", i)
-            text = pytesseract.image_to_string(img)
-            texts.append(text)
-        logger.info("Completed OCR extraction from PDF: %s", pdf_path)
-        return "\n".join(texts)
+        run = pool.map if pool else map
+        in_memory = get_engine().name == TesserocrEngine.name
+        for window_pages in iter_pdf_windows(pdf_path, window, pages, in_memory=in_memory):
+            page_nos = [n for n, _ in window_pages]
+            images = [img for _, img in window_pages]
+            for result in run(_ocr_page, page_nos, images):
+                results.append(result)
+                METRICS.observe_stage("ocr_page", result[2])
+                if on_page:
+                    on_page(result[0], result[1])
+    finally:
+        if pool and pool is not _ocr_pool:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    page_time = sum(r[2] for r in results)
+    logger.info(
+        "Completed OCR extraction from PDF: %s (%d pages, %.2fs wall, "
+        "%.2fs summed page time, speedup x%.2f, per-page: %s)",
+        pdf_path, len(results), elapsed, page_time,
+        page_time / elapsed if elapsed else 1.0,
+        ", ".join(f"{n}={t:.2f}s" for n, _, t in results),
+    )
+    return {n: text for n, text, _ in results}
+
+
+def extract_embedded_text(pdf_path: str, first: int = 1, last: int | None = None) -> list[str]:
+    """Return the embedded text layer of each page in [first, last] via poppler's pdftotext."""
+    cmd = ["pdftotext", "-enc", "UTF-8", "-f", str(first)]
+    if last:
+        cmd += ["-l", str(last)]
+    out = subprocess.run(cmd + [pdf_path, "-"], capture_output=True, check=True, timeout=120)
+    # pdftotext terminates every page with a form feed
+    pages = out.stdout.decode("utf-8", errors="replace").split("\f")
+    if pages and not pages[-1].strip():
+        pages.pop()
+    return pages
+
+
+def has_text_layer(text: str) -> bool:
+    """True if a page's embedded text is substantial enough to skip OCR."""
+    return sum(c.isalnum() for c in text) >= PDF_TEXT_MIN_CHARS
+
+
+def extract_pdf_pages(pdf_path: str, first: int = 1, last: int | None = None,
+                      on_page=None, done: dict | None = None) -> tuple[dict[int, str], list[int], list[int]]:
+    """
+    Extract the text of pages [first, last] of a PDF (all pages by default),
+    using the embedded text layer where it exists.
+
+    Only pages without a usable text layer are rasterized and OCR'd, and
+    pages in `done` ({page_no: source}, e.g. stored by an earlier attempt)
+    are not processed again. `on_page(page_no, text, source)` is called as
+    each new page becomes available.
+    Returns ({page_no: text} of the new pages, text_layer_pages, ocr_pages),
+    where the page lists include the pages in `done`.
+    """
+    try:
+        last = last or pdf_page_count(pdf_path)
+        done = {n: v for n, v in (done or {}).items() if first <= n <= last}
+        page_nos = [n for n in range(first, last + 1) if n not in done]
+        texts = {}
+        if page_nos and PDF_TEXT_LAYER:
+            try:
+                with timed("text_layer"):
+                    embedded = extract_embedded_text(pdf_path, page_nos[0], page_nos[-1])
+                by_page = dict(zip(range(page_nos[0], page_nos[-1] + 1), embedded))
+                texts = {n: by_page[n] for n in page_nos if has_text_layer(by_page.get(n, ""))}
+            except Exception as e:
+                logger.warning("pdftotext failed for %s, falling back to OCR: %s", pdf_path, e)
+
+        text_pages = sorted(texts)
+        ocr_pages = [n for n in page_nos if n not in texts]
+        logger.info("PDF %s pages %d-%d: %d checkpointed, %d with text layer, %d need OCR",
+                    pdf_path, first, last, len(done), len(text_pages), len(ocr_pages))
+
+        if on_page:
+            for n in text_pages:
+                on_page(n, texts[n], "text_layer")
+        if ocr_pages:
+            texts.update(ocr_pdf_pages(
+                pdf_path, pages=ocr_pages,
+                on_page=(lambda n, text: on_page(n, text, "ocr")) if on_page else None))
+
+        METRICS.inc("ocr_pages_total", len(text_pages), source="text_layer")
+        METRICS.inc("ocr_pages_total", len(ocr_pages), source="ocr")
+        METRICS.record_job(pages_text_layer=len(text_pages), pages_ocr=len(ocr_pages))
+
+        text_pages = sorted(text_pages + [n for n, src in done.items() if src == "text_layer"])
+        ocr_pages = sorted(ocr_pages + [n for n, src in done.items() if src != "text_layer"])
+        return texts, text_pages, ocr_pages
     except Exception as e:
         logger.exception("Error extracting text from PDF: %s", e)
         raise
@@ -67,8 +426,12 @@ def extract_text_from_image(img_path: str) -> str:
     """Extract text from a single image using OCR."""
     try:
         logger.info("Starting OCR extraction from image: %s", img_path)
-        img = Image.open(img_path)
-        text = pytesseract.image_to_string(img)
+        started = time.perf_counter()
+        with Image.open(img_path) as img:
+            text = get_engine().image_to_text(img)
+        METRICS.observe_stage("ocr_page", time.perf_counter() - started)
+        METRICS.inc("ocr_pages_total", 1, source="ocr")
+        METRICS.record_job(pages_ocr=1)
         logger.info("Completed OCR extraction from image: %s", img_path)
         return text
     except Exception as e:
@@ -85,6 +448,53 @@ def simple_detect_type(local_path: str) -> str:
         return "image"
     return "binary"
 
+# -----------------------------------------------------------------------------
+# NLP Stage
+# -----------------------------------------------------------------------------
+def split_for_nlp(text: str, max_chars: int = NLP_CHUNK_CHARS) -> list[tuple[int, str]]:
+    """
+    Split text into (offset, chunk) pieces of at most max_chars, cutting at
+    page or paragraph boundaries where possible, then lines, then words.
+    """
+    chunks = []
+    start, n = 0, len(text)
+    while start < n:
+        end = min(start + max_chars, n)
+        if end < n:
+            window = text[start:end]
+            for sep in ("\f", "\n\n", "\n", " "):
+                cut = window.rfind(sep)
+                if cut >= max_chars // 2:
+                    end = start + cut + len(sep)
+                    break
+        chunks.append((start, text[start:end]))
+        start = end
+    return chunks
+
+
+def analyze_text(text: str) -> tuple[list[dict], list[str]]:
+    """
+    Parse text once and return (entities, noun_chunks).
+
+    Long texts are chunked and run through NLP.pipe; entity offsets are
+    mapped back to positions in the full text.
+    """
+    started = time.perf_counter()
+    chunks = split_for_nlp(text)
+    entities, noun_chunks = [], []
+    docs = get_nlp().pipe((chunk for _, chunk in chunks), batch_size=NLP_BATCH_SIZE)
+    for (offset, _), doc in zip(chunks, docs):
+        entities.extend(
+            {"text": ent.text, "label": ent.label_,
+             "start": offset + ent.start_char, "end": offset + ent.end_char}
+            for ent in doc.ents
+        )
+        noun_chunks.extend(nc.text for nc in doc.noun_chunks)
+    logger.info("Parsed %d chars in %d chunks in %.2fs (%d entities, %d noun chunks)",
+                len(text), len(chunks), time.perf_counter() - started,
+                len(entities), len(noun_chunks))
+    return entities, noun_chunks
+
 # -----------------------------------------------------------------------------
 # Tag / Keyword Extraction
 # -----------------------------------------------------------------------------
@@ -92,8 +502,13 @@ STOPWORDS = set("""
 a an and are as at be but by for if in into is it no not of on or such that the their then there these they this to was were will with you your from
 """.split())
 
-def extract_tags(text: str, entities: list[dict], k: int = 15) -> list[str]:
-    """Extract meaningful tags from text and entities."""
+def extract_tags(text: str, entities: list[dict], k: int = 15,
+                 noun_chunks: list[str] | None = None) -> list[str]:
+    """
+    Extract meaningful tags from text and entities.
+
+    Pass the noun chunks from analyze_text to avoid parsing the text again.
+    """
     logger.info("Starting tag extraction...")
     tags = set()
 
@@ -105,9 +520,10 @@ def extract_tags(text: str, entities: list[dict], k: int = 15) -> list[str]:
 
     # 2️⃣ Noun Chunks
     try:
-        doc = NLP(text)
-        for nc in doc.noun_chunks:
-            t = re.sub(r"[^A-Za-z0-9\- ]+", "", nc.text).strip()
+        if noun_chunks is None:
+            _, noun_chunks = analyze_text(text)
+        for nc in noun_chunks:
+            t = re.sub(r"[^A-Za-z0-9\- ]+", "", nc).strip()
             if t and t.lower() not in STOPWORDS and len(t) > 2:
                 tags.add(t)
     except Exception as e:
@@ -219,132 +635,496 @@ def extract_tags(text: str, entities: list[dict], k: int = 15) -> list[str]:
 
 #             raise
 
-@celery_app.task(queue="ocr")
-def process_document(job_id: str, gcs_uri: str, filename: str):
-    """Performs OCR + NLP + DB persistence."""
+# Progress band covered by OCR; it advances per completed page.
+OCR_PROGRESS_START = 60
+OCR_PROGRESS_END = 80
+
+
+def _load_rows(job_id: str):
+    """Return the (Document, Job) rows of a job."""
+    doc_row = db.session.query(Document).filter_by(job_id=job_id).first()
+    job_row = db.session.query(Job).filter_by(job_id=job_id).first()
+    return doc_row, job_row
+
+
+def _set_status(job_id: str, **fields):
+    """Update the Redis status record, timing the round trip."""
+    with timed("status_update"):
+        STATUS.update(job_id, **fields)
+
+
+def _update_rows(doc_row, job_row, status=None, stage=None, progress=None):
+    """Safely update the DB job/document rows and commit."""
+    with timed("db_persist"):
+        _apply_rows(doc_row, job_row, status, stage, progress)
+
+
+def _apply_rows(doc_row, job_row, status, stage, progress):
+    if job_row:
+        if status: job_row.status = status
+        if stage: job_row.stage = stage
+        if progress is not None: job_row.progress = progress
+        job_row.updated_at = datetime.utcnow()
+
+    if doc_row:
+        if status: doc_row.status = status
+        doc_row.updated_at = datetime.utcnow()
+
+    db.session.commit()
+
+
+def _save_page(document_id, page_no: int, text: str, source: str):
+    """Store one finished page; it is readable at once and doubles as a checkpoint."""
+    if document_id is None:
+        return
+    with timed("db_persist"):
+        db.session.query(DocumentPage).filter_by(document_id=document_id, page_no=page_no).delete()
+        db.session.add(DocumentPage(document_id=document_id, page_no=page_no, text=text, source=source))
+        db.session.commit()
+
+
+def _stored_pages(document_id) -> dict[int, str]:
+    """{page_no: source} of the pages already stored for a document."""
+    if document_id is None:
+        return {}
+    rows = db.session.query(DocumentPage.page_no, DocumentPage.source).filter_by(document_id=document_id)
+    return {n: source for n, source in rows}
+
+
+def _assemble_text(document_id) -> str:
+    """
+    Join the stored pages of a document in page order and record each
+    page's character offsets in the assembled text (committed with the job).
+    """
+    if document_id is None:
+        return ""
+    parts, offset = [], 0
+    pages = (db.session.query(DocumentPage).filter_by(document_id=document_id)
+             .order_by(DocumentPage.page_no).all())
+    for page in pages:
+        if parts:
+            offset += 1  # "\n" between pages
+        page.char_start = offset
+        offset += len(page.text)
+        page.char_end = offset
+        parts.append(page.text)
+    return "\n".join(parts)
+
+
+def _page_progress(job_id: str, document_id, total: int):
+    """Return an on_page callback that stores each finished page and advances job progress."""
+    def on_page(page_no, text, source):
+        _save_page(document_id, page_no, text, source)
+        done = STATUS.incr_field(job_id, "pages_done")
+        if done is None:  # status record gone; the page itself is saved
+            return
+        progress = OCR_PROGRESS_START + (OCR_PROGRESS_END - OCR_PROGRESS_START) * done // max(total, 1)
+        _set_status(job_id, progress=progress, stage=f"OCR page {done}/{total}")
+    return on_page
+
+
+def _page_sources(text_pages, ocr_pages) -> dict:
+    """Status fields (and Job columns) recording which pages came from the text layer and which were OCR'd."""
+    return {"text_pages": format_page_ranges(text_pages),
+            "ocr_pages": format_page_ranges(ocr_pages)}
+
+
+def _finish_document(job_id, extracted_text, doc_row, job_row, **page_sources):
+    """
+    Run NLP on the extracted text, persist the results and complete the job.
+    page_sources (see _page_sources) go out with the NLP stage update and are
+    stored on the Job row, since the Redis record expires.
+    """
+    # -----------------------------------------------------
+    # 2. NLP STARTED
+    # -----------------------------------------------------
+    _set_status(job_id,
+                status="NLP_IN_PROGRESS",
+                progress=80,
+                stage="Extracting entities & tags",
+                **page_sources)
+
+    logger.info("[Job %s] Performing NLP entity extraction...", job_id)
+
+    started = time.perf_counter()
+    with timed("nlp"):
+        entities, noun_chunks = analyze_text(extracted_text)
+    nlp_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with timed("tags"):
+        tags = extract_tags(extracted_text, entities, noun_chunks=noun_chunks)
+    tag_seconds = time.perf_counter() - started
+    logger.info("[Job %s] NLP parse %.2fs, tag extraction %.2fs", job_id, nlp_seconds, tag_seconds)
+
+    METRICS.inc("ocr_output_chars_total", len(extracted_text))
+    METRICS.record_job(job_id, chars=len(extracted_text))
+
+    # -----------------------------------------------------
+    # 3. Persist to DB
+    # -----------------------------------------------------
+    logger.info("[Job %s] Saving results to database...", job_id)
+
+    if doc_row:
+        doc_row.status = "COMPLETED"
+        store_payload(doc_row, extracted_text, entities)
+        doc_row.tags_json = json.dumps(tags)
+        index_document(doc_row, extracted_text, tags, entities)
+    else:
+        logger.warning("[Job %s] Document row missing!", job_id)
+    if job_row:
+        for field, pages in page_sources.items():
+            setattr(job_row, field, pages)
+
+    _update_rows(doc_row, job_row,
+                 status="COMPLETED",
+                 stage="Done",
+                 progress=100)
+
+    # -----------------------------------------------------
+    # 4. Update STATUS store
+    # -----------------------------------------------------
+    # Compact record: sizes and a reference to the Document row; the
+    # payloads themselves are served from Postgres by /api/result.
+    _set_status(
+        job_id,
+        status="COMPLETED",
+        progress=100,
+        stage="Done",
+        document_id=doc_row.id if doc_row else "",
+        text_chars=len(extracted_text),
+        entity_count=len(entities),
+        tag_count=len(tags),
+    )
+
+    logger.info("[Job %s] Job completed successfully.", job_id)
+
+
+def _store_timings(job_id: str):
+    """
+    Copy the job's stage timings from Redis onto its Job row once the job is
+    COMPLETED or FAILED. Called when a task has finished its work, so the
+    timings cover every stage, including the final persist.
+    """
+    METRICS.flush()
+    timings = METRICS.job_timings(job_id)
+    if not timings:
+        return
+    jobs = Job.__table__
+    try:
+        db.session.rollback()  # anything not committed by now was abandoned
+        db.session.execute(jobs.update()
+                           .where(jobs.c.job_id == job_id, jobs.c.status.in_(TERMINAL_STATUSES))
+                           .values(timings_json=json.dumps(timings)))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("[Job %s] Failed to store timings: %s", job_id, e)
+
+
+def _fail_document(job_id, doc_row, job_row, e):
+    """Mark the job FAILED in the DB and the status store."""
+    if doc_row:
+        doc_row.status = "FAILED"
+
+    _update_rows(doc_row, job_row,
+                 status="FAILED",
+                 stage=f"Error: {e}",
+                 progress=0)
+
+    _set_status(job_id, status="FAILED", stage=f"Error: {e}")
+
+
+@celery_app.task(bind=True, queue=BULK_QUEUE)
+def process_document(self, job_id: str, gcs_uri: str, filename: str):
+    """
+    Performs OCR + NLP + DB persistence.
+
+    Safe to run again for the same job (acks_late redelivery after a worker
+    died, or a retry): pages checkpointed by earlier attempts are reused, so
+    at most the page in flight is OCR'd twice, and a completed job is skipped.
+    """
     logger.info("Started processing document job_id=%s, file=%s", job_id, filename)
 
-    app = create_app()
-    with app.app_context():
+    with get_app().app_context(), job_context(job_id):
         try:
-            # -----------------------------------------------------
-            # 0. Load DB rows
-            # -----------------------------------------------------
-            doc_row = db.session.query(Document).filter_by(job_id=job_id).first()
-            job_row = db.session.query(Job).filter_by(job_id=job_id).first()
-
-            # Helper to safely update DB job/document
-            def update_job(status=None, stage=None, progress=None):
-                if job_row:
-                    if status: job_row.status = status
-                    if stage: job_row.stage = stage
-                    if progress is not None: job_row.progress = progress
-                    job_row.updated_at = datetime.utcnow()
-
-                if doc_row:
-                    if status: doc_row.status = status
-                    doc_row.updated_at = datetime.utcnow()
-
-                db.session.commit()
-
-            # -----------------------------------------------------
-            # 1. OCR STARTED
-            # -----------------------------------------------------
-            STATUS.update(job_id,
-                          status="OCR_IN_PROGRESS",
-                          progress=60,
-                          stage="Downloading & OCR")
-
-            update_job(status="OCR_IN_PROGRESS",
-                       stage="Downloading & OCR",
-                       progress=60)
-
-            logger.info("[Job %s] Downloading from GCS: %s", job_id, gcs_uri)
-
-            # ---- Create temp dir & download ----
+            with timed("total"):
+                return _process_document(self, job_id, gcs_uri, filename)
+        finally:
+            # After the total timer, so the job's timings include it and
+            # the final persist and status stages.
+            _store_timings(job_id)
+
+
+def _process_document(task, job_id: str, gcs_uri: str, filename: str):
+    """Body of process_document, timed as its "total" stage."""
+    _observe_queue_wait(job_id)
+
+    # -----------------------------------------------------
+    # 0. Load DB rows
+    # -----------------------------------------------------
+    doc_row, job_row = _load_rows(job_id)
+    if job_row and job_row.status == "COMPLETED":
+        logger.info("[Job %s] Already completed, skipping duplicate delivery", job_id)
+        return True
+    _restore_status(job_id, job_row)
+    attempt = STATUS.incr_field(job_id, "attempts") or 1
+    try:
+        if attempt > OCR_MAX_RETRIES + 1:
+            # Redelivered after the worker died every time (e.g. OOM kills).
+            raise RuntimeError(f"Giving up after {attempt - 1} attempts")
+
+        # -----------------------------------------------------
+        # 1. OCR STARTED
+        # -----------------------------------------------------
+        # In-flight state lives in Redis; flush_job_status persists it to
+        # Postgres in batches. Only terminal states are written here.
+        state = STATUS.get(job_id)
+        doc_id = doc_row.id if doc_row else None
+        done = _stored_pages(doc_id)
+        total = int(state.get("pages_total") or 0)
+        if done:
+            logger.info("[Job %s] Resuming attempt %d with %d/%s pages checkpointed",
+                        job_id, attempt, len(done), total or "?")
+        _set_status(job_id,
+                    status="OCR_IN_PROGRESS",
+                    progress=60,
+                    stage="Downloading & OCR")
+
+        if total and len(done) >= total:
+            # Every page finished before the previous attempt died: skip
+            # the download and OCR and go straight to NLP.
+            extracted_text = _assemble_text(doc_id)
+            _finish_document(job_id, extracted_text, doc_row, job_row, **_page_sources(
+                sorted(n for n, src in done.items() if src == "text_layer"),
+                sorted(n for n, src in done.items() if src != "text_layer")))
+            return True
+        if state.get("dispatched"):
+            logger.info("[Job %s] Page-range subtasks already dispatched", job_id)
+            return True
+
+        logger.info("[Job %s] Downloading from GCS: %s", job_id, gcs_uri)
+
+        page_sources = {}
+        # ---- Create temp dir & download ----
+        with tempfile.TemporaryDirectory() as td:
+            local_path = os.path.join(td, filename)
+            with timed("download"):
+                local_path = download_to_path(gcs_uri, local_path)
+            size = os.path.getsize(local_path)
+            if doc_row is not None and not doc_row.content_hash:
+                # Direct uploads never pass through the API, so hash them here.
+                doc_row.content_hash = _file_sha256(local_path)
+            METRICS.inc("ocr_input_bytes_total", size)
+            METRICS.record_job(job_id, bytes=size)
+            logger.info("[Job %s] File downloaded to %s", job_id, local_path)
+
+            ftype = simple_detect_type(local_path)
+            logger.info("[Job %s] Detected file type: %s", job_id, ftype)
+
+            if ftype == "pdf":
+                total = pdf_page_count(local_path)
+                if total > FAST_MAX_PAGES and _delivery_queue() == FAST_QUEUE:
+                    # The upload-time estimate missed (e.g. compressed object
+                    # streams); don't hold a fast-pool worker with a large PDF.
+                    logger.info("[Job %s] %d pages, re-routing to %s", job_id, total, BULK_QUEUE)
+                    STATUS.incr_field(job_id, "attempts", -1)
+                    _set_status(job_id, status="QUEUED", stage="Queued for bulk OCR",
+                                queued_at=f"{time.time():.3f}")
+                    enqueue_document(job_id, gcs_uri, filename, size=size, pages=total)
+                    return True
+                _set_status(job_id, pages_total=total, pages_done=len(done))
+
+                if DISTRIBUTED_OCR and total >= DISTRIBUTED_MIN_PAGES:
+                    _dispatch_page_ranges(job_id, gcs_uri, filename, total)
+                    return True
+
+                _, text_pages, ocr_pages = extract_pdf_pages(
+                    local_path, on_page=_page_progress(job_id, doc_id, total), done=done)
+                extracted_text = _assemble_text(doc_id)
+                page_sources = _page_sources(text_pages, ocr_pages)
+            elif ftype == "image":
+                _save_page(doc_id, 1, extract_text_from_image(local_path), "ocr")
+                _set_status(job_id, pages_total=1, pages_done=1)
+                extracted_text = _assemble_text(doc_id)
+            else:
+                logger.warning("[Job %s] Unsupported file type: %s", job_id, ftype)
+                extracted_text = ""
+
+        _finish_document(job_id, extracted_text, doc_row, job_row, **page_sources)
+        return True
+
+    except Exception as e:
+        logger.exception("[Job %s] Failed: %s", job_id, e)
+        if attempt <= OCR_MAX_RETRIES:
+            countdown = get_exponential_backoff_interval(
+                OCR_RETRY_BACKOFF, attempt - 1, OCR_RETRY_BACKOFF_MAX, full_jitter=True)
+            _set_status(job_id, status="RETRYING",
+                        stage=f"Retry {attempt}/{OCR_MAX_RETRIES} in {countdown}s after error: {e}")
+            raise task.retry(exc=e, countdown=countdown, max_retries=OCR_MAX_RETRIES)
+        _fail_document(job_id, doc_row, job_row, e)
+        raise
+
+
+def _delivery_queue() -> str | None:
+    """Queue the running process_document message was delivered from."""
+    return (process_document.request.delivery_info or {}).get("routing_key")
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _restore_status(job_id: str, job_row):
+    """Recreate the Redis status record from Postgres if Redis lost it."""
+    if job_row:
+        STATUS.restore(job_id, job_row.status_record())
+
+
+def _observe_queue_wait(job_id: str):
+    """Record the time between enqueueing (queued_at set by /api/upload) and pickup."""
+    queued_at = STATUS.get(job_id).get("queued_at")
+    if queued_at:
+        METRICS.observe_stage("queue_wait", max(time.time() - float(queued_at), 0.0))
+
+
+# -----------------------------------------------------------------------------
+# Distributed OCR: page-range subtasks merged by a chord callback
+# -----------------------------------------------------------------------------
+def _dispatch_page_ranges(job_id: str, gcs_uri: str, filename: str, total: int):
+    """Fan a PDF out as page-range subtasks; merge_page_ranges runs NLP once at the end."""
+    ranges = [(first, min(first + PAGES_PER_SUBTASK - 1, total))
+              for first in range(1, total + 1, PAGES_PER_SUBTASK)]
+    logger.info("[Job %s] Dispatching %d pages as %d subtasks", job_id, total, len(ranges))
+
+    _set_status(job_id, stage=f"OCR {total} pages across {len(ranges)} subtasks", dispatched=1)
+    header = group(ocr_page_range.s(job_id, gcs_uri, filename, first, last, total)
+                   for first, last in ranges)
+    chord(header)(merge_page_ranges.s(job_id).on_error(fail_page_ranges.s(job_id)))
+
+
+@celery_app.task(queue="ocr", autoretry_for=(Exception,), max_retries=OCR_MAX_RETRIES,
+                 retry_backoff=OCR_RETRY_BACKOFF, retry_backoff_max=OCR_RETRY_BACKOFF_MAX, retry_jitter=True)
+def ocr_page_range(job_id: str, gcs_uri: str, filename: str, first: int, last: int, total: int):
+    """Extract pages [first, last] of a PDF; returns page texts for the chord callback."""
+    with get_app().app_context(), job_context(job_id):
+        doc_id = db.session.query(Document.id).filter_by(job_id=job_id).scalar()
+        done = {n: src for n, src in _stored_pages(doc_id).items() if first <= n <= last}
+        logger.info("[Job %s] OCR subtask for pages %d-%d (%d already stored)", job_id, first, last, len(done))
+        if len(done) == last - first + 1:
+            text_pages = sorted(n for n, src in done.items() if src == "text_layer")
+            ocr_pages = sorted(n for n, src in done.items() if src != "text_layer")
+        else:
             with tempfile.TemporaryDirectory() as td:
                 local_path = os.path.join(td, filename)
-                download_to_path(gcs_uri, local_path)
-                logger.info("[Job %s] File downloaded to %s", job_id, local_path)
-
-                ftype = simple_detect_type(local_path)
-                logger.info("[Job %s] Detected file type: %s", job_id, ftype)
-
-                if ftype == "pdf":
-                    extracted_text = extract_text_from_pdf(local_path)
-                elif ftype == "image":
-                    extracted_text = extract_text_from_image(local_path)
-                else:
-                    logger.warning("[Job %s] Unsupported file type: %s", job_id, ftype)
-                    extracted_text = ""
-
-            # -----------------------------------------------------
-            # 2. NLP STARTED
-            # -----------------------------------------------------
-            STATUS.update(job_id,
-                          status="NLP_IN_PROGRESS",
-                          progress=80,
-                          stage="Extracting entities & tags")
-
-            update_job(status="NLP_IN_PROGRESS",
-                       stage="Extracting entities & tags",
-                       progress=80)
-
-            logger.info("[Job %s] Performing NLP entity extraction...", job_id)
-
-            nlp_doc = NLP(extracted_text)      # rename to avoid conflict with Document model
-
-            entities = [
-                {"text": ent.text, "label": ent.label_,
-                 "start": ent.start_char, "end": ent.end_char}
-                for ent in nlp_doc.ents
-            ]
-
-            tags = extract_tags(extracted_text, entities)
-
-            # -----------------------------------------------------
-            # 3. Persist to DB
-            # -----------------------------------------------------
-            logger.info("[Job %s] Saving results to database...", job_id)
-
-            if doc_row:
-                doc_row.status = "COMPLETED"
-                doc_row.text = extracted_text[:100000]
-                doc_row.entities_json = json.dumps(entities)
-                doc_row.tags_json = json.dumps(tags)
-            else:
-                logger.warning("[Job %s] Document row missing!", job_id)
-
-            update_job(status="COMPLETED",
-                       stage="Done",
-                       progress=100)
-
-            # -----------------------------------------------------
-            # 4. Update STATUS store
-            # -----------------------------------------------------
-            STATUS.update(
-                job_id,
-                status="COMPLETED",
-                progress=100,
-                stage="Done",
-                text=extracted_text[:20000],
-                entities=json.dumps(entities)
-            )
-
-            logger.info("[Job %s] Job completed successfully.", job_id)
-            return True
+                with timed("download"):
+                    local_path = download_to_path(gcs_uri, local_path)
+                _, text_pages, ocr_pages = extract_pdf_pages(
+                    local_path, first, last, on_page=_page_progress(job_id, doc_id, total), done=done)
+    # Page texts are in document_pages; only the page lists travel through the result backend.
+    return {
+        "text_pages": text_pages,
+        "ocr_pages": ocr_pages,
+    }
+
 
+@celery_app.task(queue="ocr")
+def merge_page_ranges(results: list[dict], job_id: str):
+    """Chord callback: merge page texts in order and run the NLP stage once."""
+    with get_app().app_context(), job_context(job_id):
+        doc_row, job_row = _load_rows(job_id)
+        try:
+            extracted_text = _assemble_text(doc_row.id if doc_row else None)
+            _finish_document(job_id, extracted_text, doc_row, job_row, **_page_sources(
+                sorted(n for r in results for n in r["text_pages"]),
+                sorted(n for r in results for n in r["ocr_pages"])))
+            return True
         except Exception as e:
             logger.exception("[Job %s] Failed: %s", job_id, e)
+            _fail_document(job_id, doc_row, job_row, e)
+            raise
+        finally:
+            _store_timings(job_id)
+
+
+@celery_app.task(queue="ocr")
+def fail_page_ranges(request, exc, traceback, job_id: str):
+    """Chord errback: a page-range subtask failed, so the job fails."""
+    logger.error("[Job %s] Page-range subtask %s failed: %s", job_id, request.id, exc)
+    with get_app().app_context():
+        doc_row, job_row = _load_rows(job_id)
+        _fail_document(job_id, doc_row, job_row, exc)
+        _store_timings(job_id)
+
+
+# -----------------------------------------------------------------------------
+# Write-behind status persistence
+# -----------------------------------------------------------------------------
+STATUS_FLUSH_BATCH = int(os.environ.get("STATUS_FLUSH_BATCH", 500))
 
-            # ---- Update DB on FAIL ----
-            if doc_row:
-                doc_row.status = "FAILED"
 
-            update_job(status="FAILED",
-                       stage=f"Error: {e}",
-                       progress=0)
+def _status_update(table, columns):
+    """
+    UPDATE of `columns` (NULL params keep the current value) for one job,
+    executed for many jobs at once. Rows in a terminal state are skipped
+    unless :terminal is true, checked in the statement itself so a worker
+    committing COMPLETED/FAILED meanwhile is never overwritten.
+    """
+    status = table.c.status
+    return (
+        table.update()
+        .where(table.c.job_id == bindparam("jid"),
+               or_(bindparam("terminal", type_=Boolean), status.is_(None), status.notin_(TERMINAL_STATUSES)))
+        .values(updated_at=bindparam("now"),
+                **{c: func.coalesce(bindparam("v_" + c), table.c[c]) for c in columns})
+    )
 
-            STATUS.update(job_id, status="FAILED", stage=f"Error: {e}")
 
-            raise
\ No newline at end of file
+@celery_app.task(queue="status", ignore_result=True)
+def flush_job_status(batch_size: int = STATUS_FLUSH_BATCH):
+    """
+    Persist in-flight job state from Redis to Postgres in one transaction.
+
+    Scheduled by celery beat (see celeryconfig.beat_schedule). Terminal
+    states are written synchronously by the worker and never overwritten
+    with an older in-flight state here.
+    """
+    job_ids = STATUS.pop_dirty(batch_size)
+    if not job_ids:
+        return 0
+    states = STATUS.get_many(job_ids)
+    if not states:
+        return 0
+
+    now = datetime.utcnow()
+    params = []
+    for job_id, state in states.items():
+        stage, progress = state.get("stage"), state.get("progress")
+        params.append({
+            "jid": job_id,
+            "terminal": state.get("status") in TERMINAL_STATUSES,
+            "now": now,
+            "v_status": state.get("status"),
+            "v_stage": stage[:128] if stage else None,
+            "v_progress": int(progress) if progress else None,
+        })
+
+    with get_app().app_context():
+        try:
+            db.session.execute(_status_update(Job.__table__, ("status", "stage", "progress")), params)
+            db.session.execute(_status_update(Document.__table__, ("status",)),
+                               [{k: v for k, v in p.items() if k not in ("v_stage", "v_progress")}
+                                for p in params])
+            db.session.commit()
+        except Exception:
+            logger.exception("Status flush failed; re-queueing %d jobs", len(job_ids))
+            db.session.rollback()
+            STATUS.mark_dirty(job_ids)
+            raise
+
+    logger.info("Flushed status of %d jobs to the database", len(states))
+    return len(states)
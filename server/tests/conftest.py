@@ -0,0 +1,74 @@
+"""
+Shared fixtures. The API runs on in-memory SQLite, every Redis client talks
+to one fakeredis server, and objects are stored by LocalStorage in a
+temporary directory, so the suite needs no external services.
+"""
+import os
+import tempfile
+
+import fakeredis
+import pytest
+import redis
+
+# Must be set before the app, storage and status modules are imported.
+os.environ["DB_URL"] = "sqlite://"
+os.environ["REDIS_URL"] = "redis://fakeredis:6379/0"
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_DIR"] = tempfile.mkdtemp(prefix="objects-")
+
+REDIS_SERVER = fakeredis.FakeServer()
+redis.Redis.from_url = classmethod(lambda cls, url, **kwargs: fakeredis.FakeRedis(server=REDIS_SERVER))
+
+from app import create_app, db  # noqa: E402
+from app.models import Document, Job  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _clean_redis():
+    fakeredis.FakeRedis(server=REDIS_SERVER).flushall()
+    yield
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_ECHO"] = False
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def status_store():
+    from app.routes import STATUS
+    return STATUS
+
+
+@pytest.fixture
+def enqueued(monkeypatch):
+    """Record enqueued OCR jobs instead of sending them to the broker."""
+    from app import routes
+    sent = []
+    monkeypatch.setattr(routes, "enqueue_document",
+                        lambda job_id, uri, filename, size=None, pages=None: sent.append(job_id) or "ocr-bulk")
+    monkeypatch.setattr(routes, "enqueue_documents", lambda items: sent.extend(i[0] for i in items))
+    return sent
+
+
+def make_document(job_id, status="COMPLETED", **fields):
+    """Insert a Document and its Job row; returns the Document."""
+    doc = Document(job_id=job_id, filename=fields.pop("filename", f"{job_id}.pdf"), status=status,
+                   gcs_uri=fields.pop("gcs_uri", ""), **fields)
+    db.session.add(doc)
+    db.session.flush()
+    db.session.add(Job(job_id=job_id, filename=doc.filename, gcs_uri=doc.gcs_uri, status=status,
+                       progress=100 if status == "COMPLETED" else 40, stage="", document_id=doc.id))
+    db.session.commit()
+    return doc
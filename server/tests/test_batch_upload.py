@@ -0,0 +1,110 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from app import db, routes
+from app.models import Document, DocumentPage
+from app.payloads import load_text, store_payload
+from conftest import make_document
+
+CACHED = b"%PDF-1.4 cached document"
+
+
+@pytest.fixture
+def cached_doc(app):
+    doc = make_document("src-job", content_hash=hashlib.sha256(CACHED).hexdigest(),
+                        tags_json=json.dumps(["invoice"]))
+    store_payload(doc, "cached text", [{"text": "ACME", "label": "ORG"}])
+    db.session.add(DocumentPage(document_id=doc.id, page_no=1, source="text_layer", text="cached text"))
+    db.session.commit()
+    return doc
+
+
+def _batch(client, files):
+    data = {"files": [(io.BytesIO(body), name) for name, body in files]}
+    return client.post("/api/upload/batch", data=data, content_type="multipart/form-data")
+
+
+@pytest.mark.parametrize("order", ["hit_first", "miss_first"])
+def test_mixed_hit_and_miss_batch(client, cached_doc, enqueued, order):
+    files = [("hit.pdf", CACHED), ("miss.pdf", b"%PDF-1.4 new document " + order.encode())]
+    if order == "miss_first":
+        files.reverse()
+
+    resp = _batch(client, files)
+
+    assert resp.status_code == 200, resp.get_json()
+    jobs = {j["filename"]: j for j in resp.get_json()["jobs"]}
+    assert jobs["hit.pdf"]["cached"] and not jobs["miss.pdf"]["cached"]
+    assert enqueued == [jobs["miss.pdf"]["job_id"]]
+
+    hit = Document.query.filter_by(job_id=jobs["hit.pdf"]["job_id"]).one()
+    assert hit.status == "COMPLETED"
+    assert hit.text == "cached text"
+    assert hit.tags_json == cached_doc.tags_json
+    assert load_text(hit) == "cached text"
+    assert DocumentPage.query.filter_by(document_id=hit.id).count() == 1
+
+    miss = Document.query.filter_by(job_id=jobs["miss.pdf"]["job_id"]).one()
+    assert miss.status == "QUEUED"
+    assert miss.text is None and miss.tags_json is None
+
+
+def _objects():
+    root = os.environ["LOCAL_STORAGE_DIR"]
+    return {os.path.join(d, f) for d, _, files in os.walk(root) for f in files}
+
+
+def _zip(*names):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name in names:
+            zf.writestr(name, b"%PDF-1.4 " + name.encode())
+    return buf.getvalue()
+
+
+def _tar(*names):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name in names:
+            body = b"%PDF-1.4 " + name.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(body)
+            tf.addfile(info, io.BytesIO(body))
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("files", [
+    [("a.pdf", b"%PDF-1.4 a"), ("docs.zip", _zip("b.pdf", "c.pdf"))],  # counted up front
+    [("a.pdf", b"%PDF-1.4 a"), ("docs.tar.gz", _tar("b.pdf", "c.pdf"))],  # counted while streaming
+])
+def test_batch_over_limit_leaves_no_objects(client, enqueued, monkeypatch, files):
+    monkeypatch.setattr(routes, "BATCH_MAX_FILES", 2)
+    before = _objects()
+    resp = _batch(client, files)
+    assert resp.status_code == 413
+    assert _objects() == before
+    assert Document.query.count() == 0 and not enqueued
+
+
+def test_unreadable_archive_removes_uploaded_entries(client, enqueued):
+    before = _objects()
+    resp = _batch(client, [("a.pdf", b"%PDF-1.4 a"), ("broken.tar", b"not a tar archive" * 64)])
+    assert resp.status_code == 400
+    assert _objects() == before
+
+
+def test_failed_insert_removes_uploaded_entries(client, cached_doc, enqueued, monkeypatch):
+    def boom(*args):
+        raise RuntimeError("db down")
+    monkeypatch.setattr(routes, "_copy_pages", boom)
+    before = _objects()
+    resp = _batch(client, [("hit.pdf", CACHED), ("miss.pdf", b"%PDF-1.4 miss")])
+    assert resp.status_code == 500
+    assert _objects() == before
+    assert Document.query.count() == 1 and not enqueued
@@ -0,0 +1,30 @@
+from conftest import make_document
+from url_cache import SIGNED_URL_PREFIX
+
+
+def test_bulk_download_reports_unuploaded_documents_as_missing(client, app):
+    make_document("stored", gcs_uri="local://uploads/stored/a.pdf")
+    make_document("uploading", status="UPLOADING", gcs_uri="")  # row created before the upload
+
+    resp = client.get("/api/download?ids=stored,uploading,unknown")
+
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert set(data["urls"]) == {"stored"}
+    assert data["urls"]["stored"]["url"].startswith("/api/storage/object/")
+    assert sorted(data["missing"]) == ["unknown", "uploading"]
+
+
+def test_signed_urls_are_cached_in_redis(client, app, status_store):
+    make_document("stored", gcs_uri="local://uploads/stored/a.pdf")
+
+    first = client.get("/api/download/stored").get_json()
+    second = client.get("/api/download?ids=stored").get_json()["urls"]["stored"]
+
+    assert first == second
+    assert list(status_store.r.scan_iter(SIGNED_URL_PREFIX + "*"))
+
+
+def test_single_download_without_object(client, app):
+    make_document("uploading", status="UPLOADING", gcs_uri="")
+    assert client.get("/api/download/uploading").status_code == 400
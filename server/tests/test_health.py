@@ -0,0 +1,18 @@
+import redis
+
+from app import routes
+
+
+def test_health_reports_redis(client):
+    resp = client.get("/api/health")
+    assert resp.status_code == 200
+    assert resp.get_json() == {"status": "ok", "redis_status": "connected"}
+
+
+def test_health_is_degraded_without_redis(client, monkeypatch):
+    def refuse():
+        raise redis.ConnectionError("Connection refused")
+
+    monkeypatch.setattr(routes.STATUS.r, "ping", refuse)
+    resp = client.get("/api/health")
+    assert resp.status_code == 503 and resp.get_json()["redis_status"] == "disconnected"
@@ -0,0 +1,104 @@
+import gzip
+import json
+
+import pytest
+
+from app import db
+from app.http_cache import RESPONSE_CACHE
+from app.models import Document, Job
+from app.payloads import store_payload
+from conftest import make_document
+
+TEXT = "Quarterly report. " * 200  # large enough to be compressed
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    RESPONSE_CACHE.entries.clear()
+    RESPONSE_CACHE.bytes = 0
+
+
+@pytest.fixture
+def completed(app):
+    doc = make_document("done-job", tags_json='["report"]')
+    store_payload(doc, TEXT, [{"text": "Quarterly", "label": "DATE"}])
+    db.session.commit()
+    return doc
+
+
+def test_result_has_strong_etag_and_immutable_cache_control(client, completed):
+    resp = client.get("/api/result/done-job")
+    assert resp.status_code == 200
+    assert resp.get_json()["text"] == TEXT
+    assert resp.headers["ETag"].startswith('"') and not resp.headers["ETag"].startswith("W/")
+    assert "immutable" in resp.headers["Cache-Control"]
+
+
+def test_if_none_match_returns_304(client, completed):
+    etag = client.get("/api/result/done-job").headers["ETag"]
+    resp = client.get("/api/result/done-job", headers={"If-None-Match": etag})
+    assert resp.status_code == 304 and resp.data == b""
+    assert resp.headers["ETag"] == etag
+
+
+def test_each_encoding_has_its_own_etag(client, completed):
+    plain = client.get("/api/result/done-job")
+    gz = client.get("/api/result/done-job", headers={"Accept-Encoding": "gzip"})
+
+    assert gz.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(gz.data))["text"] == TEXT
+    assert gz.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert "Accept-Encoding" in gz.headers["Vary"]
+
+    # a validator for either representation revalidates the other
+    resp = client.get("/api/result/done-job", headers={"If-None-Match": plain.headers["ETag"],
+                                                       "Accept-Encoding": "gzip"})
+    assert resp.status_code == 304 and resp.headers["ETag"] == gz.headers["ETag"]
+    resp = client.get("/api/result/done-job", headers={"If-None-Match": gz.headers["ETag"]})
+    assert resp.status_code == 304 and resp.headers["ETag"] == plain.headers["ETag"]
+
+
+def test_completed_result_is_served_from_the_lru_without_the_db(client, completed):
+    first = client.get("/api/result/done-job")
+    Job.query.filter_by(job_id="done-job").delete()
+    db.session.commit()
+    second = client.get("/api/result/done-job")
+    assert second.status_code == 200 and second.data == first.data
+
+
+def test_unfinished_results_are_not_cached(client, app):
+    make_document("running-job", status="OCR_IN_PROGRESS")
+    resp = client.get("/api/result/running-job")
+    assert resp.status_code == 409
+    assert resp.headers["Cache-Control"] == "no-store"
+    assert "result:running-job" not in RESPONSE_CACHE.entries
+
+
+def test_doc_revalidates_until_terminal(client, app):
+    make_document("running-job", status="OCR_IN_PROGRESS")
+    resp = client.get("/api/doc/running-job")
+    assert resp.headers["Cache-Control"] == "no-cache"
+    assert client.get("/api/doc/running-job", headers={"If-None-Match": resp.headers["ETag"]}).status_code == 304
+
+    Document.query.filter_by(job_id="running-job").update({"status": "COMPLETED"})
+    db.session.commit()
+    resp = client.get("/api/doc/running-job")
+    assert resp.get_json()["status"] == "COMPLETED"
+    assert "immutable" in resp.headers["Cache-Control"]
+
+
+def test_terminal_status_is_cached(client, status_store):
+    job_id = status_store.new_job("a.pdf")
+    assert client.get(f"/api/status/{job_id}").headers["Cache-Control"] == "no-cache"
+    status_store.update(job_id, status="COMPLETED", progress=100)
+    assert "immutable" in client.get(f"/api/status/{job_id}").headers["Cache-Control"]
+    assert f"status:{job_id}" in RESPONSE_CACHE.entries
+
+
+def test_lru_evicts_by_size():
+    from app.http_cache import CachedBody, ResponseCache
+    cache = ResponseCache(max_bytes=250, max_entry_bytes=200)
+    for key in ("a", "b", "c"):
+        cache.put(key, CachedBody(b"x" * 100, "application/json", "no-cache"))
+    cache.put("big", CachedBody(b"x" * 201, "application/json", "no-cache"))
+    assert list(cache.entries) == ["b", "c"] and cache.bytes == 200
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from storage import local_file
+
+BODY = b"%PDF-1.4 " + bytes(range(256)) * 40
+
+
+@pytest.fixture
+def session(client, enqueued):
+    resp = client.post("/api/upload/init", json={"filename": "a.pdf", "size": len(BODY)})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    return data["job_id"], data["upload_url"]
+
+
+def _object(client, job_id):
+    from app.models import Job
+    return local_file(Job.query.filter_by(job_id=job_id).one().gcs_uri)
+
+
+def _put(client, url, body, content_range=None):
+    headers = {"Content-Range": content_range} if content_range else {}
+    return client.put(url, data=body, headers=headers)
+
+
+def test_whole_body_put_and_finalize(client, session, enqueued):
+    job_id, url = session
+    assert _put(client, url, BODY).status_code == 200
+    resp = client.post(f"/api/upload/{job_id}/finalize")
+    assert resp.get_json() == {"job_id": job_id, "status": "QUEUED", "size": len(BODY)}
+    assert enqueued == [job_id]
+    # finalize is idempotent: a second call does not enqueue again
+    client.post(f"/api/upload/{job_id}/finalize")
+    assert enqueued == [job_id]
+
+
+def test_chunked_upload_resumes_at_persisted_offset(client, session):
+    job_id, url = session
+    total = len(BODY)
+    resp = _put(client, url, BODY[:4096], f"bytes 0-4095/{total}")
+    assert resp.status_code == 308 and resp.headers["Range"] == "bytes=0-4095"
+
+    # a chunk at the wrong offset is refused with the persisted range
+    resp = _put(client, url, BODY[5000:], f"bytes 5000-{total - 1}/{total}")
+    assert resp.status_code == 308 and resp.headers["Range"] == "bytes=0-4095"
+
+    assert _put(client, url, b"", f"bytes */{total}").headers["Range"] == "bytes=0-4095"
+    assert _put(client, url, BODY[4096:], f"bytes 4096-{total - 1}/{total}").status_code == 200
+    with open(_object(client, job_id), "rb") as fh:
+        assert fh.read() == BODY
+
+
+def test_retried_whole_body_put_discards_stale_part(client, session):
+    job_id, url = session
+    _put(client, url, BODY[:4096], f"bytes 0-4095/{len(BODY)}")  # first attempt dies midway
+
+    resp = _put(client, url, BODY)
+    assert resp.get_json()["size"] == len(BODY)
+    with open(_object(client, job_id), "rb") as fh:
+        assert fh.read() == BODY
+
+
+def test_restart_at_offset_zero_overwrites(client, session):
+    job_id, url = session
+    total = len(BODY)
+    _put(client, url, b"x" * 4096, f"bytes 0-4095/{total}")
+    assert _put(client, url, BODY, f"bytes 0-{total - 1}/{total}").status_code == 200
+    with open(_object(client, job_id), "rb") as fh:
+        assert fh.read() == BODY
+
+
+def test_body_longer_than_total_is_rejected(client, session):
+    job_id, url = session
+    resp = _put(client, url, BODY + b"extra", f"bytes 0-{len(BODY) + 4}/{len(BODY)}")
+    assert resp.status_code == 400
+    path = _object(client, job_id)
+    assert not os.path.exists(path) and not os.path.exists(path + ".part")
@@ -0,0 +1,36 @@
+import sys
+import types
+
+import pytest
+
+import tasks
+
+
+def _fake_tesserocr(api):
+    return types.SimpleNamespace(PyTessBaseAPI=api)
+
+
+def _broken_api(lang):
+    raise RuntimeError(f"Failed to init API, possibly an invalid tessdata path: {lang}")
+
+
+class FakeApi:
+    def __init__(self, lang):
+        self.lang = lang
+
+
+@pytest.mark.parametrize("name", ["auto", "tesserocr"])
+def test_falls_back_to_pytesseract_when_tesserocr_fails_to_start(monkeypatch, name):
+    monkeypatch.setitem(sys.modules, "tesserocr", _fake_tesserocr(_broken_api))
+    assert isinstance(tasks.make_engine(name), tasks.PytesseractEngine)
+
+
+def test_falls_back_to_pytesseract_when_tesserocr_is_missing(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tesserocr", None)  # import raises ImportError
+    assert isinstance(tasks.make_engine("auto"), tasks.PytesseractEngine)
+
+
+def test_uses_tesserocr_when_it_starts(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tesserocr", _fake_tesserocr(FakeApi))
+    engine = tasks.make_engine("auto")
+    assert isinstance(engine, tasks.TesserocrEngine) and engine._api().lang == tasks.OCR_LANG
@@ -0,0 +1,141 @@
+import json
+
+import pytest
+
+import tasks
+from app import db
+from app.models import Document, DocumentPage, Job
+from app.payloads import load_text
+from metrics import METRICS
+from conftest import make_document
+from status_store import STATUS_PREFIX
+
+TEXT_LAYER = "Embedded text layer of page one, long enough to keep."
+
+
+class FakePdf:
+    """Four-page PDF: page 1 has a text layer, pages 2-4 need OCR."""
+
+    def __init__(self, monkeypatch, fail_on=None):
+        self.downloads, self.embedded, self.ocr = 0, [], []
+        self.fail_on = fail_on
+        monkeypatch.setattr(tasks, "download_to_path", self.download)
+        monkeypatch.setattr(tasks, "pdf_page_count", lambda path: 4)
+        monkeypatch.setattr(tasks, "extract_embedded_text", self.extract_embedded_text)
+        monkeypatch.setattr(tasks, "ocr_pdf_pages", self.ocr_pdf_pages)
+        monkeypatch.setattr(tasks, "analyze_text", lambda text: ([{"text": "ACME", "label": "ORG"}], []))
+
+    def download(self, uri, local_path):
+        self.downloads += 1
+        with open(local_path, "wb") as fh:
+            fh.write(b"%PDF-1.4")
+        return local_path
+
+    def extract_embedded_text(self, path, first, last):
+        self.embedded.append((first, last))
+        return [TEXT_LAYER if n == 1 else "" for n in range(first, last + 1)]
+
+    def ocr_pdf_pages(self, path, pages, on_page=None):
+        texts = {}
+        for n in pages:
+            if n == self.fail_on:
+                self.fail_on = None  # fail once, like a crashed or killed worker
+                raise RuntimeError(f"tesseract died on page {n}")
+            self.ocr.append(n)
+            texts[n] = f"ocr page {n}"
+            on_page(n, texts[n])
+        return texts
+
+
+@pytest.fixture
+def worker_app(app, monkeypatch):
+    """Run tasks in the test app (and database) instead of creating their own."""
+    monkeypatch.setattr(tasks, "_flask_app", app)
+    return app
+
+
+@pytest.fixture
+def job(worker_app):
+    make_document("pdf-job", status="QUEUED", gcs_uri="local://uploads/pdf-job/a.pdf")
+    return "pdf-job"
+
+
+def _run(job_id):
+    return tasks.process_document(job_id, f"local://uploads/{job_id}/a.pdf", "a.pdf")
+
+
+def _expected_text():
+    return "\n".join([TEXT_LAYER] + [f"ocr page {n}" for n in (2, 3, 4)])
+
+
+def test_retry_resumes_from_checkpointed_pages(job, monkeypatch):
+    pdf = FakePdf(monkeypatch, fail_on=3)
+
+    with pytest.raises(RuntimeError):
+        _run(job)  # called directly, retry() re-raises instead of scheduling
+    assert tasks.STATUS.get(job)["status"] == "RETRYING"
+    assert tasks._stored_pages(Document.query.filter_by(job_id=job).one().id) == {1: "text_layer", 2: "ocr"}
+
+    assert _run(job) is True
+    assert pdf.ocr == [2, 3, 4]  # page 2 was not OCR'd again
+    assert pdf.embedded == [(1, 4), (3, 4)]  # the text layer is only read for new pages
+
+    db.session.expire_all()
+    doc = Document.query.filter_by(job_id=job).one()
+    assert doc.status == "COMPLETED" and load_text(doc) == _expected_text()
+    state = tasks.STATUS.get(job)
+    assert state["status"] == "COMPLETED" and state["attempts"] == "2"
+    assert state["text_pages"] == "1" and state["ocr_pages"] == "2-4"
+    job_row = Job.query.filter_by(job_id=job).one()
+    assert (job_row.text_pages, job_row.ocr_pages) == ("1", "2-4")
+    pages = DocumentPage.query.filter_by(document_id=doc.id).order_by(DocumentPage.page_no).all()
+    assert [(p.char_start, p.char_end) for p in pages][:2] == [(0, len(TEXT_LAYER)),
+                                                               (len(TEXT_LAYER) + 1, len(TEXT_LAYER) + 11)]
+
+
+def test_all_pages_checkpointed_skips_download(job, monkeypatch):
+    pdf = FakePdf(monkeypatch)
+    doc = Document.query.filter_by(job_id=job).one()
+    db.session.add(DocumentPage(document_id=doc.id, page_no=1, source="text_layer", text=TEXT_LAYER))
+    db.session.add_all(DocumentPage(document_id=doc.id, page_no=n, source="ocr", text=f"ocr page {n}")
+                       for n in (2, 3, 4))
+    db.session.commit()
+    tasks.STATUS.restore(job, {"id": job, "status": "OCR_IN_PROGRESS", "pages_total": 4})
+
+    assert _run(job) is True
+    assert pdf.downloads == 0 and not pdf.ocr
+
+    db.session.expire_all()
+    assert load_text(Document.query.filter_by(job_id=job).one()) == _expected_text()
+    assert Job.query.filter_by(job_id=job).one().status == "COMPLETED"
+
+
+def test_completed_job_is_not_processed_again(job, monkeypatch):
+    pdf = FakePdf(monkeypatch)
+    assert _run(job) is True
+    attempts = tasks.STATUS.get(job)["attempts"]
+
+    assert _run(job) is True  # duplicate delivery (acks_late redelivery)
+    assert pdf.downloads == 1 and pdf.ocr == [2, 3, 4]
+    assert tasks.STATUS.get(job)["attempts"] == attempts
+
+
+def test_page_sources_outlive_the_status_record(job, monkeypatch, client):
+    FakePdf(monkeypatch)
+    assert _run(job) is True
+
+    tasks.STATUS.r.delete(STATUS_PREFIX + job)  # expired
+    body = client.get(f"/api/status/{job}").get_json()
+    assert body["status"] == "COMPLETED" and (body["text_pages"], body["ocr_pages"]) == ("1", "2-4")
+    assert tasks.STATUS.get(job)["ocr_pages"] == "2-4"
+
+
+def test_timings_include_the_total_and_final_stages(job, monkeypatch):
+    FakePdf(monkeypatch)
+    assert _run(job) is True
+
+    db.session.expire_all()
+    timings = json.loads(Job.query.filter_by(job_id=job).one().timings_json)
+    assert timings == METRICS.job_timings(job)
+    assert timings["total_count"] == 1 and timings["total"] >= timings["db_persist"]
+    assert timings["pages_ocr"] == 3
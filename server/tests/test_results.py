@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from app import db, payloads
+from app.models import DocumentPage
+from app.payloads import load_entities, load_text, store_payload, text_size
+from app.search import SEARCH_MAX_CHARS
+from conftest import make_document
+
+PAGES = ["Première page — café.", "Second page.", "Third page: ünïcode ✓.", "Fourth page."]
+TEXT = "\n".join(PAGES)
+RAW = TEXT.encode("utf-8")
+
+
+@pytest.fixture(autouse=True)
+def _small_stream_chunks(monkeypatch):
+    # Ranges then start and end inside different decompressed pieces
+    monkeypatch.setattr(payloads, "STREAM_CHUNK_SIZE", 7)
+
+
+@pytest.fixture
+def completed(app):
+    doc = make_document("done-job")
+    store_payload(doc, TEXT, [{"text": "café", "label": "ORG"}])
+    db.session.add_all(DocumentPage(document_id=doc.id, page_no=n, source="ocr", text=t)
+                       for n, t in enumerate(PAGES, 1))
+    db.session.commit()
+    return doc
+
+
+def test_payload_round_trip(app):
+    doc = make_document("long-job")
+    long_text = TEXT * (SEARCH_MAX_CHARS // len(TEXT) + 2)
+    store_payload(doc, long_text, [{"text": "café", "label": "ORG"}])
+    db.session.commit()
+    assert load_text(doc) == long_text
+    assert load_entities(doc) == [{"text": "café", "label": "ORG"}]
+    assert text_size(doc) == len(long_text.encode("utf-8"))
+    assert doc.text == long_text[:SEARCH_MAX_CHARS] and doc.entities_json is None
+
+
+def test_full_text(client, completed):
+    resp = client.get("/api/result/done-job/text")
+    assert resp.status_code == 200
+    assert resp.headers["Accept-Ranges"] == "bytes"
+    assert resp.data == RAW
+
+
+@pytest.mark.parametrize("header, start, stop", [
+    ("bytes=0-9", 0, 10),
+    ("bytes=20-40", 20, 41),
+    ("bytes=-5", len(RAW) - 5, len(RAW)),
+    (f"bytes=30-{len(RAW) + 100}", 30, len(RAW)),
+])
+def test_text_byte_range(client, completed, header, start, stop):
+    resp = client.get("/api/result/done-job/text", headers={"Range": header})
+    assert resp.status_code == 206
+    assert resp.headers["Content-Range"] == f"bytes {start}-{stop - 1}/{len(RAW)}"
+    assert resp.data == RAW[start:stop]
+
+
+def test_unsatisfiable_range(client, completed):
+    resp = client.get("/api/result/done-job/text", headers={"Range": f"bytes={len(RAW)}-"})
+    assert resp.status_code == 416
+    assert resp.headers["Content-Range"] == f"bytes */{len(RAW)}"
+
+
+def test_text_page_selection(client, completed):
+    assert client.get("/api/result/done-job/text?pages=2-3").get_data(as_text=True) == "\n".join(PAGES[1:3])
+    assert client.get("/api/result/done-job/text?pages=4").get_data(as_text=True) == PAGES[3]
+    assert client.get("/api/result/done-job/text?pages=x").status_code == 400
+
+
+def test_text_not_ready(client, app):
+    make_document("running-job", status="OCR_IN_PROGRESS")
+    assert client.get("/api/result/running-job/text").status_code == 409
+
+
+def test_pages_stream_while_running(client, app, status_store):
+    doc = make_document("running-job", status="OCR_IN_PROGRESS")
+    db.session.add_all(DocumentPage(document_id=doc.id, page_no=n, source="ocr", text=f"page {n}")
+                       for n in (1, 2, 3))
+    db.session.commit()
+    status_store.restore("running-job", {"id": "running-job", "status": "OCR_IN_PROGRESS", "pages_total": 10})
+
+    resp = client.get("/api/result/running-job/pages?from=2")
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-ndjson"
+    assert resp.headers["X-Job-Status"] == "OCR_IN_PROGRESS"
+    assert resp.headers["X-Pages-Total"] == "10"
+    assert resp.headers["Cache-Control"] == "no-store"
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [p["page"] for p in lines] == [2, 3]
+    assert lines[0]["text"] == "page 2" and lines[0]["source"] == "ocr"
+
+    resp = client.get("/api/result/running-job/pages?from=1&to=1")
+    assert [json.loads(line)["page"] for line in resp.get_data(as_text=True).splitlines()] == [1]
+
+
+def test_pages_unknown_job(client, app):
+    assert client.get("/api/result/missing/pages").status_code == 404
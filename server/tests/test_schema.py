@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import inspect
+
+from app import create_app, db
+from app.models import Document, Job
+from app.schema import ADDED_COLUMNS, ADDED_INDEXES
+
+# documents / jobs as first released, before any column was added
+BASELINE_DDL = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY, username VARCHAR(64) NOT NULL UNIQUE, email VARCHAR(128) NOT NULL UNIQUE,
+    name VARCHAR(128) NOT NULL, password_hash VARCHAR(256) NOT NULL, created_at DATETIME
+);
+CREATE TABLE documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, job_id VARCHAR(64) NOT NULL UNIQUE, filename VARCHAR(512),
+    mime VARCHAR(128), gcs_uri VARCHAR(1024), status VARCHAR(64) NOT NULL, text TEXT,
+    entities_json TEXT, tags_json TEXT, created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP, user_id INTEGER REFERENCES users (id)
+);
+CREATE TABLE jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, job_id VARCHAR(64) NOT NULL UNIQUE, filename VARCHAR(256) NOT NULL,
+    mime VARCHAR(128), gcs_uri VARCHAR(512), status VARCHAR(64), progress INTEGER, stage VARCHAR(128),
+    created_at DATETIME, updated_at DATETIME, document_id INTEGER REFERENCES documents (id)
+);
+INSERT INTO documents (job_id, filename, mime, gcs_uri, status, text)
+    VALUES ('old-job', 'old.pdf', '', 'local://old.pdf', 'COMPLETED', 'old text');
+INSERT INTO jobs (job_id, filename, status, progress, stage, document_id)
+    VALUES ('old-job', 'old.pdf', 'COMPLETED', 100, 'Done', 1);
+"""
+
+
+POSTGRES_ONLY = {"ix_documents_search_vector", "ix_documents_text_trgm",
+                 "ix_documents_filename_trgm", "ix_documents_tags_trgm"}
+
+
+def _indexes(inspector):
+    return {ix["name"] for t in ("documents", "jobs") for ix in inspector.get_indexes(t)}
+
+
+@pytest.fixture
+def old_db(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_DDL)
+    monkeypatch.setenv("DB_URL", f"sqlite:///{path}")
+
+
+def test_existing_tables_gain_added_columns(old_db):
+
+    for _ in range(2):  # a second start finds nothing to do
+        app = create_app()
+        with app.app_context():
+            inspector = inspect(db.engine)
+            for table, column in ADDED_COLUMNS:
+                assert column in {c["name"] for c in inspector.get_columns(table)}
+            # indexes are left to the one-off create-indexes command
+            assert not set(ADDED_INDEXES) & _indexes(inspector)
+
+            # the ORM can read the old rows through every mapped column
+            doc = Document.query.filter_by(job_id="old-job").one()
+            assert doc.text == "old text"
+            assert doc.search_vector is None  # filled in by `flask reindex-search`
+            job = Job.query.filter_by(job_id="old-job").one()
+            assert job.batch_id is None and job.timings_json is None
+            db.session.remove()
+            db.engine.dispose()
+
+
+def test_create_indexes_command_builds_missing_indexes(old_db):
+    app = create_app()
+    with app.app_context():
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=["create-indexes"])
+        assert result.exit_code == 0 and "Created 2 indexes" in result.output
+        assert _indexes(inspect(db.engine)) >= set(ADDED_INDEXES) - POSTGRES_ONLY
+
+        assert "Created 0 indexes" in runner.invoke(args=["create-indexes"]).output
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+from sqlalchemy import text
+
+from app import db, search
+from app.models import Document
+from app.payloads import store_payload
+from conftest import make_document
+
+
+def _ids(resp):
+    assert resp.status_code == 200, resp.get_json()
+    return [r["job_id"] for r in resp.get_json()["results"]]
+
+
+def test_reindex_search_fills_missing_vectors(app, monkeypatch):
+    indexed = []
+
+    def fake_index(doc, text, tags, entities):
+        indexed.append((doc.job_id, text, tags, entities))
+        doc.search_vector = f"vector of {doc.job_id}"
+
+    monkeypatch.setattr(search, "is_postgres", lambda: True)
+    monkeypatch.setattr(search, "index_document", fake_index)
+    for job_id in ("old-1", "old-2"):
+        doc = make_document(job_id, tags_json=json.dumps(["invoice"]))
+        store_payload(doc, f"text of {job_id}", [{"text": "ACME", "label": "ORG"}])
+    make_document("indexed", search_vector="already indexed")
+    make_document("running", status="OCR_IN_PROGRESS")
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["reindex-search", "--batch-size", "1"])
+
+    assert result.exit_code == 0 and "Reindexed 2 documents" in result.output
+    assert sorted(indexed) == [(j, f"text of {j}", ["invoice"], [{"text": "ACME", "label": "ORG"}])
+                               for j in ("old-1", "old-2")]
+    db.session.expire_all()
+    assert {d.job_id: d.search_vector for d in Document.query.filter_by(status="COMPLETED")} == {
+        "old-1": "vector of old-1", "old-2": "vector of old-2", "indexed": "already indexed"}
+
+
+def test_reindex_search_is_a_no_op_outside_postgres(app):
+    make_document("old-1")
+    result = app.test_cli_runner().invoke(args=["reindex-search"])
+    assert result.exit_code == 0 and "Reindexed 0 documents" in result.output
+
+
+def test_fts_falls_back_to_a_scan_outside_postgres(client, app):
+    make_document("a", filename="invoice-2024.pdf", text="ACME Corp")
+    make_document("b", filename="letter.pdf", text="Dear ACME")
+    make_document("c", filename="notes.pdf", text="nothing here")
+
+    assert _ids(client.get("/api/search?q=acme")) == ["b", "a"]
+    assert _ids(client.get("/api/search?q=acme&limit=1&offset=1")) == ["a"]
+    assert _ids(client.get("/api/search?q=")) == []
+
+
+@pytest.mark.parametrize("query", ["mode=regex", "threshold=2"])
+def test_search_rejects_bad_parameters(client, app, query):
+    assert client.get(f"/api/search?q=acme&{query}").status_code == 400
+
+
+@pytest.fixture
+def ngram_index(monkeypatch):
+    index = search.NgramIndex()
+    monkeypatch.setattr(search, "NGRAM_INDEX", index)
+    return index
+
+
+def test_substring_and_similar_search(client, app, ngram_index):
+    make_document("a", filename="a.pdf", text="Invoice from ACME Corporation")
+    make_document("b", filename="b.pdf", text="Invoce from ACME Corp", tags_json='["billing"]')
+    make_document("c", filename="c.pdf", text="Meeting notes")
+
+    assert _ids(client.get("/api/search?q=acme corp&mode=substring")) == ["b", "a"]
+    assert _ids(client.get("/api/search?q=billing&mode=substring")) == ["b"]
+    similar = client.get("/api/search?q=invoice&mode=similar&threshold=0.5").get_json()["results"]
+    assert [r["job_id"] for r in similar] == ["a", "b"] and similar[0]["rank"] == 1.0
+    assert _ids(client.get("/api/search?q=invoice&mode=similar&threshold=1")) == ["a"]
+
+
+def test_documents_changed_after_a_refresh_are_found(client, app, ngram_index):
+    doc = make_document("a", text="first draft")
+    assert _ids(client.get("/api/search?q=draft&mode=substring")) == ["a"]
+
+    make_document("b", text="second draft")
+    # An edit in the same second as the last refresh, stored the way
+    # SQLite's CURRENT_TIMESTAMP stores it (no fractional seconds).
+    db.session.execute(text("UPDATE documents SET text = 'final version', updated_at = :ts WHERE id = :id"),
+                       {"ts": ngram_index.synced_at.strftime("%Y-%m-%d %H:%M:%S"), "id": doc.id})
+    db.session.commit()
+    db.session.expire_all()  # as if another process had made the edit
+
+    assert _ids(client.get("/api/search?q=draft&mode=substring")) == ["b"]
+    assert _ids(client.get("/api/search?q=final version&mode=substring")) == ["a"]
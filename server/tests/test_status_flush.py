@@ -0,0 +1,55 @@
+import pytest
+
+import tasks
+from app import db
+from app.models import Document, Job
+from conftest import make_document
+
+
+@pytest.fixture
+def worker_app(app, monkeypatch):
+    monkeypatch.setattr(tasks, "_flask_app", app)
+    return app
+
+
+def _rows(job_id):
+    db.session.expire_all()
+    return Job.query.filter_by(job_id=job_id).one(), Document.query.filter_by(job_id=job_id).one()
+
+
+def _record(job_id, **fields):
+    tasks.STATUS.restore(job_id, {"id": job_id, "status": "QUEUED", "progress": 40, "stage": "Queued"})
+    tasks.STATUS.update(job_id, **fields)
+
+
+def test_flush_persists_in_flight_state(worker_app):
+    make_document("running", status="QUEUED")
+    _record("running", status="OCR_IN_PROGRESS", progress=70, stage="OCR page 3/10")
+
+    assert tasks.flush_job_status() == 1
+
+    job, doc = _rows("running")
+    assert (job.status, job.progress, job.stage) == ("OCR_IN_PROGRESS", 70, "OCR page 3/10")
+    assert doc.status == "OCR_IN_PROGRESS"
+    assert tasks.flush_job_status() == 0  # nothing dirty any more
+
+
+def test_flush_never_overwrites_a_terminal_row(worker_app):
+    make_document("done", status="COMPLETED")
+    _record("done", status="OCR_IN_PROGRESS", progress=70, stage="OCR page 3/10")
+
+    tasks.flush_job_status()
+
+    job, doc = _rows("done")
+    assert (job.status, job.progress) == ("COMPLETED", 100) and doc.status == "COMPLETED"
+
+
+def test_flush_writes_terminal_state(worker_app):
+    make_document("failed", status="QUEUED")
+    _record("failed", status="FAILED", stage="Error: boom")
+
+    tasks.flush_job_status()
+
+    job, doc = _rows("failed")
+    assert (job.status, job.stage, job.progress) == ("FAILED", "Error: boom", 40)
+    assert doc.status == "FAILED"
@@ -0,0 +1,57 @@
+from status_store import STATUS_PREFIX, DIRTY_KEY, STATUS_TTL_COMPLETED, STATUS_TTL_ACTIVE
+
+
+def test_update_keeps_progress_monotonic(status_store):
+    job_id = status_store.new_job("a.pdf")
+    status_store.update(job_id, progress=70, stage="OCR page 5/10")
+    status_store.update(job_id, progress=65, stage="OCR page 4/10")  # late, out-of-order writer
+    state = status_store.get(job_id)
+    assert state["progress"] == "70"
+    assert state["stage"] == "OCR page 4/10"
+
+
+def test_update_skips_missing_record(status_store):
+    status_store.update("missing", status="COMPLETED")
+    assert not status_store.r.exists(STATUS_PREFIX + "missing")
+    assert not status_store.r.sismember(DIRTY_KEY, "missing")
+
+
+def test_update_marks_dirty_and_publishes_delta(status_store):
+    job_id = status_store.new_job("a.pdf")
+    pubsub = status_store.subscribe([job_id])
+    status_store.update(job_id, status="OCR_IN_PROGRESS", progress=60)
+    messages = [pubsub.get_message(timeout=0.1) for _ in range(3)]
+    assert any(m and b'"status":"OCR_IN_PROGRESS"' in m["data"] for m in messages)
+    assert status_store.pop_dirty(10) == [job_id]
+
+
+def test_ttl_follows_status(status_store):
+    job_id = status_store.new_job("a.pdf")
+    assert status_store.r.ttl(STATUS_PREFIX + job_id) > STATUS_TTL_COMPLETED
+    status_store.update(job_id, status="COMPLETED", progress=100)
+    assert 0 < status_store.r.ttl(STATUS_PREFIX + job_id) <= STATUS_TTL_COMPLETED
+    status_store.update(job_id, stage="Done")  # no status change keeps the TTL
+    assert status_store.r.ttl(STATUS_PREFIX + job_id) <= STATUS_TTL_COMPLETED < STATUS_TTL_ACTIVE
+
+
+def test_get_many_omits_missing(status_store):
+    a, b = status_store.new_job("a.pdf"), status_store.new_job("b.pdf")
+    states = status_store.get_many([a, "missing", b])
+    assert set(states) == {a, b}
+
+
+def test_incr_field_publishes_and_marks_dirty(status_store):
+    job_id = status_store.new_job("a.pdf")
+    pubsub = status_store.subscribe([job_id])
+    assert status_store.incr_field(job_id, "pages_done") == 1
+    assert status_store.incr_field(job_id, "pages_done") == 2
+    messages = [pubsub.get_message(timeout=0.1) for _ in range(4)]
+    assert any(m and m["data"] == b'{"pages_done":"2"}' for m in messages)
+    assert status_store.pop_dirty(10) == [job_id]
+    assert status_store.r.ttl(STATUS_PREFIX + job_id) > STATUS_TTL_COMPLETED
+
+
+def test_incr_field_skips_missing_record(status_store):
+    assert status_store.incr_field("missing", "attempts") is None
+    assert not status_store.r.exists(STATUS_PREFIX + "missing")
+    assert not status_store.r.sismember(DIRTY_KEY, "missing")
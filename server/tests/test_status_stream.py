@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from app import routes
+from conftest import make_document
+
+
+@pytest.fixture(autouse=True)
+def short_streams(monkeypatch):
+    monkeypatch.setattr(routes, "SSE_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(routes, "SSE_MAX_SECONDS", 1)
+
+
+def _events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_snapshot_then_deltas_then_end(client, status_store, monkeypatch):
+    job_id = status_store.new_job("a.pdf")
+    real_get_many = status_store.get_many
+
+    def get_many_and_progress(ids):
+        states = real_get_many(ids)
+        status_store.update(job_id, status="OCR_IN_PROGRESS", progress=60)
+        status_store.update(job_id, status="COMPLETED", progress=100, stage="Done")
+        return states
+
+    monkeypatch.setattr(status_store, "get_many", get_many_and_progress)
+    events = _events(client.get(f"/api/status/{job_id}/stream").get_data(as_text=True))
+
+    assert events[0][1]["status"] == "RECEIVED"  # full snapshot
+    assert events[1] == ("status", {"job_id": job_id, "status": "OCR_IN_PROGRESS", "progress": 60})
+    assert events[2][1]["status"] == "COMPLETED"
+    assert events[-1] == ("end", {})
+
+
+def test_terminal_update_racing_the_snapshot_is_not_lost(client, status_store, monkeypatch):
+    """An update published right after the snapshot read must still end the stream."""
+    job_id = status_store.new_job("a.pdf")
+    real_get_many = status_store.get_many
+
+    def get_many_then_complete(ids):
+        states = real_get_many(ids)
+        status_store.update(job_id, status="COMPLETED", progress=100)
+        return states
+
+    monkeypatch.setattr(status_store, "get_many", get_many_then_complete)
+    events = _events(client.get(f"/api/status/{job_id}/stream").get_data(as_text=True))
+
+    assert ("status", {"job_id": job_id, "status": "COMPLETED", "progress": 100}) in events
+    assert events[-1] == ("end", {})
+
+
+def test_terminal_snapshot_from_postgres_ends_immediately(client, app):
+    make_document("done-job")  # no Redis record: falls back to the Job row
+    events = _events(client.get("/api/status/stream?ids=done-job").get_data(as_text=True))
+    assert events[0][1]["status"] == "COMPLETED"
+    assert events[-1] == ("end", {})
+
+
+def test_stream_restored_from_postgres_gets_deltas(client, app, status_store):
+    make_document("running", status="OCR_IN_PROGRESS")  # Redis lost the record
+    resp = client.get("/api/status/stream?ids=running")  # body is read lazily below
+
+    status_store.update("running", status="COMPLETED", progress=100)
+    events = _events(resp.get_data(as_text=True))
+
+    assert events[0][1]["status"] == "OCR_IN_PROGRESS"
+    assert ("status", {"job_id": "running", "status": "COMPLETED", "progress": 100}) in events
+    assert events[-1] == ("end", {})
+
+
+def test_unknown_job_is_404(client, status_store):
+    job_id = status_store.new_job("a.pdf")
+    assert client.get(f"/api/status/stream?ids={job_id},nope").status_code == 404
@@ -0,0 +1,71 @@
+import hashlib
+import io
+import json
+
+import pytest
+
+from app import db
+from app.models import Document, DocumentPage, Job
+from app.payloads import load_text, store_payload
+from conftest import make_document
+
+CACHED = b"%PDF-1.4 cached document"
+CACHED_HASH = hashlib.sha256(CACHED).hexdigest()
+
+
+@pytest.fixture
+def cached_doc(app):
+    doc = make_document("src-job", content_hash=CACHED_HASH, gcs_uri="local://uploads/src-job/a.pdf",
+                        tags_json=json.dumps(["invoice"]))
+    store_payload(doc, "cached text", [{"text": "ACME", "label": "ORG"}])
+    db.session.add(DocumentPage(document_id=doc.id, page_no=1, source="text_layer", text="cached text"))
+    db.session.commit()
+    return doc
+
+
+def _upload(client, body, name="a.pdf"):
+    return client.post("/api/upload", data={"file": (io.BytesIO(body), name)},
+                       content_type="multipart/form-data")
+
+
+def _assert_copy_of(job_id, src, status_store):
+    doc = Document.query.filter_by(job_id=job_id).one()
+    assert doc.id != src.id and doc.status == "COMPLETED"
+    assert doc.gcs_uri == src.gcs_uri and doc.tags_json == src.tags_json
+    assert load_text(doc) == "cached text"
+    assert DocumentPage.query.filter_by(document_id=doc.id).count() == 1
+    assert Job.query.filter_by(job_id=job_id).one().stage == "Done (cached)"
+    assert status_store.get(job_id)["status"] == "COMPLETED"
+
+
+def test_upload_of_processed_bytes_is_served_from_cache(client, cached_doc, enqueued, status_store):
+    resp = _upload(client, CACHED, "copy.pdf")
+    assert resp.status_code == 200
+    assert resp.get_json()["cached"] is True
+    assert not enqueued
+    _assert_copy_of(resp.get_json()["job_id"], cached_doc, status_store)
+
+
+def test_upload_reuses_object_of_unfinished_duplicate(client, app, enqueued):
+    body = b"%PDF-1.4 still processing"
+    make_document("running-job", status="OCR_IN_PROGRESS", content_hash=hashlib.sha256(body).hexdigest(),
+                  gcs_uri="local://uploads/running-job/a.pdf")
+
+    resp = _upload(client, body)
+    assert resp.status_code == 200 and "cached" not in resp.get_json()
+    job_id = resp.get_json()["job_id"]
+    assert enqueued == [job_id]
+    assert Document.query.filter_by(job_id=job_id).one().gcs_uri == "local://uploads/running-job/a.pdf"
+
+
+def test_hash_lookup(client, cached_doc):
+    assert client.get(f"/api/upload/hash/{CACHED_HASH.upper()}").get_json() == {
+        "sha256": CACHED_HASH, "exists": True, "cached": True}
+    assert client.get(f"/api/upload/hash/{'0' * 64}").get_json()["exists"] is False
+
+
+def test_hash_post_creates_completed_job(client, cached_doc, status_store):
+    resp = client.post(f"/api/upload/hash/{CACHED_HASH}", json={"filename": "again.pdf"})
+    assert resp.status_code == 200
+    _assert_copy_of(resp.get_json()["job_id"], cached_doc, status_store)
+    assert client.post(f"/api/upload/hash/{'0' * 64}", json={}).status_code == 404
@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import logging
+import redis
+from storage import generate_signed_url
+from metrics import METRICS
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
+)
+logger = logging.getLogger("url_cache")
+
+SIGNED_URL_PREFIX = "signed-url:"
+# Lifetime of download URLs handed to clients.
+SIGNED_URL_MINUTES = int(os.environ.get("SIGNED_URL_MINUTES", 30))
+# A cached URL is reused only while it stays valid at least this many seconds
+# longer, so a client never receives a URL that is about to expire.
+SIGNED_URL_EXPIRY_MARGIN = int(os.environ.get("SIGNED_URL_EXPIRY_MARGIN", 300))
+
+
+class SignedUrlCache:
+    """
+    Signed download URLs shared by all API processes through Redis.
+
+    Entries are keyed by object URI and lifetime, and expire from Redis
+    SIGNED_URL_EXPIRY_MARGIN seconds before the URL does, so whatever is
+    found is still usable for at least the margin. If Redis is unavailable
+    URLs are signed directly.
+    """
+
+    def __init__(self, url: str | None = None, minutes: int = SIGNED_URL_MINUTES,
+                 margin: int = SIGNED_URL_EXPIRY_MARGIN):
+        self.r = redis.Redis.from_url(url or os.environ.get("REDIS_URL", "redis://redis:6379/0"))
+        self.minutes = minutes
+        self.margin = margin
+
+    def _key(self, uri: str) -> str:
+        return f"{SIGNED_URL_PREFIX}{self.minutes}:{uri}"
+
+    def _sign(self, uri: str) -> dict:
+        started = time.perf_counter()
+        url = generate_signed_url(uri, minutes=self.minutes)
+        METRICS.observe("storage_sign_seconds", time.perf_counter() - started,
+                        backend=uri.split("://", 1)[0])
+        return {"url": url, "expires_at": int(time.time()) + self.minutes * 60}
+
+    def get(self, uri: str) -> dict:
+        """Return {"url", "expires_at"} for uri, signing it on a miss."""
+        return self.get_many([uri])[uri]
+
+    def get_many(self, uris: list[str]) -> dict[str, dict]:
+        """Return {uri: {"url", "expires_at"}}; one Redis round trip to read, one to store."""
+        uris = list(dict.fromkeys(uris))
+        if not uris:
+            return {}
+        try:
+            cached = self.r.mget([self._key(u) for u in uris])
+        except redis.RedisError as e:
+            logger.warning("Signed URL cache unavailable, signing %d URLs directly: %s", len(uris), e)
+            cached = [None] * len(uris)
+
+        found, signed = {}, {}
+        for uri, raw in zip(uris, cached):
+            if raw is not None:
+                found[uri] = json.loads(raw)
+            else:
+                signed[uri] = found[uri] = self._sign(uri)
+        if found.keys() - signed.keys():
+            METRICS.inc("signed_url_cache_requests_total", len(found) - len(signed), result="hit")
+        if signed:
+            METRICS.inc("signed_url_cache_requests_total", len(signed), result="miss")
+            self._store(signed)
+        return found
+
+    def _store(self, signed: dict[str, dict]):
+        ttl = self.minutes * 60 - self.margin
+        if ttl <= 0:
+            return
+        try:
+            pipe = self.r.pipeline(transaction=False)
+            for uri, entry in signed.items():
+                pipe.set(self._key(uri), json.dumps(entry), ex=ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Failed to cache %d signed URLs: %s", len(signed), e)
+
+    def max_age(self, entry: dict) -> int:
+        """Seconds a client may keep using entry before asking for a new URL."""
+        return max(entry["expires_at"] - self.margin - int(time.time()), 0)